@@ -0,0 +1,121 @@
+"""
+Times GET /analytics on a generated history: tasks created over several
+years in trees of about 50, most of them completed (some archived), with
+tags on every tenth task and deferrals on every seventh.
+
+Reports the first (computed) and second (cached) request, and the same
+statistics computed by walking Task objects one by one for comparison.
+
+Usage:
+    python benchmarks/analytics_bench.py [--tasks 1000000] [--years 5]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _write_config(config_dir: str) -> str:
+    db_path = os.path.join(config_dir, "analytics.db").replace("\\", "/")
+    with open(os.path.join(config_dir, "config.py"), "w") as f:
+        f.write(f'DATABASE_PATH = "{db_path}"\nDATABASE_URL = f"sqlite:///{{DATABASE_PATH}}"\n')
+    return db_path
+
+
+def _populate(db_path: str, count: int, years: int, seed: int):
+    rng = random.Random(seed)
+    roots = max(count // 50, 1)
+    first = datetime.now() - timedelta(days=365 * years)
+    span = 365 * years * 86400
+
+    def row(taskid):
+        created = first + timedelta(seconds=span * taskid / count)
+        done = rng.random() < 0.8
+        completed = created + timedelta(days=rng.expovariate(1 / 10)) if done else None
+        parent = None if taskid <= roots else rng.randint(1, roots)
+        return (taskid, f"task {taskid}", "Completed" if done else "Pending", parent, str(created),
+                str(completed) if completed else None, str(completed or created), parent if done else None,
+                rng.randint(1, 4) if taskid % 7 == 0 else 0)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executemany(
+        "INSERT INTO tasks (taskid, taskname, status, parenttaskid, createdat, completed_at, lastedittime, "
+        "completed_rootid, defer_count, urgent, important, deleted, note_count) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0, 0, 0, 0)",
+        (row(taskid) for taskid in range(1, count + 1)),
+    )
+    conn.executemany("INSERT INTO tasktags (id, name) VALUES (?, ?)", [(i, f"tag {i}") for i in range(1, 21)])
+    conn.executemany("INSERT INTO tasktaglinks (taskid, tagid) VALUES (?, ?)",
+                     ((taskid, taskid % 20 + 1) for taskid in range(10, count + 1, 10)))
+    conn.commit()
+    conn.close()
+
+
+def _per_task_loop(session) -> int:
+    """The same lead time, aging and per-tag figures, one Task object at a time."""
+    from data.models.task_model import Task
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    now = datetime.utcnow()
+    leads, ages, by_tag = [], [], {}
+    for task in session.execute(select(Task).options(selectinload(Task.tasktags))).scalars():
+        if task.status == "Completed" and task.completed_at:
+            leads.append((task.completed_at - task.createdat).total_seconds() / 86400)
+        elif task.status != "Completed":
+            ages.append((now - task.createdat).total_seconds() / 86400)
+        for tag in task.tasktags:
+            by_tag[tag.id] = by_tag.get(tag.id, 0) + 1
+    leads.sort()
+    ages.sort()
+    return len(leads) + len(ages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--skip-loop", action="store_true", help="Skip the slow per-task comparison.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        db_path = _write_config(config_dir)
+        # The app reads config.py from the path, so this must come before any app import.
+        sys.path[:0] = [config_dir, REPO_ROOT]
+        from fastapi.testclient import TestClient
+
+        from data.db_session import default_database, read_session
+        from main import app
+
+        default_database.ensure_schema()
+        started = time.perf_counter()
+        _populate(db_path, args.tasks, args.years, args.seed)
+        print(f"Generated {args.tasks} tasks over {args.years} years in {time.perf_counter() - started:.1f}s")
+
+        with TestClient(app) as client:
+            for label in ("computed", "cached"):
+                started = time.perf_counter()
+                response = client.get("/analytics", params={"weeks": 520})
+                response.raise_for_status()
+                print(f"{label:<10}{time.perf_counter() - started:8.3f}s")
+            report = response.json()
+            print(f"  lead time p50 {report['lead_time_days']['p50']}d, {report['aging']['open']} open, "
+                  f"{len(report['throughput'])} weeks, {report['deferrals']['total']} deferrals")
+
+            if not args.skip_loop:
+                started = time.perf_counter()
+                with read_session() as session:
+                    _per_task_loop(session)
+                print(f"{'per task':<10}{time.perf_counter() - started:8.3f}s  (lead time, aging and tags only)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Times the integrity check and repair on a generated database with known
+faults: parenttaskid cycles, missing parents, orphaned tag links, notes,
+artifact links and dependencies, duplicate tag links and wrong note counts.
+
+Checks that the first pass finds exactly the injected faults and that a
+second pass after the repair finds none; exits 1 otherwise.
+
+With --check it also runs find_cycles on hand-made hierarchies, and edits
+a few faulty tasks between the repair's check and its fixes, the way a
+user request could, and fails if the repair undoes those edits.
+
+Usage:
+    python benchmarks/integrity_bench.py [--tasks 1000000] [--faults 100] [--check]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_NOW = "2025-01-01 00:00:00.000000"
+_INSERT_NOTE = f"INSERT INTO tasknotes (taskid, note, created_at, updated_at) VALUES (?, 'n', '{_NOW}', '{_NOW}')"
+
+
+def _write_config(config_dir: str) -> str:
+    db_path = os.path.join(config_dir, "integrity.db").replace("\\", "/")
+    with open(os.path.join(config_dir, "config.py"), "w") as f:
+        f.write(f'DATABASE_PATH = "{db_path}"\nDATABASE_URL = f"sqlite:///{{DATABASE_PATH}}"\n')
+    return db_path
+
+
+def _populate(db_path: str, count: int, faults: int, seed: int) -> dict:
+    """Writes `count` tasks in trees of about 50, with a tag link and a note on every tenth task, plus the faults."""
+    rng = random.Random(seed)
+    roots = max(count // 50, 1)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executemany(
+        "INSERT INTO tasks (taskid, taskname, status, parenttaskid, urgent, important, deleted, note_count, "
+        f"createdat, lastedittime) VALUES (?, ?, 'Pending', ?, 0, 0, 0, ?, '{_NOW}', '{_NOW}')",
+        (
+            (taskid, f"task {taskid}", None if taskid <= roots else rng.randint(max(1, taskid - 500), taskid - 1),
+             1 if taskid % 10 == 0 else 0)
+            for taskid in range(1, count + 1)
+        ),
+    )
+    conn.executemany("INSERT INTO tasktags (id, name) VALUES (?, ?)", [(i, f"tag {i}") for i in range(1, 11)])
+    conn.execute("INSERT INTO artifact (id, title) VALUES (1, 'a')")
+    conn.executemany("INSERT INTO tasktaglinks (taskid, tagid) VALUES (?, ?)",
+                     ((taskid, taskid % 10 + 1) for taskid in range(10, count + 1, 10)))
+    conn.executemany(_INSERT_NOTE, ((taskid,) for taskid in range(10, count + 1, 10)))
+
+    # Faults, each on tasks not used by another fault, so the expected counts are exact.
+    victims = rng.sample(range(roots + 1, count + 1), faults * 4)
+    for i in range(faults):
+        # A two-task cycle and a three-task one, alternately.
+        a, b, c = victims[i * 3:i * 3 + 3]
+        if i % 2:
+            conn.execute("UPDATE tasks SET parenttaskid = ? WHERE taskid = ?", (b, a))
+            conn.execute("UPDATE tasks SET parenttaskid = ? WHERE taskid = ?", (a, b))
+        else:
+            conn.execute("UPDATE tasks SET parenttaskid = ? WHERE taskid = ?", (b, a))
+            conn.execute("UPDATE tasks SET parenttaskid = ? WHERE taskid = ?", (c, b))
+            conn.execute("UPDATE tasks SET parenttaskid = ? WHERE taskid = ?", (a, c))
+    dangling = victims[faults * 3:]
+    conn.executemany("UPDATE tasks SET parenttaskid = ? WHERE taskid = ?",
+                     ((count + 1000 + i, taskid) for i, taskid in enumerate(dangling)))
+    missing = [count + 1000 + faults + i for i in range(faults)]
+    conn.executemany("INSERT INTO tasktaglinks (taskid, tagid) VALUES (?, 1)", ((t,) for t in missing))
+    conn.executemany(_INSERT_NOTE, ((t,) for t in missing))
+    conn.executemany("INSERT INTO task_artifact (taskid, artifact_id) VALUES (?, 1)", ((t,) for t in missing))
+    conn.executemany("INSERT INTO taskdependencies (dependenttaskid, blockingtaskid) VALUES (?, 1)",
+                     ((t,) for t in missing))
+    duplicated = range(10, faults * 10 + 1, 10)
+    conn.executemany("INSERT INTO tasktaglinks (taskid, tagid) VALUES (?, ?)", ((t, t % 10 + 1) for t in duplicated))
+    conn.executemany("UPDATE tasks SET note_count = 5 WHERE taskid = ?", ((t,) for t in range(11, faults * 10, 10)))
+    conn.commit()
+    conn.close()
+    return {
+        "cycles": faults, "dangling_parents": faults, "orphaned_tag_links": faults, "orphaned_notes": faults,
+        "orphaned_artifact_links": faults, "orphaned_dependencies": faults, "duplicate_tag_links": faults,
+        "note_count_mismatches": len(range(11, faults * 10, 10)),
+    }
+
+
+# (taskid, parenttaskid) links and the cycles find_cycles must report for them.
+_CYCLE_CASES = [
+    ([], []),
+    ([(2, 1), (3, 2), (4, 2)], []),
+    ([(1, 1)], [[1]]),
+    ([(5, 7), (7, 5), (8, 7)], [[5, 7]]),
+    ([(9, 3), (3, 6), (6, 9), (10, 11), (4, 3)], [[3, 6, 9]]),
+    ([(1, 2), (2, 3), (3, 1), (4, 5), (5, 4), (6, 1)], [[1, 2, 3], [4, 5]]),
+]
+
+
+def _check_find_cycles() -> bool:
+    from data.integrity import find_cycles
+
+    ok = True
+    for links, expected in _CYCLE_CASES:
+        found = sorted(find_cycles(links))
+        if found != expected:
+            print(f"find_cycles({links}) gave {found}, expected {expected}")
+            ok = False
+    return ok
+
+
+def _edit_between_check_and_fix(db_path: str, issues: dict, root_id: int) -> dict:
+    """Moves one cycle's first task and one task with a missing parent under `root_id`, as a user could."""
+    moved = {issues["cycles"][0][0]: root_id, issues["dangling_parents"][0]: root_id}
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.executemany("UPDATE tasks SET parenttaskid = ? WHERE taskid = ?", [(p, t) for t, p in moved.items()])
+    conn.commit()
+    conn.close()
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--faults", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--check", action="store_true", help="Also check find_cycles and edits made during a repair.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        db_path = _write_config(config_dir)
+        # The app reads config.py from the path, so this must come before any app import.
+        sys.path[:0] = [config_dir, REPO_ROOT]
+        import services.integrity
+        from data.db_session import default_database
+        from services.integrity import check_integrity_service, repair_integrity_service
+
+        ok = _check_find_cycles() if args.check else True
+
+        default_database.ensure_schema()
+        started = time.perf_counter()
+        expected = _populate(db_path, args.tasks, args.faults, args.seed)
+        print(f"Generated {args.tasks} tasks in {time.perf_counter() - started:.1f}s")
+
+        report = check_integrity_service()
+        found = {name: issue["count"] for name, issue in report["issues"].items()}
+        print(f"check:  {report['seconds']:.2f}s")
+        for name, count in found.items():
+            print(f"  {name:<26}{count:>8}  (injected {expected[name]})")
+
+        moved = {}
+        find_issues = services.integrity.find_integrity_issues
+
+        def find_then_edit(session):
+            issues = find_issues(session)
+            moved.update(_edit_between_check_and_fix(db_path, issues, root_id=1))
+            return issues
+
+        if args.check:
+            services.integrity.find_integrity_issues = find_then_edit
+        try:
+            report = repair_integrity_service()
+        finally:
+            services.integrity.find_integrity_issues = find_issues
+        print(f"repair: {report['seconds']:.2f}s, rows changed {sum(report['repaired'].values())}")
+        if moved:
+            conn = sqlite3.connect(db_path)
+            parents = dict(conn.execute(
+                f"SELECT taskid, parenttaskid FROM tasks WHERE taskid IN ({','.join(map(str, moved))})"
+            ).fetchall())
+            conn.close()
+            kept = parents == moved
+            print(f"edits made during the repair kept: {kept}")
+            ok = ok and kept
+
+        after = check_integrity_service()
+        remaining = {name: issue["count"] for name, issue in after["issues"].items() if issue["count"]}
+        print(f"recheck: {after['seconds']:.2f}s, remaining {remaining or 'none'}")
+        default_database.dispose()
+        if found != expected or remaining or not ok:
+            print("FAILED")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
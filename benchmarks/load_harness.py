@@ -0,0 +1,275 @@
+"""
+Load test for the HTTP API. Serves the real app against a generated
+database, either in-process through httpx's ASGI transport or as a local
+uvicorn worker, and replays a weighted mix of requests at each concurrency
+level for a fixed time.
+
+For every level it reports throughput and p50/p99 latency, overall and per
+kind of request. The exit status is 1 when any level breaks a threshold,
+so the run can gate a change.
+
+Request kinds for --mix:
+  tl, trl, tla   GET /tasks/tl, /tasks/trl, /tasks/tla
+  create         POST /tasks/create
+  task           GET /tasks/{id}
+  tree           GET /tasks/{id}/tree?depth=1
+  notes          GET /tasks/{id}/notes
+  projects       GET /projects
+  patch          PATCH /tasks/{id} (flips urgent)
+  history        GET /tasks/history
+
+In asgi mode the client shares the event loop with the app, so its own
+overhead is included in the latencies; uvicorn mode measures over a
+loopback socket instead.
+
+Usage:
+    python benchmarks/load_harness.py [--server asgi|uvicorn] [--tasks 20000]
+        [--concurrency 1,8,32] [--duration 10] [--mix tl=3,create=1,...]
+        [--setting WRITE_GROUP_COMMIT=True] [--max-p99-ms 500]
+        [--min-rps 0] [--max-error-rate 0.01]
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = "tl=3,trl=1,tla=1,create=1,task=2,tree=2,notes=1,projects=1,patch=1,history=1"
+
+LAUNCHER = """
+import sys
+sys.path[:0] = [{config_dir!r}, {repo_root!r}]
+import uvicorn
+uvicorn.run("main:app", host="127.0.0.1", port={port}, log_level="warning")
+"""
+
+# kind -> (rng, task count) -> (method, path, request kwargs)
+REQUESTS: Dict[str, Callable[[random.Random, int], Tuple[str, str, dict]]] = {
+    "tl": lambda rng, n: ("GET", "/tasks/tl", {}),
+    "trl": lambda rng, n: ("GET", "/tasks/trl", {}),
+    "tla": lambda rng, n: ("GET", "/tasks/tla", {}),
+    "create": lambda rng, n: ("POST", "/tasks/create", {"params": {"task_name": f"load {rng.random():.6f}"}}),
+    "task": lambda rng, n: ("GET", f"/tasks/{rng.randint(1, n)}", {}),
+    "tree": lambda rng, n: ("GET", f"/tasks/{rng.randint(1, n)}/tree", {"params": {"depth": 1}}),
+    "notes": lambda rng, n: ("GET", f"/tasks/{rng.randint(1, n)}/notes", {"params": {"limit": 20}}),
+    "projects": lambda rng, n: ("GET", "/projects", {}),
+    "patch": lambda rng, n: ("PATCH", f"/tasks/{rng.randint(1, n)}", {"json": {"urgent": rng.random() < 0.5}}),
+    "history": lambda rng, n: ("GET", "/tasks/history", {}),
+}
+
+
+def _parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in REQUESTS:
+            raise SystemExit(f"Unknown request kind {kind!r}; choose from {', '.join(REQUESTS)}.")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def _write_config(config_dir: str, settings: List[str]) -> str:
+    db_path = os.path.join(config_dir, "load.db").replace("\\", "/")
+    with open(os.path.join(config_dir, "config.py"), "w") as f:
+        f.write(f'DATABASE_PATH = "{db_path}"\nDATABASE_URL = f"sqlite:///{{DATABASE_PATH}}"\n')
+        for setting in settings:
+            f.write(f"{setting}\n")
+    return db_path
+
+
+def _populate(db_path: str, count: int, seed: int):
+    """Generates `count` tasks in trees of about 50, with notes, some due dates and completions."""
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import Session
+
+    from data.crud.project_crud import refresh_all_project_rollups
+    from data.models.task_model import Task
+    from data.models.task_note_model import TaskNote
+    from data.schema import ensure_schema
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    roots = max(count // 50, 1)
+    tasks, notes = [], []
+    for taskid in range(1, count + 1):
+        completed = taskid > roots and rng.random() < 0.3
+        tasks.append({
+            "taskid": taskid,
+            "taskname": f"task {taskid}",
+            "description": "generated",
+            "status": "Completed" if completed else "Pending",
+            "completed_at": now - timedelta(days=rng.randrange(60)) if completed else None,
+            "parenttaskid": None if taskid <= roots else rng.randint(max(1, taskid - 200), taskid - 1),
+            "duedate": now + timedelta(days=rng.randrange(90)) if rng.random() < 0.2 else None,
+            "earlieststarttime": now - timedelta(days=rng.randrange(30)),
+            "sort_order": taskid,
+            "urgent": rng.random() < 0.1,
+            "important": rng.random() < 0.2,
+            "note_count": 0,
+        })
+    for task in tasks:
+        for _ in range(rng.choice((0, 0, 1, 3))):
+            notes.append({"taskid": task["taskid"], "note": f"note on {task['taskid']}"})
+            task["note_count"] += 1
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    ensure_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Task), tasks)
+        if notes:
+            conn.execute(insert(TaskNote), notes)
+    with Session(engine) as session:
+        refresh_all_project_rollups(session)
+        session.commit()
+    engine.dispose()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_uvicorn(config_dir: str, timeout: float = 30.0) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    code = LAUNCHER.format(config_dir=config_dir, repo_root=REPO_ROOT, port=port)
+    proc = subprocess.Popen([sys.executable, "-c", code], cwd=config_dir)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(f"{base_url}/", timeout=1).status_code == 200:
+                return proc, base_url
+        except httpx.HTTPError:
+            time.sleep(0.05)
+    proc.terminate()
+    raise TimeoutError("Server did not answer in time.")
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, round(fraction * (len(sorted_values) - 1)))]
+
+
+async def _run_level(client: httpx.AsyncClient, mix: Dict[str, float], task_count: int,
+                     concurrency: int, duration: float, seed: int) -> Dict[str, list]:
+    """Runs `concurrency` workers until the deadline. Returns kind -> [(latency seconds, ok)]."""
+    kinds, weights = list(mix), list(mix.values())
+    samples: Dict[str, list] = defaultdict(list)
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_seed: int):
+        rng = random.Random(worker_seed)
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            method, path, kwargs = REQUESTS[kind](rng, task_count)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            samples[kind].append((time.perf_counter() - started, ok))
+
+    await asyncio.gather(*(worker(seed * 1000 + i) for i in range(concurrency)))
+    return samples
+
+
+def _report(concurrency: int, duration: float, samples: Dict[str, list]) -> Tuple[float, float, float]:
+    """Prints one level and returns its (requests per second, p99 ms, error rate)."""
+    everything = sorted(latency for rows in samples.values() for latency, _ in rows)
+    errors = sum(not ok for rows in samples.values() for _, ok in rows)
+    total = len(everything)
+    rps = total / duration
+    p99 = _percentile(everything, 0.99) * 1000
+    error_rate = errors / total if total else 0.0
+    print(f"\nconcurrency {concurrency}: {total} requests, {rps:.1f} req/s, "
+          f"p50 {_percentile(everything, 0.5) * 1000:.1f} ms, p99 {p99:.1f} ms, errors {errors}")
+    print(f"  {'kind':<10}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for kind, rows in sorted(samples.items()):
+        latencies = sorted(latency for latency, _ in rows)
+        print(f"  {kind:<10}{len(rows):>8}{_percentile(latencies, 0.5) * 1000:>10.1f}"
+              f"{_percentile(latencies, 0.99) * 1000:>10.1f}{sum(not ok for _, ok in rows):>8}")
+    return rps, p99, error_rate
+
+
+async def _run(args, mix: Dict[str, float], client: httpx.AsyncClient) -> List[str]:
+    failures = []
+    for concurrency in args.concurrency:
+        samples = await _run_level(client, mix, args.tasks, concurrency, args.duration, args.seed)
+        rps, p99, error_rate = _report(concurrency, args.duration, samples)
+        if args.max_p99_ms is not None and p99 > args.max_p99_ms:
+            failures.append(f"concurrency {concurrency}: p99 {p99:.1f} ms > {args.max_p99_ms} ms")
+        if args.min_rps is not None and rps < args.min_rps:
+            failures.append(f"concurrency {concurrency}: {rps:.1f} req/s < {args.min_rps} req/s")
+        if error_rate > args.max_error_rate:
+            failures.append(f"concurrency {concurrency}: error rate {error_rate:.2%} > {args.max_error_rate:.2%}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--concurrency", type=lambda text: [int(n) for n in text.split(",")], default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per concurrency level.")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="kind=weight pairs, comma separated.")
+    parser.add_argument("--setting", action="append", default=[],
+                        help="Extra config.py line, e.g. WRITE_GROUP_COMMIT=True. Repeatable.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-p99-ms", type=float)
+    parser.add_argument("--min-rps", type=float)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+    mix = _parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        db_path = _write_config(config_dir, args.setting)
+        # The app reads config.py from the path, so this must come before any app import.
+        sys.path[:0] = [config_dir, REPO_ROOT]
+        _populate(db_path, args.tasks, args.seed)
+        print(f"{args.tasks} tasks, server {args.server}, {args.duration:g} s per level, mix {args.mix}")
+
+        if args.server == "asgi":
+            from main import app
+
+            async def run_asgi():
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://harness") as client:
+                    return await _run(args, mix, client)
+            failures = asyncio.run(run_asgi())
+        else:
+            proc, base_url = _start_uvicorn(config_dir)
+            try:
+                async def run_uvicorn():
+                    limits = httpx.Limits(max_connections=max(args.concurrency))
+                    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+                        return await _run(args, mix, client)
+                failures = asyncio.run(run_uvicorn())
+            finally:
+                proc.terminate()
+                proc.wait()
+
+    if failures:
+        print("\nFAILED")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nPASSED")
+
+
+if __name__ == "__main__":
+    main()
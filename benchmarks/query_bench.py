@@ -0,0 +1,156 @@
+"""
+Measures the per-call cost of the hot task queries: built and compiled
+from a fresh select() on every call, the way task_crud used to do it,
+against the prebuilt statements with bound parameters that task_crud
+runs now.
+
+Runs against a small in-memory database so the time is dominated by
+statement construction and caching rather than by SQLite. Reports the
+median microseconds per call over several rounds.
+
+Usage:
+    python benchmarks/query_bench.py [--tasks 200] [--calls 2000] [--rounds 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _write_config(config_dir: str) -> str:
+    db_path = os.path.join(config_dir, "bench.db").replace("\\", "/")
+    with open(os.path.join(config_dir, "config.py"), "w") as f:
+        f.write(f'DATABASE_PATH = "{db_path}"\nDATABASE_URL = f"sqlite:///{{DATABASE_PATH}}"\n')
+    return db_path
+
+
+def _built_per_call():
+    """The queries as they were written before, constructing a select() on every call."""
+    from sqlalchemy import exists, func, select
+
+    from data.models.task_model import Task
+    from data.read_models import select_task_rows, to_task_rows
+
+    def get_root_tasks(session):
+        query = (
+            select_task_rows()
+            .where(
+                Task.status != "Completed",
+                Task.deleted.is_(False),
+                (Task.earlieststarttime.is_(None) | (Task.earlieststarttime <= datetime.now())),
+                Task.parenttaskid == None,  # noqa: E711
+            )
+            .order_by(Task.sort_order.asc())
+        )
+        return to_task_rows(session.execute(query))
+
+    def has_incomplete_subtask(session, task_id):
+        query = select(exists().where(Task.parenttaskid == task_id, Task.status != "Completed"))
+        return session.execute(query).scalar()
+
+    def get_subtasks(session, task_id):
+        min_sequence = (
+            select(func.min(Task.repeatinterval))
+            .where(Task.parenttaskid == task_id, Task.status != "Completed")
+        ).scalar_subquery()
+        query = (
+            select(Task.taskid)
+            .where(
+                Task.parenttaskid == task_id,
+                Task.status != "Completed",
+                (Task.earlieststarttime.is_(None) | (Task.earlieststarttime <= datetime.now())),
+                (Task.repeatinterval.is_(None) | (Task.repeatinterval == min_sequence)),
+            )
+            .order_by(Task.createdat.asc())
+        )
+        return session.execute(query).scalars().all()
+
+    def get_tasks_by_ids(session, task_ids):
+        query = select_task_rows().where(Task.taskid.in_(task_ids)).order_by(Task.taskname.asc())
+        return to_task_rows(session.execute(query))
+
+    return get_root_tasks, has_incomplete_subtask, get_subtasks, get_tasks_by_ids
+
+
+def _populate(engine, count: int):
+    from sqlalchemy import insert
+
+    from data.models.task_model import Task
+
+    now = datetime.now()
+    rows = [
+        {
+            "taskid": i,
+            "taskname": f"task {i}",
+            "status": "Completed" if i % 4 == 0 else "Pending",
+            "parenttaskid": None if i <= 10 else i // 10,
+            "earlieststarttime": now - timedelta(days=i % 30),
+            "sort_order": i,
+        }
+        for i in range(1, count + 1)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(Task), rows)
+
+
+def _per_call_us(session, call, calls: int, rounds: int) -> float:
+    for _ in range(calls // 10):
+        call(session)
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(calls):
+            call(session)
+        timings.append((time.perf_counter() - started) / calls * 1e6)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        _write_config(config_dir)
+        # The app reads config.py from the path, so this must come before any app import.
+        sys.path[:0] = [config_dir, REPO_ROOT]
+
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import Session
+
+        from data.crud import task_crud
+        from data.schema import ensure_schema
+
+        engine = create_engine("sqlite://")
+        ensure_schema(engine)
+        _populate(engine, args.tasks)
+        ids = list(range(1, min(args.tasks, 50) + 1))
+
+        old_root, old_has_open, old_subtasks, old_by_ids = _built_per_call()
+        cases = [
+            ("get_root_tasks", old_root, task_crud.get_root_tasks, ()),
+            ("has_incomplete_subtask", old_has_open, task_crud.has_incomplete_subtask, (1,)),
+            ("get_subtasks", old_subtasks, task_crud.get_subtasks, (1,)),
+            ("get_tasks_by_ids", old_by_ids, task_crud.get_tasks_by_ids, (ids,)),
+        ]
+
+        print(f"{args.tasks} tasks, median of {args.rounds} rounds of {args.calls} calls")
+        print(f"{'query':<26}{'built us':>10}{'prebuilt us':>13}{'speedup':>9}")
+        with Session(engine) as session:
+            for name, old, new, call_args in cases:
+                assert old(session, *call_args) == new(session, *call_args), name
+                before = _per_call_us(session, lambda s: old(s, *call_args), args.calls, args.rounds)
+                after = _per_call_us(session, lambda s: new(s, *call_args), args.calls, args.rounds)
+                print(f"{name:<26}{before:>10.1f}{after:>13.1f}{before / after:>8.1f}x")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compares loading task lists as mapped Task objects with loading them as
+TaskRow tuples from a column-only select, the way the list views now do.
+
+For each variant it reports the median wall time to fetch every open task
+and the memory still held by the returned list (tracemalloc), against a
+throwaway database of generated tasks.
+
+Usage:
+    python benchmarks/read_model_bench.py [--tasks 50000] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from sqlalchemy import create_engine, insert, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from data.read_models import select_task_rows, to_task_rows  # noqa: E402
+from data.schema import ensure_schema  # noqa: E402
+from data.models.task_model import Task  # noqa: E402
+
+
+def _populate(engine, count: int):
+    now = datetime.now()
+    rows = [
+        {
+            "taskname": f"task {i}",
+            "description": "x" * 200,
+            "status": "Completed" if i % 4 == 0 else "Pending",
+            "earlieststarttime": now - timedelta(days=i % 30),
+            "sort_order": i,
+            "urgent": i % 7 == 0,
+            "important": i % 5 == 0,
+        }
+        for i in range(count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(Task), rows)
+
+
+def _load_orm(session: Session):
+    return session.execute(select(Task).where(Task.status != "Completed")).scalars().all()
+
+
+def _load_rows(session: Session):
+    return to_task_rows(session.execute(select_task_rows().where(Task.status != "Completed")))
+
+
+def _measure(engine, loader, runs: int):
+    timings = []
+    for _ in range(runs):
+        with Session(engine) as session:
+            started = time.perf_counter()
+            loader(session)
+            timings.append(time.perf_counter() - started)
+
+    with Session(engine) as session:
+        tracemalloc.start()
+        result = loader(session)
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+    return statistics.median(timings), retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=50000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        ensure_schema(engine)
+        _populate(engine, args.tasks)
+
+        print(f"{'variant':<10}{'median ms':>12}{'retained MB':>14}")
+        for name, loader in (("orm", _load_orm), ("rows", _load_rows)):
+            seconds, retained = _measure(engine, loader, args.runs)
+            print(f"{name:<10}{seconds * 1000:>12.1f}{retained / 2**20:>14.1f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Measures import-to-first-response for the app: each run launches a fresh
+uvicorn worker and times how long it takes until GET / answers.
+
+Two scenarios are measured against a throwaway database:
+  fresh   - empty database file, so the schema has to be created
+  current - schema already at SCHEMA_VERSION, so startup skips all DDL
+
+Usage:
+    python benchmarks/startup_bench.py [--runs 10]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAUNCHER = """
+import sys
+sys.path[:0] = [{config_dir!r}, {repo_root!r}]
+import uvicorn
+uvicorn.run("main:app", host="127.0.0.1", port={port}, log_level="warning")
+"""
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _time_to_first_response(config_dir: str, timeout: float = 30.0) -> float:
+    port = _free_port()
+    code = LAUNCHER.format(config_dir=config_dir, repo_root=REPO_ROOT, port=port)
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", code], cwd=config_dir)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.005)
+        raise TimeoutError("Server did not answer in time.")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        db_path = os.path.join(config_dir, "bench.db").replace("\\", "/")
+        with open(os.path.join(config_dir, "config.py"), "w") as f:
+            f.write(f'DATABASE_PATH = "{db_path}"\nDATABASE_URL = f"sqlite:///{{DATABASE_PATH}}"\n')
+
+        results = {}
+        for scenario in ("fresh", "current"):
+            timings = []
+            for _ in range(args.runs):
+                if scenario == "fresh" and os.path.exists(db_path):
+                    os.remove(db_path)
+                timings.append(_time_to_first_response(config_dir))
+            results[scenario] = timings
+
+    print(f"{'scenario':<10}{'min ms':>10}{'median ms':>12}{'max ms':>10}")
+    for scenario, timings in results.items():
+        print(f"{scenario:<10}{min(timings) * 1000:>10.1f}"
+              f"{statistics.median(timings) * 1000:>12.1f}{max(timings) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
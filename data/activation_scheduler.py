@@ -0,0 +1,160 @@
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import config
+from data.change_feed import add_listener, publish
+from data.crud.task_crud import get_pending_activations
+from data.db_session import Database, current_database, local_listener
+
+RECONCILE_SECONDS = getattr(config, "ACTIVATION_RECONCILE_SECONDS", 300)
+# Longest single wait, so a changed system clock is noticed reasonably soon.
+_MAX_WAIT_SECONDS = 60
+
+# Events that can give a task a future start time or take it away.
+_TASK_EVENTS = {"created", "completed", "deleted"}
+# "updated" only matters when it touches one of these.
+_TASK_FIELDS = {"earlieststarttime", "status", "deleted"}
+
+
+class ActivationScheduler:
+    """
+    Heap of the open tasks whose earliest start time is still ahead. A
+    background thread sleeps until the first of them, then publishes an
+    "activated" change for every task whose time has come. Publishing
+    advances the change feed's data version, so anything cached against
+    that version (or until `next_activation()`) is stale exactly when a
+    task becomes available, and `/events` subscribers hear about it
+    without polling.
+
+    The change feed marks the tasks an event touches as dirty and the
+    thread re-reads just those rows; superseded heap entries are skipped
+    when they surface. The whole heap is rebuilt from the database every
+    RECONCILE_SECONDS. There is one per database, started when its schema
+    is ready; use `get_activation_scheduler()`.
+    """
+
+    def __init__(self, database: Database, reconcile_seconds: float = RECONCILE_SECONDS):
+        self._database = database
+        self._reconcile_seconds = reconcile_seconds
+        self._condition = threading.Condition()
+        self._heap: List[Tuple[datetime, int]] = []
+        # taskid -> pending start time; heap entries that disagree are stale.
+        self._starts: Dict[int, datetime] = {}
+        self._dirty: Set[int] = set()
+        self._loaded_at: Optional[float] = None
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name=f"activations-{database.tenant or 'default'}", daemon=True
+        )
+        self._thread.start()
+
+    def on_changes(self, events: List[Dict[str, Any]]):
+        with self._condition:
+            for change in events:
+                kind = change["type"]
+                if kind in _TASK_EVENTS or (kind == "updated" and not _TASK_FIELDS.isdisjoint(change.get("fields", {}))):
+                    self._dirty.add(change["taskid"])
+                elif kind == "restored":
+                    self._loaded_at = None
+            if self._dirty or self._loaded_at is None:
+                self._condition.notify()
+
+    def next_activation(self) -> Optional[datetime]:
+        """Start time of the next task to become available, or None if none is pending."""
+        with self._condition:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+    def _drop_stale(self):
+        while self._heap and self._starts.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _has_work(self) -> bool:
+        self._drop_stale()
+        return bool(
+            self._dirty
+            or self._loaded_at is None
+            or time.monotonic() - self._loaded_at > self._reconcile_seconds
+            or (self._heap and self._heap[0][0] <= datetime.now())
+        )
+
+    def _wait_seconds(self) -> float:
+        wait = _MAX_WAIT_SECONDS
+        if self._heap:
+            wait = min(wait, (self._heap[0][0] - datetime.now()).total_seconds())
+        if self._loaded_at is not None:
+            wait = min(wait, self._loaded_at + self._reconcile_seconds - time.monotonic())
+        return max(wait, 0.0)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and not self._has_work():
+                    self._condition.wait(self._wait_seconds())
+                if self._closed:
+                    return
+                reload = self._loaded_at is None or time.monotonic() - self._loaded_at > self._reconcile_seconds
+                dirty, self._dirty = self._dirty, set()
+            try:
+                self._refresh(reload, dirty)
+                self._activate_due()
+            except Exception as e:
+                logging.error(f"Activation scheduler for {self._database.tenant or 'default'} failed: {e}")
+                with self._condition:
+                    self._loaded_at = None
+                    self._condition.wait(_MAX_WAIT_SECONDS)
+
+    def _refresh(self, reload: bool, dirty: Set[int]):
+        # Read outside the lock; a change landing meanwhile marks its task dirty again.
+        with self._database.ReadSessionLocal() as session:
+            rows = get_pending_activations(session, None if reload else list(dirty))
+        with self._condition:
+            if reload:
+                self._starts = dict(rows)
+                self._heap = [(start, task_id) for task_id, start in rows]
+                heapq.heapify(self._heap)
+                self._loaded_at = time.monotonic()
+                return
+            for task_id in dirty:
+                self._starts.pop(task_id, None)
+            for task_id, start in rows:
+                self._starts[task_id] = start
+                heapq.heappush(self._heap, (start, task_id))
+            if len(self._heap) > 2 * len(self._starts) + 64:
+                self._heap = [(start, task_id) for task_id, start in self._starts.items()]
+                heapq.heapify(self._heap)
+
+    def _activate_due(self):
+        now = datetime.now()
+        activated = []
+        with self._condition:
+            self._drop_stale()
+            while self._heap and self._heap[0][0] <= now:
+                start, task_id = heapq.heappop(self._heap)
+                del self._starts[task_id]
+                activated.append({"type": "activated", "taskid": task_id, "earlieststarttime": start})
+                self._drop_stale()
+        if activated:
+            publish(activated, self._database.tenant)
+
+
+def get_activation_scheduler() -> ActivationScheduler:
+    """The activation scheduler of the current request's database."""
+    return current_database().local("activation_scheduler", ActivationScheduler)
+
+
+def start_activation_scheduler(database: Database):
+    """Starts the scheduler of a database whose schema is ready; see Database.ensure_schema."""
+    database.local("activation_scheduler", ActivationScheduler)
+
+
+add_listener(local_listener("activation_scheduler"))
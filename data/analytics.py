@@ -0,0 +1,205 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import config
+from data.change_feed import get_data_version
+from data.crud.analytics_crud import FACT_COLUMNS
+from data.db_session import Database, current_database
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAX_AGE_SECONDS = getattr(config, "ANALYTICS_MAX_AGE_SECONDS", 300)
+
+# Julian day number of 1970-01-01, a Thursday; weeks start on Monday.
+_EPOCH_JULIAN_DAY = 2440587.5
+_EPOCH = date(1970, 1, 1)
+AGE_BUCKETS = [("<1d", 0), ("1-7d", 1), ("7-30d", 7), ("30-90d", 30), ("90-365d", 90), ("365d+", 365)]
+DEFERRAL_BUCKETS = [("0", 0), ("1", 1), ("2", 2), ("3-5", 3), ("6+", 6)]
+# Parent hops followed per pointer-jumping round is 2**round, so this covers any real depth.
+_MAX_JUMPS = 64
+
+
+def _julian_day(moment: datetime) -> float:
+    return (moment - datetime(1970, 1, 1)).total_seconds() / 86400 + _EPOCH_JULIAN_DAY
+
+
+def _week_index(julian_days):
+    return np.floor((julian_days - _EPOCH_JULIAN_DAY + 3) / 7).astype(np.int64)
+
+
+def _week_start(week: int) -> date:
+    return _EPOCH + timedelta(days=int(week) * 7 - 3)
+
+
+def _summary(values) -> Dict[str, Optional[float]]:
+    if not len(values):
+        return {"count": 0, "mean": None, "p50": None, "p90": None, "max": None}
+    p50, p90 = np.percentile(values, [50, 90])
+    return {"count": int(len(values)), "mean": round(float(values.mean()), 2),
+            "p50": round(float(p50), 2), "p90": round(float(p90), 2), "max": round(float(values.max()), 2)}
+
+
+def _buckets(values, buckets: List[Tuple[str, float]]) -> Dict[str, int]:
+    counts = np.bincount(np.searchsorted([low for _, low in buckets], values, side="right") - 1,
+                         minlength=len(buckets))
+    return {name: int(count) for (name, _), count in zip(buckets, counts)}
+
+
+def _positions(ids, wanted):
+    """Index of each `wanted` id in the unsorted `ids`, and whether it was there at all."""
+    if not len(ids):
+        return np.zeros(len(wanted), np.int64), np.zeros(len(wanted), bool)
+    order = np.argsort(ids)
+    at = order[np.searchsorted(ids, wanted, sorter=order).clip(max=len(ids) - 1)]
+    return at, ids[at] == wanted
+
+
+def find_roots(ids, parent_ids):
+    """
+    Index (into `ids`) of the top-level task above each task, by pointer
+    jumping: every round replaces each task's pointer with its pointer's
+    pointer, so a chain of depth d resolves in log2(d) rounds. Tasks whose
+    parent is missing count as top level; tasks on a cycle get -1.
+    """
+    parent, found = _positions(ids, parent_ids)
+    parent = np.where(found, parent, np.arange(len(ids)))
+    for _ in range(_MAX_JUMPS):
+        jumped = parent[parent]
+        if np.array_equal(jumped, parent):
+            break
+        parent = jumped
+    return np.where(parent[parent] == parent, parent, -1)
+
+
+def _breakdown(keys, facts, lead_days, age_days, size: int) -> List[Dict[str, Any]]:
+    """Per-key totals for rows with key >= 0, the `size` keys with the most tasks first."""
+    keep = keys >= 0
+    keys, facts, lead_days, age_days = keys[keep], facts[keep], lead_days[keep], age_days[keep]
+    if not len(keys):
+        return []
+    unique, group = np.unique(keys, return_inverse=True)
+    completed = facts[:, FACT_COLUMNS.index("is_completed")] == 1
+    has_lead = ~np.isnan(lead_days)
+    has_age = ~np.isnan(age_days)
+    total = np.bincount(group)
+    done = np.bincount(group, weights=completed)
+    deferrals = np.bincount(group, weights=facts[:, FACT_COLUMNS.index("defer_count")])
+    lead_count = np.bincount(group, weights=has_lead)
+    lead_sum = np.bincount(group, weights=np.where(has_lead, lead_days, 0))
+    age_count = np.bincount(group, weights=has_age)
+    age_sum = np.bincount(group, weights=np.where(has_age, age_days, 0))
+
+    def mean(sums, counts, i):
+        return round(float(sums[i] / counts[i]), 2) if counts[i] else None
+
+    rows = []
+    for i in np.argsort(-total, kind="stable")[:size]:
+        rows.append({
+            "key": int(unique[i]),
+            "total": int(total[i]),
+            "open": int(total[i] - done[i]),
+            "completed": int(done[i]),
+            "deferrals": int(deferrals[i]),
+            "mean_lead_time_days": mean(lead_sum, lead_count, i),
+            "mean_open_age_days": mean(age_sum, age_count, i),
+        })
+    return rows
+
+
+def compute_analytics(facts: List[tuple], tag_links: List[Tuple[int, int]], breakdown_size: int) -> Dict[str, Any]:
+    """
+    Lead time, weekly throughput, deferrals, aging and per-tag and
+    per-project breakdowns from FACT_COLUMNS rows and (taskid, tagid)
+    pairs, computed on whole columns at once. Times are in days.
+    Throughput covers every week from the first completion to this one.
+    Breakdown rows carry a `key` (tag id or top-level task id) for the
+    caller to name.
+    """
+    facts = np.array(facts, dtype=np.float64).reshape(-1, len(FACT_COLUMNS))
+    column = {name: facts[:, i] for i, name in enumerate(FACT_COLUMNS)}
+    ids = column["taskid"].astype(np.int64)
+    completed = column["is_completed"] == 1
+    now = _julian_day(datetime.now())
+    # createdat is stored in UTC, the start and completion times in local time; compare on local time.
+    created = column["created"] + (now - _julian_day(datetime.utcnow()))
+
+    lead_days = np.where(completed, column["completed"] - created, np.nan)
+    age_days = np.where(completed, np.nan, now - created)
+    leads = lead_days[~np.isnan(lead_days)]
+    open_ages = age_days[~np.isnan(age_days)]
+
+    done_at = column["completed"][completed & ~np.isnan(column["completed"])]
+    throughput = []
+    if len(done_at):
+        weeks = _week_index(done_at)
+        first, last = int(weeks.min()), int(_week_index(np.array([now]))[0])
+        counts = np.bincount(weeks - first, minlength=last - first + 1)
+        throughput = [{"week_start": _week_start(first + i), "completed": int(count)}
+                      for i, count in enumerate(counts)]
+
+    defers = column["defer_count"]
+    waiting = ~completed & (column["start"] > now)
+
+    # Completed tasks count under completed_rootid, which follows reparents and outlives archiving;
+    # open ones are resolved through their parents.
+    roots = find_roots(ids, column["parenttaskid"])
+    project = np.where(roots >= 0, ids[roots.clip(min=0)], -1)
+    project = np.where(completed & ~np.isnan(column["rootid"]), np.nan_to_num(column["rootid"], nan=-1), project)
+    project = np.where(project == ids, -1, project).astype(np.int64)
+
+    tag_links = np.array(tag_links, dtype=np.int64).reshape(-1, 2)
+    rows, linked = _positions(ids, tag_links[:, 0])
+    rows = rows[linked]
+
+    return {
+        "tasks": int(len(ids)),
+        "lead_time_days": _summary(leads),
+        "throughput": throughput,
+        "deferrals": {
+            "total": int(defers.sum()),
+            "tasks_deferred": int((defers > 0).sum()),
+            "currently_deferred": int(waiting.sum()),
+            "tasks_by_count": _buckets(defers, DEFERRAL_BUCKETS),
+        },
+        "aging": {
+            "open": int(len(open_ages)),
+            "age_days": _summary(open_ages),
+            "buckets": _buckets(open_ages, AGE_BUCKETS),
+        },
+        "by_tag": _breakdown(tag_links[linked, 1], facts[rows], lead_days[rows], age_days[rows], breakdown_size),
+        "by_project": _breakdown(project, facts, lead_days, age_days, breakdown_size),
+    }
+
+
+class AnalyticsCache:
+    """
+    The last analytics report of one database, kept until a change to that
+    database is published (its change feed data version moves) or it is
+    MAX_AGE_SECONDS old, since open task ages grow without any change.
+    Concurrent requests for a stale report wait for one computation.
+    """
+
+    def __init__(self, database: Database):
+        self._tenant = database.tenant
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._computed_at = 0.0
+        self._report: Optional[Dict[str, Any]] = None
+
+    def get(self, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock:
+            version = get_data_version(self._tenant)
+            if self._report is None or version != self._version or time.monotonic() - self._computed_at > MAX_AGE_SECONDS:
+                # Read before computing, so a change landing meanwhile triggers the next recompute.
+                self._report = {"data_version": version, **compute()}
+                self._version, self._computed_at = version, time.monotonic()
+            return self._report
+
+
+def get_analytics_cache() -> AnalyticsCache:
+    return current_database().local("analytics", AnalyticsCache)
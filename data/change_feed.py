@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+SUBSCRIBER_QUEUE_SIZE = getattr(config, "EVENTS_QUEUE_SIZE", 256)
+MAX_SUBSCRIBERS = getattr(config, "EVENTS_MAX_SUBSCRIBERS", 1000)
+REPLAY_BUFFER_SIZE = getattr(config, "EVENTS_REPLAY_SIZE", 1024)
+
+_PENDING_KEY = "change_feed_pending"
+
+_lock = threading.Lock()
+_sequence = 0
+# Id of the last event published per tenant (None for the default database).
+_last_ids: Dict[Optional[str], int] = {}
+_recent: deque = deque(maxlen=REPLAY_BUFFER_SIZE)
+_listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+_subscribers: set = set()
+
+
+class Subscriber:
+    """
+    A bounded, per-client event queue living on one asyncio loop.
+    When the client falls behind, queued events are dropped and a single
+    "reset" event tells it to refetch instead of growing without bound.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int, tenant: Optional[str] = None):
+        self.loop = loop
+        self.tenant = tenant
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def _deliver(self, events: List[Dict[str, Any]]):
+        for change in events:
+            if change.get("tenant") != self.tenant and change["type"] != "reset":
+                continue
+            try:
+                self.queue.put_nowait(change)
+            except asyncio.QueueFull:
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self.queue.put_nowait({"id": change["id"], "type": "reset"})
+                return
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+def record_change(session: Session, kind: str, taskid: Optional[int] = None, **fields):
+    """
+    Queues a change event on the session. It is published only if the
+    session's transaction commits and discarded on rollback.
+    """
+    change = {"type": kind}
+    if taskid is not None:
+        change["taskid"] = taskid
+    change.update(fields)
+    session.info.setdefault(_PENDING_KEY, []).append(change)
+
+
+def pending_changes(session: Session) -> List[Dict[str, Any]]:
+    """Changes recorded on the session that will be published when it commits."""
+    return session.info.get(_PENDING_KEY, [])
+
+
+def pending_change_count(session: Session) -> int:
+    return len(session.info.get(_PENDING_KEY, ()))
+
+
+def discard_changes_after(session: Session, count: int):
+    """Drops changes recorded after the first `count`, e.g. when a savepoint rolls back."""
+    pending = session.info.get(_PENDING_KEY)
+    if pending:
+        del pending[count:]
+
+
+# Both hooks also fire when a savepoint is released or rolled back. Only the
+# outermost transaction decides: its changes are not visible to other
+# connections before then, and a savepoint's own changes are dropped by
+# `discard_changes_after`.
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session):
+    if session.in_nested_transaction():
+        return
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        publish(pending, session.info.get("tenant"))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session):
+    if session.in_nested_transaction():
+        return
+    session.info.pop(_PENDING_KEY, None)
+
+
+def publish(changes: List[Dict[str, Any]], tenant: Optional[str] = None):
+    """
+    Numbers the changes and hands them to listeners and SSE subscribers.
+    Changes to a tenant database carry its `tenant`; subscribers only see
+    their own tenant's events.
+    """
+    global _sequence
+    with _lock:
+        events = []
+        for change in changes:
+            _sequence += 1
+            numbered = {"id": _sequence, "at": datetime.now(), **change}
+            if tenant is not None:
+                numbered["tenant"] = tenant
+            events.append(numbered)
+        if events:
+            _last_ids[tenant] = _sequence
+        _recent.extend(events)
+        listeners = list(_listeners)
+        subscribers = list(_subscribers)
+
+    for listener in listeners:
+        try:
+            listener(events)
+        except Exception as e:
+            logging.error(f"Change listener {listener!r} failed: {e}")
+
+    by_loop: Dict[asyncio.AbstractEventLoop, List[Subscriber]] = {}
+    for subscriber in subscribers:
+        by_loop.setdefault(subscriber.loop, []).append(subscriber)
+    for loop, group in by_loop.items():
+        try:
+            loop.call_soon_threadsafe(_fan_out, group, events)
+        except RuntimeError:
+            # Loop already closed; its subscribers are gone with it.
+            with _lock:
+                _subscribers.difference_update(group)
+
+
+def _fan_out(subscribers: List[Subscriber], events: List[Dict[str, Any]]):
+    for subscriber in subscribers:
+        subscriber._deliver(events)
+
+
+def add_listener(listener: Callable[[List[Dict[str, Any]]], None]):
+    """Registers an in-process callback run synchronously after each commit."""
+    with _lock:
+        if listener not in _listeners:
+            _listeners.append(listener)
+
+
+def remove_listener(listener: Callable[[List[Dict[str, Any]]], None]):
+    with _lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+
+def subscribe(last_event_id: Optional[int] = None, tenant: Optional[str] = None) -> Optional[Subscriber]:
+    """
+    Creates a subscriber to `tenant`'s events on the running loop, or
+    returns None when the subscriber limit is reached. Events newer than
+    `last_event_id` that are still in the replay buffer are queued
+    immediately.
+    """
+    subscriber = Subscriber(asyncio.get_running_loop(), SUBSCRIBER_QUEUE_SIZE, tenant)
+    with _lock:
+        if len(_subscribers) >= MAX_SUBSCRIBERS:
+            return None
+        if last_event_id is not None:
+            if last_event_id > _sequence or (_recent and _recent[0]["id"] > last_event_id + 1):
+                # Restarted or fell out of the replay window.
+                subscriber._deliver([{"id": _sequence, "type": "reset"}])
+            else:
+                subscriber._deliver([e for e in _recent if e["id"] > last_event_id])
+        _subscribers.add(subscriber)
+    return subscriber
+
+
+def unsubscribe(subscriber: Subscriber):
+    with _lock:
+        _subscribers.discard(subscriber)
+
+
+def subscriber_count() -> int:
+    return len(_subscribers)
+
+
+def get_data_version(tenant: Optional[str] = None) -> int:
+    """Sequence number of the last change published for `tenant`'s database; 0 before the first."""
+    return _last_ids.get(tenant, 0)
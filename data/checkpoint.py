@@ -0,0 +1,79 @@
+import logging
+import sqlite3
+import threading
+from typing import Optional
+
+import config
+from data.db_session import Database
+from data.sqlite_backup import BackupError, copy_database
+
+CHECKPOINT_SECONDS = getattr(config, "CHECKPOINT_SECONDS", 60)
+CHECKPOINT_PAGES_PER_STEP = getattr(config, "CHECKPOINT_PAGES_PER_STEP", 1024)
+CHECKPOINT_STEP_PAUSE_MS = getattr(config, "CHECKPOINT_STEP_PAUSE_MS", 5)
+
+
+class Checkpointer:
+    """
+    Copies a local-first database back to its `checkpoint_path` every
+    CHECKPOINT_SECONDS, and once more when closed, skipping rounds in which
+    nothing was committed. The copy is made by `copy_database`, so the
+    synced file is only ever replaced by a complete, verified copy. There
+    is one per local-first database, started when its schema is ready.
+    """
+
+    def __init__(self, database: Database, interval_seconds: float = CHECKPOINT_SECONDS):
+        self._database = database
+        self._interval_seconds = interval_seconds
+        self._condition = threading.Condition()
+        self._closed = False
+        # PRAGMA data_version on a connection of our own changes whenever another connection commits.
+        self._watch = sqlite3.connect(database.path, check_same_thread=False)
+        self._copied_version: Optional[int] = None
+        self._checkpoint_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="db-checkpoint", daemon=True)
+        self._thread.start()
+
+    def checkpoint(self, force: bool = False) -> bool:
+        """Copies the database to the checkpoint path unless nothing changed since the last copy. True if copied."""
+        with self._checkpoint_lock:
+            version = self._watch.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._copied_version and not force:
+                return False
+            seconds = copy_database(
+                self._database.path,
+                self._database.checkpoint_path,
+                pages_per_step=CHECKPOINT_PAGES_PER_STEP,
+                step_pause_seconds=CHECKPOINT_STEP_PAUSE_MS / 1000,
+            )
+            self._copied_version = version
+            logging.info(f"Checkpointed {self._database.path} to {self._database.checkpoint_path} in {seconds:.2f}s")
+            return True
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait(self._interval_seconds)
+                if self._closed:
+                    return
+            self._checkpoint_logged()
+
+    def _checkpoint_logged(self):
+        try:
+            self.checkpoint()
+        except (BackupError, sqlite3.Error, OSError) as e:
+            logging.error(f"Checkpoint of {self._database.path} failed: {e}")
+
+    def close(self):
+        """Stops the timer and takes a final checkpoint; call after the last write."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self._checkpoint_logged()
+        self._watch.close()
+
+
+def start_checkpointer(database: Database):
+    """Starts checkpointing a local-first database whose schema is ready; see Database.ensure_schema."""
+    if database.checkpoint_path:
+        database.local("checkpointer", Checkpointer)
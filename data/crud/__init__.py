@@ -0,0 +1 @@
+from data.crud import project_crud  # noqa: F401  registers the project rollup maintenance
@@ -0,0 +1,40 @@
+from typing import List, Tuple
+
+from data.db_session import reads
+from data.models.task_archive_model import ArchivedTask, ArchivedTaskTagLink
+from data.models.task_model import Task
+from data.models.task_tag_link_model import TaskTagLink
+from sqlalchemy import func, select, union_all
+from sqlalchemy.orm import Session
+
+# Columns of a task fact row, in order; times are Julian day numbers so the
+# rows load straight into a float array without parsing datetimes.
+FACT_COLUMNS = ("taskid", "parenttaskid", "created", "completed", "start", "defer_count", "is_completed", "rootid")
+
+
+def _facts(model):
+    return select(
+        model.taskid,
+        model.parenttaskid,
+        func.julianday(model.createdat),
+        func.julianday(model.completed_at),
+        func.julianday(model.earlieststarttime),
+        model.defer_count,
+        model.status == "Completed",
+        model.completed_rootid,
+    ).where(model.deleted.is_(False))
+
+
+@reads
+def get_task_facts(session: Session) -> List[tuple]:
+    """FACT_COLUMNS of every task that is not deleted, live or archived."""
+    # Plain tuples: numpy takes Row objects for mappings and probes each one.
+    return [tuple(row) for row in session.execute(union_all(_facts(Task), _facts(ArchivedTask)))]
+
+
+@reads
+def get_tag_link_pairs(session: Session) -> List[Tuple[int, int]]:
+    """(taskid, tagid) of every tag link, live or archived."""
+    query = union_all(select(TaskTagLink.taskid, TaskTagLink.tagid),
+                      select(ArchivedTaskTagLink.taskid, ArchivedTaskTagLink.tagid))
+    return [tuple(row) for row in session.execute(query)]
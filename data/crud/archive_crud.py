@@ -0,0 +1,236 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Set
+
+from data.change_feed import record_change
+from data.db_session import reads, writes
+from data.models.task_archive_model import (ArchivedTask,
+                                            ArchivedTaskArtifact,
+                                            ArchivedTaskDependency,
+                                            ArchivedTaskNote,
+                                            ArchivedTaskTagLink)
+from data.models.task_artifact_model import TaskArtifact
+from data.models.task_dependency_model import TaskDependencies
+from data.models.task_model import Task
+from data.models.task_note_model import TaskNote
+from data.models.task_tag_link_model import TaskTagLink
+from data.read_models import TaskRow, select_task_rows, to_task_rows
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, aliased
+
+# Keeps IN lists well below SQLite's bound-parameter limit.
+ID_CHUNK_SIZE = 500
+
+# (live model, archive model, surrogate key that is not carried across).
+# Note and link ids are not referenced anywhere, and live ids may be reused
+# once their rows are archived, so each side numbers its own rows.
+_ARCHIVED_TABLES = [
+    (TaskNote, ArchivedTaskNote, "noteid"),
+    (TaskTagLink, ArchivedTaskTagLink, "tasktagid"),
+    (TaskArtifact, ArchivedTaskArtifact, None),
+]
+
+
+def _chunks(ids: List[int]):
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        yield ids[start:start + ID_CHUNK_SIZE]
+
+
+def _shared_columns(source, target, skip=None) -> List[str]:
+    target_columns = target.__table__.columns.keys()
+    return [name for name in source.__table__.columns.keys() if name in target_columns and name != skip]
+
+
+def _copy_rows(session: Session, source, target, ids: List[int], skip_column=None):
+    columns = _shared_columns(source, target, skip_column)
+    source_table = source.__table__
+    session.execute(
+        insert(target.__table__).from_select(
+            columns,
+            select(*[source_table.c[name] for name in columns]).where(source_table.c.taskid.in_(ids))
+        )
+    )
+    session.execute(delete(source.__table__).where(source_table.c.taskid.in_(ids)))
+
+
+def _move_dependencies(session: Session, source, target, condition):
+    columns = ["dependenttaskid", "blockingtaskid"]
+    session.execute(
+        sqlite_insert(target.__table__)
+        .from_select(columns, select(source.dependenttaskid, source.blockingtaskid).where(condition))
+        .on_conflict_do_nothing()
+    )
+    session.execute(delete(source).where(condition))
+
+
+def _is_finished(model):
+    return or_(model.status == "Completed", model.deleted.is_(True))
+
+
+def _subtree_rows(session: Session, model, root_ids: List[int]) -> Dict[int, List[tuple]]:
+    """Maps each root id to the (taskid, finished) rows of its subtree, root included."""
+    tree = (
+        select(model.taskid, model.taskid.label("rootid"), _is_finished(model).label("finished"))
+        .where(model.taskid.in_(root_ids))
+        .cte("subtree", recursive=True)
+    )
+    child = aliased(model)
+    # UNION rather than UNION ALL so a parenttaskid cycle cannot recurse forever.
+    tree = tree.union(
+        select(child.taskid, tree.c.rootid, _is_finished(child))
+        .where(child.parenttaskid == tree.c.taskid)
+    )
+    subtrees: Dict[int, List[tuple]] = {}
+    for taskid, rootid, finished in session.execute(select(tree)):
+        subtrees.setdefault(rootid, []).append((taskid, finished))
+    return subtrees
+
+
+@reads
+def get_archive_candidate_roots(session: Session, cutoff: datetime) -> List[int]:
+    """
+    Tasks completed or deleted before `cutoff` whose parent is still live.
+    Finished children of a finished parent move together with that parent.
+    """
+    parent = aliased(Task)
+    finished_before_cutoff = or_(
+        and_(Task.status == "Completed", func.coalesce(Task.completed_at, Task.lastedittime) < cutoff),
+        and_(Task.deleted.is_(True), func.coalesce(Task.deleted_date, Task.lastedittime) < cutoff),
+    )
+    query = (
+        select(Task.taskid)
+        .outerjoin(parent, Task.parenttaskid == parent.taskid)
+        .where(
+            finished_before_cutoff,
+            or_(parent.taskid.is_(None), ~_is_finished(parent))
+        )
+        .order_by(Task.taskid.asc())
+    )
+    return session.execute(query).scalars().all()
+
+
+@writes
+def archive_finished_subtrees(session: Session, older_than_days: int, batch_size: int = ID_CHUNK_SIZE) -> int:
+    """
+    Moves old completed and deleted subtrees, with their notes, tag links,
+    artifact links and dependencies, into the archive tables. Subtrees that still contain an
+    unfinished task are left alone. Each batch of roots commits separately.
+    Returns the number of tasks archived.
+    """
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    root_ids = get_archive_candidate_roots(session, cutoff)
+    # SQLite hands out max(taskid) + 1 for new rows, so the newest task must
+    # stay put or an archived id could be reissued.
+    newest_id = session.execute(select(func.max(Task.taskid))).scalar()
+
+    archived = 0
+    for start in range(0, len(root_ids), batch_size):
+        batch = root_ids[start:start + batch_size]
+        task_ids: List[int] = []
+        parents = dict(session.execute(select(Task.taskid, Task.parenttaskid).where(Task.taskid.in_(batch))).all())
+        for rootid, rows in _subtree_rows(session, Task, batch).items():
+            if all(finished for _, finished in rows) and newest_id not in {taskid for taskid, _ in rows}:
+                task_ids.extend(taskid for taskid, _ in rows)
+                record_change(session, "archived", rootid, count=len(rows), parenttaskid=parents.get(rootid))
+
+        for ids in _chunks(task_ids):
+            for live, archive, surrogate_key in _ARCHIVED_TABLES:
+                _copy_rows(session, live, archive, ids, skip_column=surrogate_key)
+            _move_dependencies(
+                session, TaskDependencies, ArchivedTaskDependency,
+                TaskDependencies.dependenttaskid.in_(ids) | TaskDependencies.blockingtaskid.in_(ids),
+            )
+            _copy_rows(session, Task, ArchivedTask, ids)
+
+        session.commit()
+        archived += len(task_ids)
+
+    return archived
+
+
+def _archived_ancestor_ids(session: Session, task_id: int) -> List[int]:
+    """The archived tasks above `task_id`, up to the first live (or missing) one."""
+    ancestors: List[int] = []
+    parent_id = session.execute(select(ArchivedTask.parenttaskid).where(ArchivedTask.taskid == task_id)).scalar()
+    while parent_id is not None and parent_id not in ancestors and parent_id != task_id:
+        if session.get(Task, parent_id) is not None:
+            break
+        row = session.execute(select(ArchivedTask.parenttaskid).where(ArchivedTask.taskid == parent_id)).first()
+        if row is None:
+            break
+        ancestors.append(parent_id)
+        parent_id = row[0]
+    return ancestors
+
+
+@writes
+def restore_archived_subtree(session: Session, task_id: int) -> bool:
+    """
+    Moves an archived task and its archived descendants back into the live
+    tables, with the archived tasks above it (just those, not their other
+    subtrees) so it comes back under its parent. A top restored task whose
+    parent no longer exists becomes top level. Dependencies come back once
+    both of their tasks are live. Does not commit. Returns False if the
+    task is not archived or one of the ids has been taken by a live task.
+    """
+    rows = _subtree_rows(session, ArchivedTask, [task_id]).get(task_id)
+    if not rows:
+        return False
+    ancestors = _archived_ancestor_ids(session, task_id)
+    task_ids = [taskid for taskid, _ in rows] + ancestors
+
+    taken: Set[int] = set()
+    for ids in _chunks(task_ids):
+        taken.update(session.execute(select(Task.taskid).where(Task.taskid.in_(ids))).scalars())
+    if taken:
+        return False
+
+    for ids in _chunks(task_ids):
+        _copy_rows(session, ArchivedTask, Task, ids)
+        for live, archive, surrogate_key in _ARCHIVED_TABLES:
+            _copy_rows(session, archive, live, ids, skip_column=surrogate_key)
+    top_id = ancestors[-1] if ancestors else task_id
+    top = session.get(Task, top_id)
+    if top.parenttaskid is not None and session.get(Task, top.parenttaskid) is None:
+        top.parenttaskid = None
+        session.flush()
+
+    dependent, blocking = aliased(Task), aliased(Task)
+    for ids in _chunks(task_ids):
+        both_live = (
+            (ArchivedTaskDependency.dependenttaskid.in_(ids) | ArchivedTaskDependency.blockingtaskid.in_(ids))
+            & select(dependent.taskid).where(dependent.taskid == ArchivedTaskDependency.dependenttaskid).exists()
+            & select(blocking.taskid).where(blocking.taskid == ArchivedTaskDependency.blockingtaskid).exists()
+        )
+        _move_dependencies(session, ArchivedTaskDependency, TaskDependencies, both_live)
+    record_change(session, "restored", top_id, count=len(task_ids))
+    session.expire_all()
+    return True
+
+
+@reads
+def get_archived_done_tasks(session: Session, limit: int) -> List[TaskRow]:
+    query = (
+        select_task_rows(ArchivedTask)
+        .where(
+            ArchivedTask.status == "Completed",
+            ArchivedTask.deleted == False
+        )
+        .order_by(ArchivedTask.completed_at.desc())
+        .limit(limit)
+    )
+    return to_task_rows(session.execute(query))
+
+
+@reads
+def get_archived_deleted_tasks(session: Session, cutoff: datetime) -> List[ArchivedTask]:
+    stmt = (
+        select(ArchivedTask)
+        .where(
+            ArchivedTask.deleted == True,
+            ArchivedTask.deleted_date != None,
+            ArchivedTask.deleted_date >= cutoff
+        )
+        .order_by(ArchivedTask.deleted_date.desc())
+    )
+    return session.execute(stmt).scalars().all()
@@ -1,28 +1,35 @@
 from sqlalchemy import or_
 
+from data.change_feed import record_change
+from data.db_session import reads, writes
 from data.models.artifact_model import Artifact
 from data.models.task_artifact_model import TaskArtifact
 
+@writes
 def create_artifact(session, url: str):
     artifact_data = {"url": url}
     artifact = Artifact(**artifact_data)
     session.add(artifact)
     session.flush()
+    record_change(session, "artifact_created", artifact_id=artifact.id, url=url)
     return artifact
 
 
+@reads
 def get_artifact_by_id(session, artifact_id):
     """
     Retrieve an Artifact by its ID.
     """
     return session.query(Artifact).filter(Artifact.id == artifact_id).first()
 
+@reads
 def get_artifacts(session, skip=0, limit=100):
     """
     Retrieve a list of Artifacts with optional pagination.
     """
     return session.query(Artifact).offset(skip).limit(limit).all()
 
+@writes
 def update_artifact(session, artifact_id, update_data):
     """
     Update an existing Artifact with new data.
@@ -37,8 +44,11 @@ def update_artifact(session, artifact_id, update_data):
             setattr(artifact, key, value)
 
     session.flush()  # Flush changes to the session
+    record_change(session, "artifact_updated", artifact_id=artifact_id,
+                  fields={key: value for key, value in update_data.items() if hasattr(artifact, key)})
     return artifact
 
+@writes
 def delete_artifact(session, artifact_id):
     """
     Delete an Artifact by its ID.
@@ -51,10 +61,12 @@ def delete_artifact(session, artifact_id):
 
     session.delete(artifact)
     session.flush()
+    record_change(session, "artifact_deleted", artifact_id=artifact_id)
     return True
 
 
 # /Users/behroozkarjoo/dev/ai/db_layer/crud/artifacts.py
+@reads
 def get_artifact_types(session):
     """
     Retrieve distinct artifact types.
@@ -62,6 +74,7 @@ def get_artifact_types(session):
     return session.query(Artifact.artifact_type).distinct().all()
 
 
+@reads
 def get_artifacts_by_wildcard(session, wildcard=None):
     query = session.query(Artifact)
     if wildcard:
@@ -75,18 +88,33 @@ def get_artifacts_by_wildcard(session, wildcard=None):
     return res
 
 
+@writes
 def create_task_artifact(session, taskid, artifact_id):
     link = TaskArtifact(taskid=taskid, artifact_id=artifact_id)
     session.add(link)
     session.flush()
+    record_change(session, "artifact_linked", taskid, artifact_id=artifact_id)
     return link
 
+@reads
 def get_task_artifacts_by_task(session, taskid):
     return session.query(TaskArtifact).filter(TaskArtifact.taskid == taskid).all()
 
+@reads
+def get_artifacts_for_task(session, taskid):
+    return (
+        session.query(Artifact)
+        .join(TaskArtifact, TaskArtifact.artifact_id == Artifact.id)
+        .filter(TaskArtifact.taskid == taskid)
+        .order_by(Artifact.id)
+        .all()
+    )
+
+@reads
 def get_tasks_by_artifact(session, artifact_id):
     return session.query(TaskArtifact).filter(TaskArtifact.artifact_id == artifact_id).all()
 
+@writes
 def delete_task_artifact(session, taskid, artifact_id):
     link = session.query(TaskArtifact).filter(
         TaskArtifact.taskid == taskid,
@@ -96,4 +124,5 @@ def delete_task_artifact(session, taskid, artifact_id):
         return False
     session.delete(link)
     session.flush()
+    record_change(session, "artifact_unlinked", taskid, artifact_id=artifact_id)
     return True
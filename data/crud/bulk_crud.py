@@ -0,0 +1,247 @@
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from data.change_feed import record_change
+from data.crud.archive_crud import restore_archived_subtree
+from data.crud.completion_crud import (add_completion_counts, count_completions,
+                                       move_completion_roots)
+from data.crud.task_crud import count_deferral, repeat_task
+from data.db_session import writes
+from data.models.tag_model import TaskTag
+from data.models.task_archive_model import ArchivedTask
+from data.models.task_model import Task
+from data.models.task_tag_link_model import TaskTagLink
+from sqlalchemy import delete, exists, insert, literal, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, aliased
+
+# Per-id outcomes of a bulk operation.
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+NOT_FOUND = "not_found"
+INVALID_PARENT = "invalid_parent"
+
+
+def _results(task_ids: List[int], found: Iterable[int], updated: Iterable[int]) -> Dict[int, str]:
+    found, updated = set(found), set(updated)
+    return {
+        task_id: UPDATED if task_id in updated else UNCHANGED if task_id in found else NOT_FOUND
+        for task_id in task_ids
+    }
+
+
+def _live_ids(session: Session, task_ids: List[int]) -> Set[int]:
+    query = select(Task.taskid).where(Task.taskid.in_(task_ids), Task.deleted.is_(False))
+    return set(session.execute(query).scalars())
+
+
+def _update_returning(session: Session, task_ids: List[int], *criteria, **values) -> List[int]:
+    stmt = (
+        update(Task)
+        .where(Task.taskid.in_(task_ids), *criteria)
+        .values(**values, lastedittime=datetime.utcnow())
+        .returning(Task.taskid)
+    )
+    return list(session.execute(stmt, execution_options={"synchronize_session": False}).scalars())
+
+
+def _root_ids(session: Session, task_ids: List[int]) -> Dict[int, int]:
+    """Maps each task to the top of its parent chain in one recursive query."""
+    chain = (
+        select(Task.taskid.label("origin"), Task.taskid, Task.parenttaskid)
+        .where(Task.taskid.in_(task_ids))
+        .cte("chain", recursive=True)
+    )
+    parent = aliased(Task)
+    # UNION so a parenttaskid cycle cannot recurse forever.
+    chain = chain.union(
+        select(chain.c.origin, parent.taskid, parent.parenttaskid)
+        .where(parent.taskid == chain.c.parenttaskid)
+    )
+    roots = dict(session.execute(select(chain.c.origin, chain.c.taskid).where(chain.c.parenttaskid.is_(None))).all())
+    # Tasks on a cycle or under a dangling parent count as their own root.
+    return {task_id: roots.get(task_id, task_id) for task_id in task_ids}
+
+
+def _open_subtree_ids(session: Session, task_ids: List[int]) -> List[int]:
+    """The given tasks plus their incomplete, undeleted descendants."""
+    tree = select(Task.taskid).where(Task.taskid.in_(task_ids)).cte("subtree", recursive=True)
+    child = aliased(Task)
+    tree = tree.union(
+        select(child.taskid).where(
+            child.parenttaskid == tree.c.taskid,
+            child.status != "Completed",
+            child.deleted.is_(False),
+        )
+    )
+    return list(session.execute(select(tree.c.taskid)).scalars())
+
+
+@writes
+def bulk_complete(session: Session, task_ids: List[int]) -> Dict[int, str]:
+    """
+    Completes the tasks and their open subtasks, repeating the selected ones
+    that have a repeat interval, as marking each done would.
+    """
+    now = datetime.now()
+    live = _live_ids(session, task_ids)
+    repeating = session.execute(
+        select(Task.taskid).where(
+            Task.taskid.in_(live), Task.repeatinterval.is_not(None), Task.status != "Completed"
+        )
+    ).scalars().all()
+    for task_id in repeating:
+        repeat_task(session, task_id)
+
+    roots = _root_ids(session, _open_subtree_ids(session, list(live)))
+    completed: List[int] = []
+    by_root: Dict[int, List[int]] = {}
+    for task_id, root_id in roots.items():
+        by_root.setdefault(root_id, []).append(task_id)
+    for root_id, ids in by_root.items():
+        completed += _update_returning(
+            session, ids, Task.status != "Completed",
+            status="Completed", completed_at=now, completed_rootid=root_id,
+        )
+
+    if completed:
+        deltas = Counter({("all", 0): len(completed)})
+        deltas.update(("root", roots[task_id]) for task_id in completed)
+        tag_ids = session.execute(select(TaskTagLink.tagid).where(TaskTagLink.taskid.in_(completed))).scalars()
+        deltas.update(("tag", tag_id) for tag_id in tag_ids)
+        add_completion_counts(session, now.date(), deltas)
+    for task_id in completed:
+        record_change(session, "completed", task_id)
+    session.commit()
+    return _results(task_ids, live, completed)
+
+
+@writes
+def bulk_soft_delete(session: Session, task_ids: List[int]) -> Dict[int, str]:
+    live = _live_ids(session, task_ids)
+    count_completions(session, live, -1)
+    deleted = _update_returning(session, list(live), deleted=True, deleted_date=datetime.now())
+    for task_id in deleted:
+        record_change(session, "deleted", task_id)
+    session.commit()
+    return _results(task_ids, live, deleted)
+
+
+@writes
+def bulk_undelete(session: Session, task_ids: List[int]) -> Dict[int, str]:
+    """Undeletes the tasks, restoring deleted ones that were moved to the archive first."""
+    found = set(session.execute(select(Task.taskid).where(Task.taskid.in_(task_ids))).scalars())
+    archived = session.execute(
+        select(ArchivedTask.taskid).where(
+            ArchivedTask.taskid.in_(set(task_ids) - found), ArchivedTask.deleted.is_(True)
+        )
+    ).scalars().all()
+    for task_id in archived:
+        restore_archived_subtree(session, task_id)
+    # A task may also have come back as the parent of another restored one.
+    found.update(session.execute(select(Task.taskid).where(Task.taskid.in_(archived))).scalars())
+
+    undeleted = _update_returning(session, list(found), Task.deleted.is_(True), deleted=False, deleted_date=None)
+    count_completions(session, undeleted, 1)
+    for task_id in undeleted:
+        record_change(session, "updated", task_id, fields={"deleted": False})
+    session.commit()
+    return _results(task_ids, found, undeleted)
+
+
+@writes
+def bulk_set_fields(session: Session, task_ids: List[int], values: Dict[str, Any]) -> Dict[int, str]:
+    """Sets the same column values (flags, earliest start time) on every live task."""
+    live = _live_ids(session, task_ids)
+    changed = [getattr(Task, name).is_distinct_from(value) for name, value in values.items()]
+    deferral = count_deferral(values["earlieststarttime"]) if "earlieststarttime" in values else {}
+    updated = _update_returning(session, list(live), or_(*changed), **values, **deferral)
+    for task_id in updated:
+        record_change(session, "updated", task_id, fields=values)
+    session.commit()
+    return _results(task_ids, live, updated)
+
+
+def _tag_id(session: Session, tag_name: str) -> int:
+    session.execute(sqlite_insert(TaskTag).values(name=tag_name).on_conflict_do_nothing(index_elements=[TaskTag.name]))
+    return session.execute(select(TaskTag.id).where(TaskTag.name == tag_name)).scalar_one()
+
+
+@writes
+def bulk_add_tag(session: Session, task_ids: List[int], tag_name: str) -> Dict[int, str]:
+    live = _live_ids(session, task_ids)
+    tag_id = _tag_id(session, tag_name)
+    already_tagged = exists().where(TaskTagLink.taskid == Task.taskid, TaskTagLink.tagid == tag_id)
+    stmt = (
+        insert(TaskTagLink)
+        .from_select(
+            ["taskid", "tagid"],
+            select(Task.taskid, literal(tag_id)).where(Task.taskid.in_(live), ~already_tagged),
+        )
+        .returning(TaskTagLink.taskid)
+    )
+    tagged = list(session.execute(stmt).scalars())
+    count_completions(session, tagged, 1, tag_id=tag_id)
+    for task_id in tagged:
+        record_change(session, "tagged", task_id, tag=tag_name)
+    session.commit()
+    return _results(task_ids, live, tagged)
+
+
+@writes
+def bulk_remove_tag(session: Session, task_ids: List[int], tag_name: str) -> Dict[int, str]:
+    live = _live_ids(session, task_ids)
+    tag_id = session.execute(select(TaskTag.id).where(TaskTag.name == tag_name)).scalar()
+    stmt = (
+        delete(TaskTagLink)
+        .where(TaskTagLink.taskid.in_(live), TaskTagLink.tagid == tag_id)
+        .returning(TaskTagLink.taskid)
+    )
+    untagged = set(session.execute(stmt, execution_options={"synchronize_session": False}).scalars())
+    count_completions(session, untagged, -1, tag_id=tag_id)
+    for task_id in untagged:
+        record_change(session, "untagged", task_id, tag=tag_name)
+    session.commit()
+    return _results(task_ids, live, untagged)
+
+
+def _ancestor_ids(session: Session, task_id: int) -> Set[int]:
+    """`task_id` and all of its ancestors."""
+    chain = select(Task.taskid, Task.parenttaskid).where(Task.taskid == task_id).cte("ancestors", recursive=True)
+    chain = chain.union(select(Task.taskid, Task.parenttaskid).where(Task.taskid == chain.c.parenttaskid))
+    return set(session.execute(select(chain.c.taskid)).scalars())
+
+
+@writes
+def bulk_reparent(session: Session, task_ids: List[int], parent_id: Optional[int]) -> Dict[int, str]:
+    """
+    Moves the tasks under `parent_id`, or to the top level when it is None.
+    Tasks that would end up under themselves are reported as invalid_parent.
+    Raises ValueError if the parent is missing or deleted.
+    """
+    live = _live_ids(session, task_ids)
+    movable = set(live)
+    if parent_id is not None:
+        if not _live_ids(session, [parent_id]):
+            raise ValueError(f"Task {parent_id} not found.")
+        # The parent and its ancestors cannot move under it.
+        movable -= _ancestor_ids(session, parent_id)
+
+    previous_parents = dict(
+        session.execute(select(Task.taskid, Task.parenttaskid).where(Task.taskid.in_(movable))).all()
+    )
+    moved = _update_returning(
+        session, list(movable),
+        Task.parenttaskid.is_distinct_from(parent_id),
+        parenttaskid=parent_id,
+    )
+    move_completion_roots(session, moved)
+    for task_id in moved:
+        record_change(session, "reparented", task_id, parenttaskid=parent_id,
+                      previous_parenttaskid=previous_parents.get(task_id))
+    session.commit()
+    results = _results(task_ids, live, moved)
+    for task_id in live - movable:
+        results[task_id] = INVALID_PARENT
+    return results
@@ -0,0 +1,215 @@
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from data.db_session import reads, writes
+from data.models.completion_rollup_model import CompletionRollup
+from data.models.tag_model import TaskTag
+from data.models.task_archive_model import ArchivedTask, ArchivedTaskTagLink
+from data.models.task_model import Task
+from data.models.task_tag_link_model import TaskTagLink
+from sqlalchemy import func, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session, aliased
+
+
+@writes
+def bump_completion_rollups(session: Session, day: date, root_id: Optional[int], tag_ids: List[int], delta: int):
+    """Adds `delta` to the day's "all", root and per-tag completion counts. Does not commit."""
+    keys = [("all", 0)] + [("tag", tag_id) for tag_id in tag_ids]
+    if root_id is not None:
+        keys.append(("root", root_id))
+    add_completion_counts(session, day, {key: delta for key in keys})
+
+
+@writes
+def add_completion_counts(session: Session, day: date, deltas: Dict[Tuple[str, int], int]):
+    """Adds each (scope, key) -> delta to the day's completion rollups. Does not commit."""
+    for (scope, key), delta in deltas.items():
+        stmt = insert(CompletionRollup).values(day=day, scope=scope, key=key, count=max(delta, 0))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CompletionRollup.day, CompletionRollup.scope, CompletionRollup.key],
+            set_={"count": func.max(CompletionRollup.count + delta, 0)},
+        )
+        session.execute(stmt)
+
+
+@reads
+def get_task_tag_ids(session: Session, task_id: int) -> List[int]:
+    return session.execute(select(TaskTagLink.tagid).where(TaskTagLink.taskid == task_id)).scalars().all()
+
+
+@writes
+def count_completions(session: Session, task_ids: Iterable[int], delta: int, tag_id: Optional[int] = None):
+    """
+    Adds `delta` to the rollups of each given task that is completed and
+    not deleted, on its completion day: its "all", root and tag counts, or
+    only the count of `tag_id` when that tag link alone changes. Does not
+    commit.
+    """
+    rows = session.execute(
+        select(Task.taskid, Task.completed_at, Task.completed_rootid).where(
+            Task.taskid.in_(list(task_ids)),
+            Task.status == "Completed",
+            Task.completed_at.is_not(None),
+            Task.deleted.is_(False),
+        )
+    ).all()
+    tags: Dict[int, List[int]] = {}
+    if rows and tag_id is None:
+        links = select(TaskTagLink.taskid, TaskTagLink.tagid).where(TaskTagLink.taskid.in_([row[0] for row in rows]))
+        for task_id, link_tag_id in session.execute(links):
+            tags.setdefault(task_id, []).append(link_tag_id)
+
+    by_day: Dict[date, Counter] = {}
+    for task_id, completed_at, root_id in rows:
+        if tag_id is not None:
+            keys = [("tag", tag_id)]
+        else:
+            keys = [("all", 0)] + [("tag", link_tag_id) for link_tag_id in tags.get(task_id, ())]
+            if root_id is not None:
+                keys.append(("root", root_id))
+        by_day.setdefault(completed_at.date(), Counter()).update(dict.fromkeys(keys, delta))
+    for day, deltas in by_day.items():
+        add_completion_counts(session, day, deltas)
+
+
+@reads
+def completion_root_ids(session: Session, task_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    The top of each given task's parent chain, past deleted tasks, as
+    completed_rootid records it. Tasks on a parenttaskid cycle are left out.
+    """
+    chain = (
+        select(Task.taskid.label("origin"), Task.taskid, Task.parenttaskid)
+        .where(Task.taskid.in_(list(task_ids)))
+        .cte("chain", recursive=True)
+    )
+    parent = aliased(Task)
+    # UNION so a parenttaskid cycle cannot recurse forever.
+    chain = chain.union(
+        select(chain.c.origin, parent.taskid, parent.parenttaskid).where(parent.taskid == chain.c.parenttaskid)
+    )
+    return dict(session.execute(select(chain.c.origin, chain.c.taskid).where(chain.c.parenttaskid.is_(None))).all())
+
+
+@writes
+def move_completion_roots(session: Session, task_ids: Iterable[int]):
+    """
+    Call after reparenting the given tasks: points the completed tasks in
+    their subtrees at the root they now sit under and moves their root
+    counts along. Subtrees on a parenttaskid cycle are left alone. Does not
+    commit.
+    """
+    roots = completion_root_ids(session, task_ids)
+    if not roots:
+        return
+
+    tree = select(Task.taskid.label("origin"), Task.taskid).where(Task.taskid.in_(roots)).cte("subtree", recursive=True)
+    child = aliased(Task)
+    tree = tree.union(select(tree.c.origin, child.taskid).where(child.parenttaskid == tree.c.taskid))
+    completed = (
+        select(tree.c.origin, Task.taskid, Task.completed_at, Task.completed_rootid, Task.deleted)
+        .join(Task, Task.taskid == tree.c.taskid)
+        .where(Task.status == "Completed", Task.completed_at.is_not(None))
+    )
+    # A task under two of the moved tasks is reached twice, with the same root.
+    moved = {
+        task_id: (roots[origin], completed_at, old_root_id, deleted)
+        for origin, task_id, completed_at, old_root_id, deleted in session.execute(completed)
+        if roots[origin] != old_root_id
+    }
+
+    by_root: Dict[int, List[int]] = {}
+    by_day: Dict[date, Counter] = {}
+    for task_id, (root_id, completed_at, old_root_id, deleted) in moved.items():
+        by_root.setdefault(root_id, []).append(task_id)
+        if deleted:
+            continue
+        deltas = by_day.setdefault(completed_at.date(), Counter())
+        deltas[("root", root_id)] += 1
+        if old_root_id is not None:
+            deltas[("root", old_root_id)] -= 1
+    for root_id, ids in by_root.items():
+        # Bookkeeping, not an edit: keep lastedittime.
+        session.execute(
+            update(Task).where(Task.taskid.in_(ids)).values(completed_rootid=root_id, lastedittime=Task.lastedittime)
+        )
+    for day, deltas in by_day.items():
+        add_completion_counts(session, day, deltas)
+
+
+def _history_query(model, link_model, tag_name, root_id, before, limit):
+    query = select(model.taskid, model.taskname, model.completed_at, model.completed_rootid).where(
+        model.completed_at.is_not(None),
+        model.status == "Completed",
+        model.deleted.is_(False),
+    )
+    if tag_name:
+        query = (
+            query.join(link_model, link_model.taskid == model.taskid)
+            .join(TaskTag, TaskTag.id == link_model.tagid)
+            .where(TaskTag.name == tag_name)
+        )
+    if root_id is not None:
+        query = query.where(model.completed_rootid == root_id)
+    if before is not None:
+        query = query.where(tuple_(model.completed_at, model.taskid) < tuple_(*before))
+    return query.order_by(model.completed_at.desc(), model.taskid.desc()).limit(limit)
+
+
+@reads
+def get_completion_history(
+    session: Session,
+    tag_name: Optional[str] = None,
+    root_id: Optional[int] = None,
+    before: Optional[Tuple[datetime, int]] = None,
+    limit: int = 50,
+) -> list:
+    """
+    Completed tasks, newest first, from the live and archive tables.
+    `before` is the (completed_at, taskid) of the last row of the previous page.
+    """
+    rows = session.execute(_history_query(Task, TaskTagLink, tag_name, root_id, before, limit)).all()
+    rows += session.execute(_history_query(ArchivedTask, ArchivedTaskTagLink, tag_name, root_id, before, limit)).all()
+    rows.sort(key=lambda row: (row.completed_at, row.taskid), reverse=True)
+    return rows[:limit]
+
+
+@reads
+def get_completion_rollups(session: Session, since: date, scope: str) -> list:
+    """Per-key completion totals for `scope` since the given day, largest first."""
+    total = func.sum(CompletionRollup.count).label("count")
+    query = (
+        select(CompletionRollup.key, total)
+        .where(CompletionRollup.day >= since, CompletionRollup.scope == scope)
+        .group_by(CompletionRollup.key)
+        .having(total > 0)
+        .order_by(total.desc())
+    )
+    return session.execute(query).all()
+
+
+@reads
+def get_daily_completion_counts(session: Session, since: date) -> list:
+    query = (
+        select(CompletionRollup.day, CompletionRollup.count)
+        .where(CompletionRollup.day >= since, CompletionRollup.scope == "all")
+        .order_by(CompletionRollup.day.asc())
+    )
+    return session.execute(query).all()
+
+
+@reads
+def get_rollup_key_names(session: Session, scope: str, keys: List[int]) -> dict:
+    """Maps rollup keys to tag names or root task names."""
+    if not keys:
+        return {}
+    if scope == "tag":
+        rows = session.execute(select(TaskTag.id, TaskTag.name).where(TaskTag.id.in_(keys))).all()
+    else:
+        rows = session.execute(select(Task.taskid, Task.taskname).where(Task.taskid.in_(keys))).all()
+        rows += session.execute(
+            select(ArchivedTask.taskid, ArchivedTask.taskname).where(ArchivedTask.taskid.in_(keys))
+        ).all()
+    return dict(rows)
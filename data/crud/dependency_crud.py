@@ -0,0 +1,96 @@
+from typing import List, Tuple
+
+from data.change_feed import record_change
+from data.db_session import reads, writes
+from data.models.task_dependency_model import TaskDependencies
+from data.models.task_model import Task
+from sqlalchemy import delete, exists, or_, select
+from sqlalchemy.orm import Session
+
+
+def _is_finished(task: Task) -> bool:
+    return task.status == "Completed" or task.deleted
+
+
+@reads
+def depends_on(session: Session, task_id: int, other_id: int) -> bool:
+    """True if `task_id` is blocked, directly or transitively, by `other_id`."""
+    blockers = (
+        select(TaskDependencies.blockingtaskid.label("taskid"))
+        .where(TaskDependencies.dependenttaskid == task_id)
+        .cte("blockers", recursive=True)
+    )
+    # UNION so existing cycles cannot recurse forever.
+    blockers = blockers.union(
+        select(TaskDependencies.blockingtaskid).where(TaskDependencies.dependenttaskid == blockers.c.taskid)
+    )
+    return session.execute(select(exists().where(blockers.c.taskid == other_id))).scalar()
+
+
+@writes
+def add_dependency(session: Session, dependent_id: int, blocking_id: int) -> bool:
+    """
+    Makes `dependent_id` wait on `blocking_id`. Returns False if the link
+    already exists. Raises LookupError for a missing task and ValueError if
+    the link would create a cycle.
+    """
+    dependent = session.get(Task, dependent_id)
+    blocking = session.get(Task, blocking_id)
+    if not dependent or dependent.deleted or not blocking or blocking.deleted:
+        raise LookupError(dependent_id if not dependent or dependent.deleted else blocking_id)
+    if dependent_id == blocking_id or depends_on(session, blocking_id, dependent_id):
+        raise ValueError(f"Task {blocking_id} already depends on task {dependent_id}.")
+    if session.get(TaskDependencies, (dependent_id, blocking_id)):
+        return False
+
+    session.add(TaskDependencies(dependenttaskid=dependent_id, blockingtaskid=blocking_id))
+    record_change(session, "dependency_added", dependent_id,
+                  blockingtaskid=blocking_id, blocking_finished=_is_finished(blocking))
+    session.commit()
+    return True
+
+
+@writes
+def remove_dependency(session: Session, dependent_id: int, blocking_id: int) -> bool:
+    result = session.execute(
+        delete(TaskDependencies).where(
+            TaskDependencies.dependenttaskid == dependent_id,
+            TaskDependencies.blockingtaskid == blocking_id,
+        )
+    )
+    if not result.rowcount:
+        return False
+    record_change(session, "dependency_removed", dependent_id, blockingtaskid=blocking_id)
+    session.commit()
+    return True
+
+
+@reads
+def get_dependencies(session: Session, task_id: int) -> Tuple[List[Task], List[Task]]:
+    """The tasks `task_id` waits on, and the tasks waiting on it."""
+    blocking = session.execute(
+        select(Task)
+        .join(TaskDependencies, TaskDependencies.blockingtaskid == Task.taskid)
+        .where(TaskDependencies.dependenttaskid == task_id)
+        .order_by(Task.taskid)
+    ).scalars().all()
+    dependents = session.execute(
+        select(Task)
+        .join(TaskDependencies, TaskDependencies.dependenttaskid == Task.taskid)
+        .where(TaskDependencies.blockingtaskid == task_id)
+        .order_by(Task.taskid)
+    ).scalars().all()
+    return blocking, dependents
+
+
+@reads
+def get_all_dependencies(session: Session) -> List[tuple]:
+    """Every (dependenttaskid, blockingtaskid, blocking task finished) link."""
+    return session.execute(
+        select(
+            TaskDependencies.dependenttaskid,
+            TaskDependencies.blockingtaskid,
+            or_(Task.status == "Completed", Task.deleted.is_(True)),
+        )
+        .join(Task, Task.taskid == TaskDependencies.blockingtaskid)
+    ).all()
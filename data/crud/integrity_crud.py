@@ -0,0 +1,157 @@
+from typing import List, Tuple
+
+from data.change_feed import record_change
+from data.crud.project_crud import refresh_all_project_rollups
+from data.db_session import reads, writes
+from data.models.artifact_model import Artifact
+from data.models.tag_model import TaskTag
+from data.models.task_artifact_model import TaskArtifact
+from data.models.task_dependency_model import TaskDependencies
+from data.models.task_model import Task
+from data.models.task_note_model import TaskNote
+from data.models.task_tag_link_model import TaskTagLink
+from sqlalchemy import delete, exists, func, select, tuple_, update
+from sqlalchemy.orm import Session, aliased
+
+# Link rows that can be deleted by the repair, by the columns identifying a row.
+LINK_KEYS = {
+    "tag_links": (TaskTagLink.tasktagid,),
+    "notes": (TaskNote.noteid,),
+    "artifact_links": (TaskArtifact.taskid, TaskArtifact.artifact_id),
+    "dependencies": (TaskDependencies.dependenttaskid, TaskDependencies.blockingtaskid),
+}
+
+
+def _missing_task(column):
+    return ~exists().where(Task.taskid == column)
+
+
+@reads
+def get_task_count(session: Session) -> int:
+    return session.execute(select(func.count()).select_from(Task)).scalar()
+
+
+@reads
+def get_parent_links(session: Session) -> List[Tuple[int, int]]:
+    """(taskid, parenttaskid) of every task that has a parent, from one scan of ix_tasks_parenttaskid."""
+    query = select(Task.taskid, Task.parenttaskid).where(Task.parenttaskid.is_not(None))
+    return [tuple(row) for row in session.execute(query)]
+
+
+@reads
+def get_dangling_parent_ids(session: Session) -> List[int]:
+    """Tasks whose parenttaskid names a task that does not exist."""
+    parent = aliased(Task)
+    return session.execute(
+        select(Task.taskid).where(Task.parenttaskid.is_not(None), ~exists().where(parent.taskid == Task.parenttaskid))
+    ).scalars().all()
+
+
+@reads
+def get_orphaned_links(session: Session) -> dict:
+    """Keys (as in LINK_KEYS) of link and note rows pointing at a task, tag or artifact that does not exist."""
+    blocking = aliased(Task)
+    return {
+        "tag_links": session.execute(
+            select(TaskTagLink.tasktagid).where(
+                _missing_task(TaskTagLink.taskid) | ~exists().where(TaskTag.id == TaskTagLink.tagid)
+            )
+        ).scalars().all(),
+        "notes": session.execute(select(TaskNote.noteid).where(_missing_task(TaskNote.taskid))).scalars().all(),
+        "artifact_links": [tuple(row) for row in session.execute(
+            select(TaskArtifact.taskid, TaskArtifact.artifact_id).where(
+                _missing_task(TaskArtifact.taskid) | ~exists().where(Artifact.id == TaskArtifact.artifact_id)
+            )
+        )],
+        "dependencies": [tuple(row) for row in session.execute(
+            select(TaskDependencies.dependenttaskid, TaskDependencies.blockingtaskid).where(
+                _missing_task(TaskDependencies.dependenttaskid)
+                | ~exists().where(blocking.taskid == TaskDependencies.blockingtaskid)
+            )
+        )],
+    }
+
+
+@reads
+def get_duplicate_tag_link_ids(session: Session) -> List[int]:
+    """Tag links repeating an earlier link of the same task and tag; the oldest one is kept."""
+    earlier = aliased(TaskTagLink)
+    return session.execute(
+        select(TaskTagLink.tasktagid).where(
+            exists().where(
+                earlier.tagid == TaskTagLink.tagid,
+                earlier.taskid == TaskTagLink.taskid,
+                earlier.tasktagid < TaskTagLink.tasktagid,
+            )
+        )
+    ).scalars().all()
+
+
+@reads
+def get_note_count_mismatches(session: Session) -> List[Tuple[int, int]]:
+    """(taskid, actual note count) of tasks whose stored note_count is wrong."""
+    counts = select(TaskNote.taskid, func.count().label("notes")).group_by(TaskNote.taskid).subquery()
+    actual = func.coalesce(counts.c.notes, 0)
+    query = select(Task.taskid, actual).outerjoin(counts, counts.c.taskid == Task.taskid).where(Task.note_count != actual)
+    return [tuple(row) for row in session.execute(query)]
+
+
+def _detach(session: Session, condition) -> int:
+    # The writer holds the write lock from the SELECT on, so nothing moves in between.
+    previous_parents = dict(session.execute(select(Task.taskid, Task.parenttaskid).where(condition)).all())
+    if previous_parents:
+        session.execute(update(Task).where(Task.taskid.in_(previous_parents)).values(parenttaskid=None))
+    for task_id, previous_parent_id in previous_parents.items():
+        record_change(session, "reparented", task_id, parenttaskid=None, previous_parenttaskid=previous_parent_id)
+    session.commit()
+    return len(previous_parents)
+
+
+@writes
+def detach_from_parents(session: Session, links: List[Tuple[int, int]]) -> int:
+    """
+    Makes each (taskid, parenttaskid) task top level, e.g. to break a
+    cycle, unless it has been given another parent since. Returns how many moved.
+    """
+    return _detach(session, tuple_(Task.taskid, Task.parenttaskid).in_(links))
+
+
+@writes
+def detach_from_missing_parents(session: Session, task_ids: List[int]) -> int:
+    """Makes the tasks whose parent does not exist top level. Returns how many moved."""
+    parent = aliased(Task)
+    return _detach(session, Task.taskid.in_(task_ids) & ~exists().where(parent.taskid == Task.parenttaskid))
+
+
+@writes
+def delete_links(session: Session, kind: str, keys: list) -> int:
+    """Deletes the `kind` rows (a LINK_KEYS name) with the given keys. Returns how many were deleted."""
+    columns = LINK_KEYS[kind]
+    table = columns[0].class_
+    if len(columns) == 1:
+        result = session.execute(delete(table).where(columns[0].in_(keys)))
+    else:
+        result = session.execute(delete(table).where(tuple_(*columns).in_(keys)))
+    if kind == "dependencies":
+        # The in-memory dependency index follows these events.
+        for dependent_id, blocking_id in keys:
+            record_change(session, "dependency_removed", dependent_id, blockingtaskid=blocking_id)
+    session.commit()
+    return result.rowcount
+
+
+@writes
+def recount_notes(session: Session, task_ids: List[int]) -> int:
+    """Sets note_count of the tasks from their notes as they are now. Returns how many were wrong."""
+    actual = select(func.count()).where(TaskNote.taskid == Task.taskid).scalar_subquery()
+    result = session.execute(
+        update(Task).where(Task.taskid.in_(task_ids), Task.note_count != actual).values(note_count=actual)
+    )
+    session.commit()
+    return result.rowcount
+
+
+@writes
+def rebuild_project_rollups(session: Session):
+    refresh_all_project_rollups(session)
+    session.commit()
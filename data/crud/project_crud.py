@@ -0,0 +1,257 @@
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from data.change_feed import pending_changes
+from data.crud.archive_crud import ID_CHUNK_SIZE
+from data.db_session import WriterSession, reads
+from data.models.project_rollup_model import ProjectRollup
+from data.models.tag_model import TaskTag
+from data.models.task_model import Task
+from data.models.task_tag_link_model import TaskTagLink
+from data.read_models import select_task_rows
+from sqlalchemy import case, delete, event, func, insert, literal, select, update
+from sqlalchemy.orm import Session, aliased
+
+# Events that can change which tasks a project holds, their status or their due dates.
+_ROLLUP_EVENTS = {"created", "completed", "deleted", "reparented", "restored", "archived", "updated"}
+# "updated" only matters when it touches one of these.
+_ROLLUP_FIELDS = {"status", "deleted", "duedate", "parenttaskid"}
+# Events applied to the counters as deltas; the rest recount the project.
+_DELTA_EVENTS = {"created", "completed", "deleted"}
+
+
+def _chunks(ids: List[int]):
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        yield ids[start:start + ID_CHUNK_SIZE]
+
+
+def _root_ids(session: Session, task_ids: Iterable[int]) -> Set[int]:
+    """The top-level task above each of the given tasks. Tasks on a cycle or under a missing parent have none."""
+    roots: Set[int] = set()
+    for ids in _chunks(list(task_ids)):
+        chain = select(Task.taskid, Task.parenttaskid).where(Task.taskid.in_(ids)).cte("chain", recursive=True)
+        parent = aliased(Task)
+        # UNION so a parenttaskid cycle cannot recurse forever.
+        chain = chain.union(select(parent.taskid, parent.parenttaskid).where(parent.taskid == chain.c.parenttaskid))
+        roots.update(session.execute(select(chain.c.taskid).where(chain.c.parenttaskid.is_(None))).scalars())
+    return roots
+
+
+def _placed_roots(session: Session, task_ids: Iterable[int]) -> Dict[int, Tuple[int, bool]]:
+    """
+    The top-level task above each of the given tasks, and whether the task
+    is hidden from its project by a deleted ancestor (the root included).
+    Tasks on a cycle or under a missing parent are left out.
+    """
+    placed: Dict[int, Tuple[int, bool]] = {}
+    for ids in _chunks(list(task_ids)):
+        chain = (
+            select(Task.taskid.label("origin"), Task.taskid, Task.parenttaskid, literal(False).label("hidden"))
+            .where(Task.taskid.in_(ids))
+            .cte("placed", recursive=True)
+        )
+        parent = aliased(Task)
+        chain = chain.union(
+            select(chain.c.origin, parent.taskid, parent.parenttaskid, chain.c.hidden | parent.deleted)
+            .where(parent.taskid == chain.c.parenttaskid)
+        )
+        placed.update(
+            (origin, (root_id, bool(hidden)))
+            for origin, root_id, hidden in session.execute(
+                select(chain.c.origin, chain.c.taskid, chain.c.hidden).where(chain.c.parenttaskid.is_(None))
+            )
+        )
+    return placed
+
+
+def refresh_project_rollups(session: Session, root_ids: Iterable[int]):
+    """
+    Recomputes the rollups of the given roots from their subtrees, walking
+    ix_tasks_parenttaskid only. Ids that are no longer live top-level tasks
+    lose their rollup. Does not commit.
+    """
+    for ids in _chunks(sorted(set(root_ids))):
+        tree = (
+            select(Task.taskid.label("rootid"), Task.taskid, Task.status, Task.duedate)
+            .where(Task.taskid.in_(ids), Task.parenttaskid.is_(None), Task.deleted.is_(False))
+            .cte("project", recursive=True)
+        )
+        child = aliased(Task)
+        # Starting from true roots, a cycle cannot be reached, so UNION ALL is safe.
+        tree = tree.union_all(
+            select(tree.c.rootid, child.taskid, child.status, child.duedate)
+            .where(child.parenttaskid == tree.c.taskid, child.deleted.is_(False))
+        )
+        is_descendant = tree.c.taskid != tree.c.rootid
+        is_completed = tree.c.status == "Completed"
+        totals = session.execute(
+            select(
+                tree.c.rootid,
+                func.count().filter(is_descendant),
+                func.count().filter(is_descendant, is_completed),
+                func.min(case((is_completed, None), else_=tree.c.duedate)),
+            ).group_by(tree.c.rootid)
+        ).all()
+
+        session.execute(delete(ProjectRollup).where(ProjectRollup.rootid.in_(ids)))
+        if totals:
+            session.execute(insert(ProjectRollup), [
+                {"rootid": rootid, "total": total, "open": total - completed, "completed": completed,
+                 "next_due": next_due}
+                for rootid, total, completed, next_due in totals
+            ])
+
+
+def refresh_all_project_rollups(session: Session):
+    """Rebuilds every rollup, e.g. after a schema upgrade. Does not commit."""
+    session.execute(delete(ProjectRollup))
+    roots = session.execute(select(Task.taskid).where(Task.parenttaskid.is_(None))).scalars().all()
+    refresh_project_rollups(session, roots)
+
+
+def _affected_tasks(changes: List[Dict[str, Any]]) -> Set[int]:
+    """Tasks whose project's rollup the changes may have altered, including projects a subtree left."""
+    task_ids: Set[int] = set()
+    for change in changes:
+        kind = change["type"]
+        if kind not in _ROLLUP_EVENTS or (kind == "updated" and _ROLLUP_FIELDS.isdisjoint(change.get("fields", {}))):
+            continue
+        # An archived task is gone; its project is found through the parent it left.
+        if kind != "archived":
+            task_ids.add(change["taskid"])
+        for key in ("previous_parenttaskid", "parenttaskid"):
+            if change.get(key) is not None:
+                task_ids.add(change[key])
+    return task_ids
+
+
+def _apply_deltas(session: Session, changes: List[Dict[str, Any]], recount: Set[int]):
+    """
+    Applies created, completed and deleted events of tasks below a root to
+    their project's counters, one event per task. Adds to `recount` the
+    roots whose counters a delta cannot fix: the task is a root itself, a
+    deleted task took live children with it, or a completed or deleted
+    task may have held the earliest due date.
+    """
+    kinds = {change["taskid"]: change["type"] for change in changes}
+    placed = _placed_roots(session, kinds)
+    child = aliased(Task)
+    has_children = select(literal(1)).where(child.parenttaskid == Task.taskid, child.deleted.is_(False)).exists()
+    tasks: Dict[int, tuple] = {}
+    for ids in _chunks(list(placed)):
+        tasks.update(
+            (row[0], row[1:])
+            for row in session.execute(
+                select(Task.taskid, Task.status, Task.duedate, Task.deleted, has_children).where(Task.taskid.in_(ids))
+            )
+        )
+    rollups: Dict[int, Dict[str, Any]] = {}
+    for ids in _chunks(sorted({root_id for root_id, _ in placed.values()} - recount)):
+        columns = select(ProjectRollup.rootid, ProjectRollup.total, ProjectRollup.open, ProjectRollup.completed,
+                         ProjectRollup.next_due).where(ProjectRollup.rootid.in_(ids))
+        rollups.update((row.rootid, row._asdict()) for row in session.execute(columns))
+
+    changed: Set[int] = set()
+    for task_id, (root_id, hidden) in placed.items():
+        kind = kinds[task_id]
+        status, duedate, deleted, has_live_children = tasks[task_id]
+        if root_id in recount or hidden or (deleted and kind != "deleted"):
+            continue
+        rollup = rollups.get(root_id)
+        if root_id == task_id or rollup is None or (kind == "deleted" and has_live_children):
+            recount.add(root_id)
+            continue
+        bucket = "completed" if status == "Completed" else "open"
+        earliest = duedate is not None and (rollup["next_due"] is None or duedate <= rollup["next_due"])
+        if kind == "created":
+            rollup["total"] += 1
+            rollup[bucket] += 1
+            if bucket == "open" and earliest:
+                rollup["next_due"] = duedate
+        elif earliest and (kind == "completed" or bucket == "open"):
+            recount.add(root_id)
+            continue
+        elif kind == "completed":
+            rollup["open"] -= 1
+            rollup["completed"] += 1
+        else:
+            rollup["total"] -= 1
+            rollup[bucket] -= 1
+        changed.add(root_id)
+
+    changed -= recount
+    if changed:
+        session.execute(update(ProjectRollup), [rollups[root_id] for root_id in changed])
+
+
+@event.listens_for(WriterSession, "before_commit")
+def _refresh_before_commit(session: Session):
+    # Also fires when a savepoint is released; the deltas must be applied once, at the outermost commit.
+    changes = pending_changes(session)
+    if not changes or session.in_nested_transaction():
+        return
+    # A task with more than one of these in the transaction is recounted instead.
+    events_per_task = Counter(change["taskid"] for change in changes if change["type"] in _DELTA_EVENTS)
+    deltas, others = [], []
+    for change in changes:
+        single = change["type"] in _DELTA_EVENTS and events_per_task[change["taskid"]] == 1
+        (deltas if single else others).append(change)
+
+    roots = _root_ids(session, _affected_tasks(others))
+    # Tasks that left the live table as roots take their rollup with them.
+    roots.update(
+        change["taskid"] for change in others
+        if change["type"] == "archived" and change.get("parenttaskid") is None
+    )
+    roots.update(
+        change["taskid"] for change in others
+        if change["type"] == "reparented" and change.get("previous_parenttaskid") is None
+    )
+    if deltas:
+        _apply_deltas(session, deltas, roots)
+    if roots:
+        refresh_project_rollups(session, roots)
+
+
+@reads
+def get_project_rollups(session: Session, root_ids: List[int]) -> Dict[int, ProjectRollup]:
+    rollups: Dict[int, ProjectRollup] = {}
+    for ids in _chunks(root_ids):
+        rollups.update(
+            (rollup.rootid, rollup)
+            for rollup in session.execute(select(ProjectRollup).where(ProjectRollup.rootid.in_(ids))).scalars()
+        )
+    return rollups
+
+
+@reads
+def get_projects(session: Session, tag_name: Optional[str] = None, include_completed: bool = False) -> list:
+    """
+    Live top-level tasks with their rollups, in list order, from one query
+    over the root tasks and the rollup primary key. `tag_name` limits it to
+    roots carrying that tag.
+    """
+    query = (
+        select_task_rows()
+        .add_columns(
+            func.coalesce(ProjectRollup.total, 0).label("total"),
+            func.coalesce(ProjectRollup.open, 0).label("open"),
+            func.coalesce(ProjectRollup.completed, 0).label("completed"),
+            ProjectRollup.next_due,
+            Task.duedate,
+        )
+        .outerjoin(ProjectRollup, ProjectRollup.rootid == Task.taskid)
+        .where(Task.parenttaskid.is_(None), Task.deleted.is_(False))
+        .order_by(Task.sort_order.asc(), Task.taskid.asc())
+    )
+    if not include_completed:
+        query = query.where(Task.status != "Completed")
+    if tag_name:
+        tagged = (
+            select(literal(1))
+            .select_from(TaskTagLink)
+            .join(TaskTag, TaskTag.id == TaskTagLink.tagid)
+            .where(TaskTagLink.taskid == Task.taskid, TaskTag.name == tag_name)
+        )
+        query = query.where(tagged.exists())
+    return session.execute(query).all()
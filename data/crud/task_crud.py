@@ -2,42 +2,71 @@ import logging
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 
+from data.change_feed import record_change
+from data.crud.archive_crud import (ID_CHUNK_SIZE, get_archived_deleted_tasks,
+                                    get_archived_done_tasks,
+                                    restore_archived_subtree)
+from data.crud.completion_crud import (bump_completion_rollups,
+                                       completion_root_ids, get_task_tag_ids,
+                                       move_completion_roots)
+from data.crud.task_note_crud import copy_task_notes
+from data.db_session import reads, writes
+from data.models.task_archive_model import ArchivedTask
 from data.models.task_model import Task
-from sqlalchemy import and_, exists, func, or_, select, update
-from sqlalchemy.orm import Session, aliased
+from data.read_models import TaskRow, select_task_rows, to_task_rows
+from sqlalchemy import and_, bindparam, case, exists, func, or_, select, update
+from sqlalchemy.orm import Session, aliased, undefer
 
+# The hot queries below are built once and run with bound parameters, so a
+# call only binds values and hits the compiled cache. `now` is the current
+# time and is passed on every call; `task_id` and `task_ids` (expanding) are
+# the ids being asked about.
+_STARTED = Task.earlieststarttime.is_(None) | (Task.earlieststarttime <= bindparam("now"))
+_SUB_TASK = aliased(Task)
+_NO_OPEN_SUBTASK = ~exists().where(
+    _SUB_TASK.parenttaskid == Task.taskid,
+    _SUB_TASK.status != "Completed",
+    _SUB_TASK.deleted.is_(False),
+)
 
-def get_root_tasks(session):
-    query = (
-        select(Task)
-        .where(
-            Task.status != "Completed",
-            Task.deleted.is_(False),
-            (Task.earlieststarttime.is_(None) | (Task.earlieststarttime <= datetime.now())),
-            Task.parenttaskid == None
-        )
-        .order_by(Task.sort_order.asc())
-    )
-    tasks = session.execute(query).scalars().all()
-    return tasks
 
+def _now() -> Dict[str, datetime]:
+    return {"now": datetime.now()}
+
+
+def count_deferral(new_start_time: Optional[datetime]) -> Dict[str, Any]:
+    """
+    Extra UPDATE values for setting earlieststarttime to `new_start_time`:
+    bumps defer_count when that pushes the start into the future, later than
+    it was. Empty when the new start time is not a deferral.
+    """
+    if new_start_time is None or new_start_time <= datetime.now():
+        return {}
+    later = Task.earlieststarttime.is_(None) | (Task.earlieststarttime < new_start_time)
+    return {"defer_count": Task.defer_count + case((later, 1), else_=0)}
 
-def root_task_search(session, search_pattern):
-    query = (
-        select(Task)
-        .where(
-            Task.status != "Completed",
-            Task.deleted.is_(False),
-            (Task.earlieststarttime.is_(None) | (Task.earlieststarttime <= datetime.now())),
-            Task.parenttaskid == None,
-            Task.taskname.like(search_pattern)
-        )
-        .order_by(Task.sort_order.asc())
-    )
-    tasks = session.execute(query).scalars().all()
-    return tasks
 
+_ROOT_TASKS = (
+    select_task_rows()
+    .where(Task.status != "Completed", Task.deleted.is_(False), _STARTED, Task.parenttaskid.is_(None))
+    .order_by(Task.sort_order.asc())
+)
 
+
+@reads
+def get_root_tasks(session) -> List[TaskRow]:
+    return to_task_rows(session.execute(_ROOT_TASKS, _now()))
+
+
+_ROOT_TASK_SEARCH = _ROOT_TASKS.where(Task.taskname.like(bindparam("pattern")))
+
+
+@reads
+def root_task_search(session, search_pattern) -> List[TaskRow]:
+    return to_task_rows(session.execute(_ROOT_TASK_SEARCH, {**_now(), "pattern": search_pattern}))
+
+
+@reads
 def get_root_tasks_all(session):
     query = (
         select(Task)
@@ -51,26 +80,23 @@ def get_root_tasks_all(session):
     tasks = session.execute(query).scalars().all()
     return tasks
 
-def get_stand_alone_available_tasks(session) -> list[int]:
-    sub_task = aliased(Task)
-    query = (
-        select(Task.taskid)
-        .where(
-            Task.status != "Completed",
-            Task.deleted.is_(False),
-            (Task.earlieststarttime.is_(None) | (Task.earlieststarttime <= datetime.now())),
-            ~exists().where(
-                and_(
-                    sub_task.parenttaskid == Task.taskid,
-                    sub_task.status != "Completed"
-                )
-            )
-        )
-        .order_by(Task.sort_order.asc())
+_STAND_ALONE_AVAILABLE = (
+    select(Task.taskid)
+    .where(
+        Task.status != "Completed",
+        Task.deleted.is_(False),
+        _STARTED,
+        ~exists().where(_SUB_TASK.parenttaskid == Task.taskid, _SUB_TASK.status != "Completed"),
     )
-    tasks = session.execute(query).scalars().all()
-    return tasks
+    .order_by(Task.sort_order.asc())
+)
+
 
+@reads
+def get_stand_alone_available_tasks(session) -> list[int]:
+    return session.execute(_STAND_ALONE_AVAILABLE, _now()).scalars().all()
+
+@reads
 def get_all_available_incomplete_tasks(session) -> list[int]:
     root_tasks = get_stand_alone_available_tasks(session)
     all_tasks = []
@@ -78,6 +104,7 @@ def get_all_available_incomplete_tasks(session) -> list[int]:
         all_tasks.extend(get_subtasks_tree(session, task_id))
     return list(set(all_tasks))
 
+@reads
 def get_all_available_incomplete_tasks_by_tag(session, tag_name: str):
     from data.models.tag_model import TaskTag
     child_task = aliased(Task)
@@ -102,19 +129,40 @@ def get_all_available_incomplete_tasks_by_tag(session, tag_name: str):
     )
     return [task[0] for task in tasks]
 
-def get_future_tasks(session):
-    return (
-        session.query(Task)
-        .filter(
-            Task.earlieststarttime > datetime.now(),
-            Task.status != "Completed",
-            Task.deleted == False
-        )
-        .order_by(Task.earlieststarttime.desc())
-        .all()
-    )
+_FUTURE_TASKS = (
+    select_task_rows()
+    .where(Task.earlieststarttime > bindparam("now"), Task.status != "Completed", Task.deleted.is_(False))
+    .order_by(Task.earlieststarttime.desc())
+)
+
+
+@reads
+def get_future_tasks(session) -> List[TaskRow]:
+    return to_task_rows(session.execute(_FUTURE_TASKS, _now()))
+
 
+_PENDING_ACTIVATIONS = select(Task.taskid, Task.earlieststarttime).where(
+    Task.earlieststarttime > bindparam("now"), Task.status != "Completed", Task.deleted.is_(False)
+)
+_PENDING_ACTIVATIONS_AMONG = _PENDING_ACTIVATIONS.where(Task.taskid.in_(bindparam("task_ids", expanding=True)))
 
+
+@reads
+def get_pending_activations(session: Session, task_ids: Optional[List[int]] = None) -> List[Tuple[int, datetime]]:
+    """
+    (taskid, earlieststarttime) of the open tasks whose start time is still
+    ahead, limited to `task_ids` when given.
+    """
+    if task_ids is None:
+        return [tuple(row) for row in session.execute(_PENDING_ACTIVATIONS, _now())]
+    rows: List[Tuple[int, datetime]] = []
+    for start in range(0, len(task_ids), ID_CHUNK_SIZE):
+        chunk = task_ids[start:start + ID_CHUNK_SIZE]
+        rows.extend(tuple(row) for row in session.execute(_PENDING_ACTIVATIONS_AMONG, {**_now(), "task_ids": chunk}))
+    return rows
+
+
+@writes
 def create_task(session: Session, task_name: str) -> Optional[int]:
     try:
         new_task = Task(
@@ -123,6 +171,8 @@ def create_task(session: Session, task_name: str) -> Optional[int]:
             status="Pending"  # Set a default status
         )
         session.add(new_task)
+        session.flush()
+        record_change(session, "created", new_task.taskid, taskname=task_name, parenttaskid=None)
         session.commit()
         session.refresh(new_task)
         return new_task.taskid
@@ -131,6 +181,7 @@ def create_task(session: Session, task_name: str) -> Optional[int]:
         logging.error(f"Failed to create task '{task_name}': {e}")
         return None
 
+@writes
 def create_new_subtask(session: Session, parent_task_id: int, task_name: str) -> Optional[int]:
     try:
         new_subtask = Task(
@@ -140,6 +191,8 @@ def create_new_subtask(session: Session, parent_task_id: int, task_name: str) ->
             status="Pending"  # Set a default status
         )
         session.add(new_subtask)
+        session.flush()
+        record_change(session, "created", new_subtask.taskid, taskname=task_name, parenttaskid=parent_task_id)
         session.commit()
         session.refresh(new_subtask)
         return new_subtask.taskid
@@ -151,89 +204,92 @@ def create_new_subtask(session: Session, parent_task_id: int, task_name: str) ->
 
 
 
+_ID_EXISTS = select(Task.taskid).where(Task.taskid == bindparam("task_id"))
+
+
+@reads
 def id_exists(session: Session, id: int) -> bool:
-    query = select(Task.taskid).where(Task.taskid == id)
-    return session.execute(query).scalar() is not None
+    return session.execute(_ID_EXISTS, {"task_id": id}).scalar() is not None
 
 
+@reads
 def find_root_task_id(session: Session, task_id: int) -> int:
-    while True:
+    seen = set()
+    # Stop if the task is deleted, not found, or has no parent, or on
+    # reaching a task again because parenttaskid forms a cycle.
+    while task_id not in seen:
+        seen.add(task_id)
         task = session.get(Task, task_id)
-        # Stop if the task is deleted, not found, or has no parent.
         if not task or task.deleted or task.parenttaskid is None:
             return task_id
         task_id = task.parenttaskid
+    return task_id
 
 
 
-def get_incomplete_available_important_tasks_ids(session: Session, task_ids: list[int]):
-
-    query = (
-        select(Task.taskid)
-        .where(
-            Task.taskid.in_(task_ids),
-            Task.status != "Completed",
-            Task.important.is_(True),
-            Task.deleted.is_(False)
-        )
+@reads
+def is_valid_parent(session: Session, task_id: int, parent_id: int) -> bool:
+    """
+    True if `parent_id` is a live task other than `task_id` and not one of its
+    descendants, so making it the parent cannot create a cycle.
+    """
+    if parent_id == task_id:
+        return False
+    parent = session.get(Task, parent_id)
+    if not parent or parent.deleted:
+        return False
+
+    ancestors = (
+        select(Task.taskid, Task.parenttaskid)
+        .where(Task.taskid == parent_id)
+        .cte(name="ancestors", recursive=True)
+    )
+    ancestors = ancestors.union(
+        select(Task.taskid, Task.parenttaskid).where(Task.taskid == ancestors.c.parenttaskid)
     )
+    query = select(exists().where(ancestors.c.taskid == task_id))
+    return not session.execute(query).scalar()
 
-    important_tasks = session.execute(query).scalars().all()
 
-    return important_tasks
+_OPEN_IDS_AMONG = select(Task.taskid).where(
+    Task.taskid.in_(bindparam("task_ids", expanding=True)),
+    Task.status != "Completed",
+    Task.deleted.is_(False),
+)
+_IMPORTANT_IDS_AMONG = _OPEN_IDS_AMONG.where(Task.important.is_(True))
+_URGENT_IDS_AMONG = _OPEN_IDS_AMONG.where(Task.urgent.is_(True))
 
 
-def get_incomplete_available_urgent_tasks_ids(session: Session, task_ids: list[int]):
+@reads
+def get_incomplete_available_important_tasks_ids(session: Session, task_ids: list[int]):
+    return session.execute(_IMPORTANT_IDS_AMONG, {"task_ids": list(task_ids)}).scalars().all()
 
-    query = (
-        select(Task.taskid)
-        .where(
-            Task.taskid.in_(task_ids),
-            Task.status != "Completed",
-            Task.urgent.is_(True),
-            Task.deleted.is_(False)
-        )
-    )
 
-    urgent_tasks = session.execute(query).scalars().all()
+@reads
+def get_incomplete_available_urgent_tasks_ids(session: Session, task_ids: list[int]):
+    return session.execute(_URGENT_IDS_AMONG, {"task_ids": list(task_ids)}).scalars().all()
+
 
-    return urgent_tasks
+_CHILDREN = select(Task).where(Task.parenttaskid == bindparam("task_id"), Task.deleted.is_(False))
+_CHILD_IDS = select(Task.taskid).where(Task.parenttaskid == bindparam("task_id"), Task.deleted.is_(False))
+_OPEN_CHILD_IDS = _CHILD_IDS.where(Task.status != "Completed")
 
 
+@reads
 def get_subtasks_all_ids(session: Session, task_id: int):
-    query = (
-        select(Task.taskid)
-        .where(
-            Task.parenttaskid == task_id,
-            Task.deleted.is_(False)
-        )
-    )
-    return session.execute(query).scalars().all()
+    return session.execute(_CHILD_IDS, {"task_id": task_id}).scalars().all()
 
+@reads
 def get_subtasks_all(session: Session, task_id: int):
-    query = (
-        select(Task)
-        .where(
-            Task.parenttaskid == task_id,
-            Task.deleted.is_(False)
-        )
-    )
-    return session.execute(query).scalars().all()
+    return session.execute(_CHILDREN, {"task_id": task_id}).scalars().all()
 
 
+@reads
 def get_subtask_ids_all(session: Session, task_id: int):
-    query = (
-        select(Task.taskid)
-        .where(
-            Task.parenttaskid == task_id,
-            Task.status != "Completed",
-            Task.deleted.is_(False)
-        )
-    )
-    result = session.execute(query).scalars().all()
-    return result
+    return session.execute(_OPEN_CHILD_IDS, {"task_id": task_id}).scalars().all()
 
 
+@reads
 def format_task_tree_new(
     session: Session,
     selected_id: int,
@@ -275,6 +331,7 @@ def format_task_tree_new(
     return task_line, start_index
 
 
+@reads
 def task_read_subtasks(session: Session, selected_id: int, task_id: int) -> Tuple[str, Dict[int, Dict[str, int | str]]]:
 
     tree_view = ""
@@ -295,38 +352,77 @@ def task_read_subtasks(session: Session, selected_id: int, task_id: int) -> Tupl
     return tree_view, ordered_task_list
 
 
-def has_incomplete_subtask(session: Session, task_id: int) -> bool:
-
-    subquery = (
-        select(exists().where(Task.parenttaskid == task_id, Task.status != "Completed"))
+def _open_subtree_links_query():
+    tree = select(Task.taskid, Task.parenttaskid).where(Task.taskid == bindparam("task_id")).cte("subtree", recursive=True)
+    child = aliased(Task)
+    # UNION so a parenttaskid cycle cannot recurse forever.
+    tree = tree.union(
+        select(child.taskid, child.parenttaskid).where(
+            child.parenttaskid == tree.c.taskid,
+            child.status != "Completed",
+            child.deleted.is_(False),
+        )
     )
-    return session.execute(subquery).scalar()
+    return select(tree)
 
 
-def get_subtasks(session: Session, task_id: int):
+_OPEN_SUBTREE_LINKS = _open_subtree_links_query()
 
-    # Subquery to find the minimum sequence of incomplete subtasks for the given parent
-    min_sequence_subquery = (
-        select(func.min(Task.repeatinterval))  # Assuming Sequence is repeatinterval
-        .where(Task.parenttaskid == task_id, Task.status != "Completed")
-    ).scalar_subquery()
 
-    query = (
-        select(Task.taskid)
-        .where(
-            Task.parenttaskid == task_id,
-            Task.status != "Completed",
-            (Task.earlieststarttime.is_(None) | (Task.earlieststarttime <= datetime.now())),
-            (Task.repeatinterval.is_(None) | (Task.repeatinterval == min_sequence_subquery))
-        )
-        .order_by(Task.createdat.asc())
+@reads
+def get_open_subtree_links(session: Session, task_id: int) -> List[Tuple[int, Optional[int]]]:
+    """
+    (taskid, parenttaskid) for the task and all of its open descendants,
+    from one recursive query that only reads ix_tasks_parenttaskid.
+    Empty if the task does not exist.
+    """
+    return [(taskid, parenttaskid) for taskid, parenttaskid in session.execute(_OPEN_SUBTREE_LINKS, {"task_id": task_id})]
+
+
+_TASK_ROWS = select_task_rows().where(Task.taskid.in_(bindparam("task_ids", expanding=True)))
+
+
+@reads
+def get_task_rows(session: Session, task_ids: List[int]) -> List[TaskRow]:
+    """TaskRows for the given ids, in no particular order."""
+    rows: List[TaskRow] = []
+    for start in range(0, len(task_ids), ID_CHUNK_SIZE):
+        chunk = task_ids[start:start + ID_CHUNK_SIZE]
+        rows.extend(to_task_rows(session.execute(_TASK_ROWS, {"task_ids": chunk})))
+    return rows
+
+
+_HAS_OPEN_SUBTASK = select(exists().where(Task.parenttaskid == bindparam("task_id"), Task.status != "Completed"))
+
+
+@reads
+def has_incomplete_subtask(session: Session, task_id: int) -> bool:
+    return session.execute(_HAS_OPEN_SUBTASK, {"task_id": task_id}).scalar()
+
+
+# Subquery to find the minimum sequence of incomplete subtasks for the given parent
+_MIN_SEQUENCE = (
+    select(func.min(Task.repeatinterval))  # Assuming Sequence is repeatinterval
+    .where(Task.parenttaskid == bindparam("task_id"), Task.status != "Completed")
+).scalar_subquery()
+_NEXT_SUBTASKS = (
+    select(Task.taskid)
+    .where(
+        Task.parenttaskid == bindparam("task_id"),
+        Task.status != "Completed",
+        _STARTED,
+        (Task.repeatinterval.is_(None) | (Task.repeatinterval == _MIN_SEQUENCE))
     )
+    .order_by(Task.createdat.asc())
+)
 
-    subtasks = session.execute(query).scalars().all()
 
-    return subtasks
+@reads
+def get_subtasks(session: Session, task_id: int):
+    return session.execute(_NEXT_SUBTASKS, {**_now(), "task_id": task_id}).scalars().all()
 
 
+@reads
 def get_subtasks_tree(session: Session, task_id: int):
 
     subtasks_tree = []
@@ -343,6 +439,7 @@ def get_subtasks_tree(session: Session, task_id: int):
     return subtasks_tree
 
 
+@reads
 def get_available_incomplete_tasks(session: Session):
     """Fetches tasks that are incomplete, available, and have no incomplete subtasks."""
     return session.query(Task.taskid, Task.taskname).filter(
@@ -357,42 +454,33 @@ def get_available_incomplete_tasks(session: Session):
     ).all()
 
 
+@reads
 def get_task_name(session: Session, task_id: int) -> Optional[str]:
 
     task = session.get(Task, task_id)
     return task.taskname if task else None
 
 
+@reads
 def get_task_by_id(session: Session, task_id: int) -> Optional[Dict[str, Any]]:
-    return session.get(Task, task_id)
+    # Single-task views show the description, so fetch it with the row.
+    return session.get(Task, task_id, options=[undefer(Task.description)])
 
 
-def get_tasks_by_ids(session: Session, task_id_list: List[int]) -> List[Dict[str, Any]]:
-    from data.models.task_dependency_model import TaskDependencies
+_TASK_ROWS_BY_NAME = _TASK_ROWS.order_by(Task.taskname.asc())
 
+
+@reads
+def get_tasks_by_ids(session: Session, task_id_list: List[int]) -> List[TaskRow]:
+    # Blocked tasks are filtered out by the caller through the dependency index.
     if not task_id_list:
         return []
-
-    # Query to fetch tasks that are not dependent tasks
-    query = (
-        select(Task)
-        .where(
-            Task.taskid.in_(task_id_list),
-            ~Task.taskid.in_(  # Exclude tasks that exist in TaskDependencies as DependentTaskID
-                select(TaskDependencies.dependenttaskid)
-            )
-        )
-        .order_by(Task.taskname.asc())
-    )
-
-    tasks = session.execute(query).scalars().all()
-
-    # Convert to list of dictionaries
-    return [task.__dict__ for task in tasks]
+    return to_task_rows(session.execute(_TASK_ROWS_BY_NAME, {"task_ids": list(task_id_list)}))
 
 
 
 
+@writes
 def soft_delete_task(session: Session, task_id: int) -> bool:
     """
     Marks a task as deleted by setting 'deleted' to True and 'deleted_date' to the current timestamp.
@@ -402,32 +490,56 @@ def soft_delete_task(session: Session, task_id: int) -> bool:
     if not task or task.deleted:
         return False  # Task not found or already deleted
 
+    _count_completion(session, task, -1)
     task.deleted = True
     task.deleted_date = datetime.now()
+    record_change(session, "deleted", task_id)
 
     session.commit()
     return True
 
 
+@writes
 def update_earliest_start_time(session: Session, task_id: int, new_start_time: datetime) -> bool:
     task = session.get(Task, task_id)
     if task:
+        # The same rule as count_deferral, on the loaded task.
+        if new_start_time is not None and new_start_time > max(datetime.now(), task.earlieststarttime or datetime.min):
+            task.defer_count += 1
         task.earlieststarttime = new_start_time
+        record_change(session, "updated", task_id, fields={"earlieststarttime": new_start_time})
         session.commit()
         return True
     return False
 
 
+def _count_completion(session: Session, task: Task, delta: int):
+    """Adds or takes a completed task's completion from the rollups, e.g. when it is deleted or undeleted."""
+    if task.status == "Completed" and task.completed_at:
+        bump_completion_rollups(session, task.completed_at.date(), task.completed_rootid,
+                                get_task_tag_ids(session, task.taskid), delta)
+
+
+@writes
 def mark_done(session: Session, task_id: int):
-    session.execute(
+    # completed_at is local time like the other user-facing times; lastedittime is always UTC.
+    now = datetime.now()
+    # A task on a parenttaskid cycle counts as its own root.
+    root_id = completion_root_ids(session, [task_id]).get(task_id, task_id)
+    result = session.execute(
         update(Task)
-        .where(Task.taskid == task_id)
-        .values(status="Completed", lastedittime=datetime.now())
+        .where(Task.taskid == task_id, Task.status != "Completed")
+        .values(status="Completed", lastedittime=datetime.utcnow(), completed_at=now, completed_rootid=root_id)
     )
+    if result.rowcount:
+        if not session.get(Task, task_id).deleted:
+            bump_completion_rollups(session, now.date(), root_id, get_task_tag_ids(session, task_id), 1)
+        record_change(session, "completed", task_id)
     session.commit()
 
 
 
+@reads
 def get_subtask_tree_ids(session: Session, task_id: int):
     # Recursively get all subtask ids
     subtasks = get_subtask_ids_all(session, task_id)
@@ -448,6 +560,7 @@ def add_workdays(start_date: datetime, days: int) -> datetime:
             added += 1
     return current_date
 
+@writes
 def repeat_task(session: Session, task_id: int, yesterday=False):
     task = session.get(Task, task_id)
     if task and task.repeatinterval:
@@ -489,36 +602,41 @@ def repeat_task(session: Session, task_id: int, yesterday=False):
 
         )
         session.add(new_task)
+        session.flush()
+        record_change(session, "created", new_task.taskid, taskname=new_task.taskname,
+                      parenttaskid=new_task.parenttaskid, repeatof=task_id)
 
         # Copy tags
         new_task.tasktags = task.tasktags.copy()
 
         # Copy notes
-        from data.models.task_note_model import TaskNote
-        for note in task.tasknotes:
-            new_note = TaskNote(taskid=new_task.taskid, note=note.note)
-            session.add(new_note)
-
+        copy_task_notes(session, task_id, new_task.taskid)
 
-        session.commit()
+        # Committed by the caller together with completing the original.
+        session.flush()
         return new_task.taskid
     return None
 
 
 
-def get_done_tasks(session: Session):
-    return (
-        session.query(Task)
-        .filter(
+@reads
+def get_done_tasks(session: Session, limit: int = 50) -> List[TaskRow]:
+    query = (
+        select_task_rows()
+        .where(
             Task.status == "Completed",
             Task.deleted == False
         )
-        .order_by(Task.lastedittime.desc())
-        .limit(50)
-        .all()
+        .order_by(Task.completed_at.desc())
+        .limit(limit)
     )
+    tasks = to_task_rows(session.execute(query))
+    tasks.extend(get_archived_done_tasks(session, limit))
+    tasks.sort(key=lambda task: task.completed_at or datetime.min, reverse=True)
+    return tasks[:limit]
 
 
+@writes
 def db_mark_task_done(session: Session, task_id: int, yesterday=False):
     # Retrieve the task
     task = session.get(Task, task_id)
@@ -544,6 +662,7 @@ def db_mark_task_done(session: Session, task_id: int, yesterday=False):
 
 
 
+@reads
 def get_next_task_to_work_on(session):
     from data.models.tag_model import TaskTag
     SubTask = aliased(Task)
@@ -573,6 +692,44 @@ def get_next_task_to_work_on(session):
 
 
 
+@reads
+def get_ready_queue_rows(session: Session, task_ids: Optional[List[int]] = None) -> List[tuple]:
+    """
+    (taskid, parenttaskid, urgent, important, sort_order, earlieststarttime,
+    ready) rows, where `ready` means the task is open, has no open subtasks
+    and is not tagged "waiting"; its start time is left to the caller.
+    Without `task_ids`, returns only the ready tasks.
+    """
+    from data.models.tag_model import TaskTag
+    from data.models.task_tag_link_model import TaskTagLink
+    sub_task = aliased(Task)
+
+    ready = and_(
+        Task.status != "Completed",
+        Task.deleted.is_(False),
+        ~exists().where(
+            sub_task.parenttaskid == Task.taskid,
+            sub_task.status != "Completed",
+            sub_task.deleted.is_(False),
+        ),
+        ~exists().where(
+            TaskTagLink.taskid == Task.taskid,
+            TaskTagLink.tagid == TaskTag.id,
+            TaskTag.name == "waiting",
+        ),
+    )
+    query = select(
+        Task.taskid, Task.parenttaskid, Task.urgent, Task.important,
+        Task.sort_order, Task.earlieststarttime, ready.label("ready"),
+    )
+    if task_ids is None:
+        query = query.where(ready)
+    else:
+        query = query.where(Task.taskid.in_(task_ids))
+    return session.execute(query).all()
+
+
+@reads
 def get_parent(session, task_id):
     task = session.get(Task, task_id)
 
@@ -587,106 +744,88 @@ def get_parent(session, task_id):
         return None
 
 
+@writes
 def make_task_top_level(session: Session, task_id: int) -> bool:
     task = session.get(Task, task_id)
     if task:
-        task.parenttaskid = None
+        previous_parent_id, task.parenttaskid = task.parenttaskid, None
+        move_completion_roots(session, [task_id])
+        record_change(session, "reparented", task_id, parenttaskid=None,
+                      previous_parenttaskid=previous_parent_id)
         session.commit()
         return True
     return False
 
 
-def get_available_incomplete_important_tasks(session: Session) -> list[Task]:
+_AVAILABLE_LEAVES = (
+    select_task_rows()
+    .where(Task.status != "Completed", Task.deleted.is_(False), _STARTED, _NO_OPEN_SUBTASK)
+    .order_by(Task.taskname.asc())
+)
+_AVAILABLE_IMPORTANT = _AVAILABLE_LEAVES.where(Task.important.is_(True))
+_AVAILABLE_URGENT = _AVAILABLE_LEAVES.where(Task.urgent.is_(True))
+
+
+@reads
+def get_available_incomplete_important_tasks(session: Session) -> List[TaskRow]:
     """
-    Returns a list of Task objects that are:
+    Returns a list of TaskRows that are:
     - Not completed
     - Not deleted
     - Marked as important
     - Have no incomplete subtasks
     - Start time is either None or in the past
     """
-    SubTask = aliased(Task)
+    return to_task_rows(session.execute(_AVAILABLE_IMPORTANT, _now()))
 
-    query = (
-        session.query(Task)
-        .filter(
-            Task.status != "Completed",
-            Task.deleted == False,
-            Task.important == True,
-            or_(Task.earlieststarttime == None, Task.earlieststarttime <= datetime.now()),
-            ~exists().where(
-                and_(
-                    SubTask.parenttaskid == Task.taskid,
-                    SubTask.status != "Completed",
-                    SubTask.deleted == False
-                )
-            )
-        )
-        .order_by(Task.taskname.asc())
-    )
-
-    return query.all()
 
-
-def get_available_incomplete_urgent_tasks(session: Session) -> list[Task]:
+@reads
+def get_available_incomplete_urgent_tasks(session: Session) -> List[TaskRow]:
     """
-    Returns a list of Task objects that are:
+    Returns a list of TaskRows that are:
     - Not completed
     - Not deleted
-    - Marked as important
+    - Marked as urgent
     - Have no incomplete subtasks
     - Start time is either None or in the past
     """
-    SubTask = aliased(Task)
-
-    query = (
-        session.query(Task)
-        .filter(
-            Task.status != "Completed",
-            Task.deleted == False,
-            Task.urgent == True,
-            or_(Task.earlieststarttime == None, Task.earlieststarttime <= datetime.now()),
-            ~exists().where(
-                and_(
-                    SubTask.parenttaskid == Task.taskid,
-                    SubTask.status != "Completed",
-                    SubTask.deleted == False
-                )
-            )
-        )
-        .order_by(Task.taskname.asc())
-    )
-
-    return query.all()
+    return to_task_rows(session.execute(_AVAILABLE_URGENT, _now()))
 
 
+@writes
 def set_task_important(session, task_id: int, is_important: bool) -> bool:
     task = session.get(Task, task_id)
     if task and not task.deleted:
         task.important = is_important
+        record_change(session, "updated", task_id, fields={"important": is_important})
         session.commit()
         return True
     return False
 
 
+@writes
 def set_task_urgent(session, task_id: int, is_urgent: bool) -> bool:
     task = session.get(Task, task_id)
     if task and not task.deleted:
         task.urgent = is_urgent
+        record_change(session, "updated", task_id, fields={"urgent": is_urgent})
         session.commit()
         return True
     return False
 
+@reads
 def is_task_important(session: Session, task_id: int) -> bool:
     task = session.get(Task, task_id)
     return bool(task and not task.deleted and task.important)
 
 
+@reads
 def is_task_urgent(session: Session, task_id: int) -> bool:
     task = session.get(Task, task_id)
     return bool(task and not task.deleted and task.urgent)
 
 
+@writes
 def crud_update_task_name(session: Session, task_id: int, new_name: str) -> bool:
     """
     Updates the name of the task with the given task_id.
@@ -702,20 +841,34 @@ def crud_update_task_name(session: Session, task_id: int, new_name: str) -> bool
     task = session.get(Task, task_id)
     if task:
         task.taskname = new_name
+        record_change(session, "updated", task_id, fields={"taskname": new_name})
         session.commit()
         return True
     return False
 
 
+@writes
 def update_task_sort_order(session: Session, task_id: int, new_sort_order: int) -> bool:
     """Updates the sort order of a given task."""
     task = session.get(Task, task_id)
     if task:
         task.sort_order = new_sort_order
+        record_change(session, "updated", task_id, fields={"sort_order": new_sort_order})
         session.commit()
         return True
     return False
 
+@writes
+def update_task_sort_orders(session: Session, ordered_task_ids: List[int]) -> None:
+    """Sets each task's sort_order to its 1-based position in `ordered_task_ids`."""
+    for order, task_id in enumerate(ordered_task_ids, start=1):
+        task = session.get(Task, task_id)
+        if task:
+            task.sort_order = order
+    record_change(session, "reordered", taskids=list(ordered_task_ids))
+    session.commit()
+
+@writes
 def crud_update_task_description(session: Session, task_id: int, new_description: str) -> bool:
     """
     Updates the description of the task with the given task_id.
@@ -731,11 +884,13 @@ def crud_update_task_description(session: Session, task_id: int, new_description
     task = session.get(Task, task_id)
     if task:
         task.description = new_description
+        record_change(session, "updated", task_id, fields={"description": new_description})
         session.commit()
         return True
     return False
 
 
+@writes
 def crud_update_task_target(session: Session, task_id: int, new_target: str) -> bool:
     """
     Updates the description of the task with the given task_id.
@@ -751,11 +906,13 @@ def crud_update_task_target(session: Session, task_id: int, new_target: str) ->
     task = session.get(Task, task_id)
     if task:
         task.target = new_target
+        record_change(session, "updated", task_id, fields={"target": new_target})
         session.commit()
         return True
     return False
 
 
+@writes
 def crud_update_task_milestone(session: Session, task_id: int, new_milestone: str) -> bool:
     """
     Updates the milestone of the task with the given task_id.
@@ -771,17 +928,64 @@ def crud_update_task_milestone(session: Session, task_id: int, new_milestone: st
     task = session.get(Task, task_id)
     if task:
         task.milestone = new_milestone
+        record_change(session, "updated", task_id, fields={"milestone": new_milestone})
         session.commit()
         return True
     return False
 
 
 
+@writes
+def patch_task(
+    session: Session,
+    task_id: int,
+    changes: Dict[str, Any],
+    expected_lastedittime: Optional[datetime] = None,
+) -> Optional[datetime]:
+    """
+    Applies `changes` (column name -> value) to a live task in one UPDATE.
+    With `expected_lastedittime`, the update only applies if the task has not
+    been edited since. Returns the new lastedittime, or None if no row matched.
+    Raises ValueError if the new parent is missing or would create a cycle.
+    """
+    if changes.get("parenttaskid") is not None and not is_valid_parent(session, task_id, changes["parenttaskid"]):
+        raise ValueError(f"Task {changes['parenttaskid']} cannot be the parent of task {task_id}.")
+
+    if "parenttaskid" in changes:
+        previous_parent_id = session.execute(select(Task.parenttaskid).where(Task.taskid == task_id)).scalar()
+
+    now = datetime.utcnow()
+    stmt = update(Task).where(Task.taskid == task_id, Task.deleted.is_(False))
+    if expected_lastedittime is not None:
+        stmt = stmt.where(Task.lastedittime == expected_lastedittime)
+    deferral = count_deferral(changes["earlieststarttime"]) if "earlieststarttime" in changes else {}
+    result = session.execute(stmt.values(**changes, **deferral, lastedittime=now))
+    if result.rowcount == 0:
+        return None
+
+    fields = {k: v for k, v in changes.items() if k != "parenttaskid"}
+    if fields:
+        record_change(session, "updated", task_id, fields=fields)
+    if "parenttaskid" in changes:
+        move_completion_roots(session, [task_id])
+        record_change(session, "reparented", task_id, parenttaskid=changes["parenttaskid"],
+                      previous_parenttaskid=previous_parent_id)
+    session.commit()
+    return now
+
+
+@writes
 def update_task_parent(session: Session, task_id: int, new_parent_id: int) -> bool:
-    """Updates the parent of a task to a new task ID."""
+    """
+    Updates the parent of a task to a new task ID. Returns False if the task
+    is missing or the new parent is missing, deleted or would create a cycle.
+    """
     task = session.get(Task, task_id)
-    if task:
-        task.parenttaskid = new_parent_id
+    if task and is_valid_parent(session, task_id, new_parent_id):
+        previous_parent_id, task.parenttaskid = task.parenttaskid, new_parent_id
+        move_completion_roots(session, [task_id])
+        record_change(session, "reparented", task_id, parenttaskid=new_parent_id,
+                      previous_parenttaskid=previous_parent_id)
         session.commit()
         return True
     return False
@@ -789,6 +993,7 @@ def update_task_parent(session: Session, task_id: int, new_parent_id: int) -> bo
 
 
 
+@reads
 def get_recently_deleted_tasks(session: Session, days: int = 7) -> List[Task]:
     """
     Returns tasks that have been marked as deleted within the last `days` days.
@@ -803,49 +1008,67 @@ def get_recently_deleted_tasks(session: Session, days: int = 7) -> List[Task]:
         )
         .order_by(Task.deleted_date.desc())
     )
-    tasks = session.execute(stmt).scalars().all()
+    tasks = list(session.execute(stmt).scalars().all())
+    tasks.extend(get_archived_deleted_tasks(session, cutoff))
+    tasks.sort(key=lambda task: task.deleted_date, reverse=True)
     return tasks
 
+@writes
 def undelete_task(session: Session, task_id: int) -> bool:
     """
     Undeletes a task by setting its deleted flag to False and clearing its deleted_date.
+    An archived task is first restored, with its archived subtree and archived
+    ancestors, into the live tables; see restore_archived_subtree.
     Returns True if the task was successfully undeleted, otherwise False.
     """
     task = session.get(Task, task_id)
+    if task is None:
+        archived = session.get(ArchivedTask, task_id)
+        if archived and archived.deleted and restore_archived_subtree(session, task_id):
+            task = session.get(Task, task_id)
     if task and task.deleted:
         task.deleted = False
         task.deleted_date = None
+        _count_completion(session, task, 1)
+        record_change(session, "updated", task_id, fields={"deleted": False})
         session.commit()
         return True
     return False
 
 
+@writes
 def update_task_repeat_interval(session, task_id: int, new_interval: int) -> bool:
     task = session.get(Task, task_id)
     if task:
         task.repeatinterval = new_interval
+        record_change(session, "updated", task_id, fields={"repeatinterval": new_interval})
         session.commit()
         return True
     return False
 
+@writes
 def update_task_repeattimeofday(session, task_id: int, new_time: int) -> bool:
     task = session.get(Task, task_id)
     if task:
         task.repeattimeofday = new_time
+        record_change(session, "updated", task_id, fields={"repeattimeofday": new_time})
         session.commit()
         return True
     return False
 
+@writes
 def update_task_repeatskipweekend(session, task_id: int, new_skip: bool) -> bool:
     task = session.get(Task, task_id)
     if task:
         task.repeatskipweekend = new_skip
+        record_change(session, "updated", task_id, fields={"repeatskipweekend": new_skip})
         session.commit()
         return True
     return False
 
 
 
+@reads
 def get_task_target(session: Session, task_id: int):
     """
     Retrieves the target attribute from the Task model based on task_id.
@@ -861,6 +1084,7 @@ def get_task_target(session: Session, task_id: int):
         return None
 
 
+@reads
 def get_task_milestone(session: Session, task_id: int):
     """
     Retrieves the target attribute from the Task model based on task_id.
@@ -875,10 +1099,15 @@ def get_task_milestone(session: Session, task_id: int):
         # Optionally, log the error here (e.g., logging.error(f"DB error in get_task_target: {e}"))
         return None
 
+@writes
 def mark_pending(session: Session, task_id: int):
+    task = session.get(Task, task_id)
+    if task and not task.deleted:
+        _count_completion(session, task, -1)
     session.execute(
         update(Task)
         .where(Task.taskid == task_id)
-        .values(status="Pending", lastedittime=datetime.now())
+        .values(status="Pending", lastedittime=datetime.utcnow(), completed_at=None, completed_rootid=None)
     )
+    record_change(session, "updated", task_id, fields={"status": "Pending"})
     session.commit()
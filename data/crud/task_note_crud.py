@@ -1,9 +1,22 @@
 from datetime import datetime
+from typing import List, Optional
 
+from data.change_feed import record_change
+from data.db_session import reads, writes
+from data.models.task_model import Task
 from data.models.task_note_model import TaskNote
+from sqlalchemy import DateTime, Integer, insert, literal, select, update
 from sqlalchemy.orm import Session
 
 
+def _add_to_note_count(session: Session, task_id: int, delta: int):
+    session.execute(
+        update(Task).where(Task.taskid == task_id).values(note_count=Task.note_count + delta),
+        execution_options={"synchronize_session": False},
+    )
+
+
+@writes
 def create_task_note(session: Session, task_id: int, note_text: str) -> int:
     """
     Creates a new note for the given task.
@@ -11,16 +24,51 @@ def create_task_note(session: Session, task_id: int, note_text: str) -> int:
     """
     new_note = TaskNote(taskid=task_id, note=note_text)
     session.add(new_note)
+    session.flush()
+    _add_to_note_count(session, task_id, 1)
+    record_change(session, "note_created", task_id, noteid=new_note.noteid)
     session.commit()
     session.refresh(new_note)
     return new_note.noteid
 
+@reads
 def get_notes_by_task(session: Session, task_id: int):
     """
     Retrieves all notes associated with a given task.
     """
     return session.query(TaskNote).filter(TaskNote.taskid == task_id).order_by(TaskNote.created_at.asc()).all()
 
+@reads
+def get_notes_page(session: Session, task_id: int, limit: int, before_id: Optional[int] = None) -> List[TaskNote]:
+    """
+    Up to `limit` of a task's notes, newest first, starting below note
+    `before_id` when given. Keyed on noteid, so each page is one range scan
+    of the (taskid, noteid) index however deep the caller has paged.
+    """
+    query = select(TaskNote).where(TaskNote.taskid == task_id)
+    if before_id is not None:
+        query = query.where(TaskNote.noteid < before_id)
+    return session.execute(query.order_by(TaskNote.noteid.desc()).limit(limit)).scalars().all()
+
+def copy_task_notes(session: Session, source_task_id: int, target_task_id: int) -> int:
+    """
+    Copies a task's notes onto another task in one statement, without
+    loading them, and adds them to its note count. Returns how many were copied.
+    """
+    now = datetime.utcnow()
+    copied = session.execute(
+        insert(TaskNote).from_select(
+            ["taskid", "note", "created_at", "updated_at"],
+            select(literal(target_task_id, Integer), TaskNote.note, literal(now, DateTime), literal(now, DateTime))
+            .where(TaskNote.taskid == source_task_id)
+            .order_by(TaskNote.noteid),
+        )
+    ).rowcount
+    if copied:
+        _add_to_note_count(session, target_task_id, copied)
+    return copied
+
+@writes
 def update_task_note(session: Session, note_id: int, new_text: str) -> bool:
     """
     Updates the note text for a given note.
@@ -29,10 +77,12 @@ def update_task_note(session: Session, note_id: int, new_text: str) -> bool:
     if note:
         note.note = new_text
         note.updated_at = datetime.utcnow()
+        record_change(session, "note_updated", note.taskid, noteid=note_id)
         session.commit()
         return True
     return False
 
+@writes
 def delete_task_note(session: Session, note_id: int) -> bool:
     """
     Deletes a note by its ID.
@@ -40,10 +90,13 @@ def delete_task_note(session: Session, note_id: int) -> bool:
     note = session.get(TaskNote, note_id)
     if note:
         session.delete(note)
+        _add_to_note_count(session, note.taskid, -1)
+        record_change(session, "note_deleted", note.taskid, noteid=note_id)
         session.commit()
         return True
     return False
 
 
+@reads
 def get_notes_by_ids(session: Session, note_ids: list[int]):
     return session.query(TaskNote).filter(TaskNote.noteid.in_(note_ids)).all()
@@ -1,9 +1,13 @@
+from data.change_feed import record_change
+from data.crud.completion_crud import count_completions
+from data.db_session import reads, writes
 from data.models.tag_model import TaskTag
 from data.models.task_model import Task
 from sqlalchemy import func, select
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 
 
+@writes
 def add_tag_to_task(session: Session, task: Task, tag_name: str):
     tag = session.query(TaskTag).filter_by(name=tag_name).first()
     if not tag:
@@ -13,19 +17,28 @@ def add_tag_to_task(session: Session, task: Task, tag_name: str):
 
     if tag not in task.tasktags:
         task.tasktags.append(tag)
+        count_completions(session, [task.taskid], 1, tag_id=tag.id)
+        record_change(session, "tagged", task.taskid, tag=tag_name)
 
+@writes
 def remove_tag_from_task(session: Session, task: Task, tag_name: str):
     tag = session.query(TaskTag).filter_by(name=tag_name).first()
     if tag and tag in task.tasktags:
         task.tasktags.remove(tag)
+        count_completions(session, [task.taskid], -1, tag_id=tag.id)
+        record_change(session, "untagged", task.taskid, tag=tag_name)
 
+@reads
 def get_tags_for_task(session: Session, task: Task) -> list[str]:
     return [tag.name for tag in task.tasktags]
 
 
+@reads
 def get_tasks_by_tag_name(session: Session, tag_name: str):
+    # Callers show the description, and get_tasks_by_tag hands the tasks out detached.
     return (
         session.query(Task)
+        .options(undefer(Task.description))
         .join(Task.tasktags)
         .filter(
             TaskTag.name == tag_name,
@@ -36,6 +49,7 @@ def get_tasks_by_tag_name(session: Session, tag_name: str):
     )
 
 
+@reads
 def count_tasks_by_tag(session: Session, tag_name: str) -> int:
     """
     Returns the number of tasks that have the given tag,
@@ -1,10 +1,522 @@
+import contextvars
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import config
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.orm import Session, sessionmaker
 from config import DATABASE_URL
+from data.change_feed import discard_changes_after, pending_change_count
+from data.schema import ensure_schema
+from data.sqlite_backup import copy_database
+
+READ_POOL_SIZE = getattr(config, "READ_POOL_SIZE", 8)
+BUSY_TIMEOUT_MS = getattr(config, "SQLITE_BUSY_TIMEOUT_MS", 5000)
+# Group commit: merge write jobs arriving within the window into one transaction.
+GROUP_COMMIT = getattr(config, "WRITE_GROUP_COMMIT", False)
+GROUP_COMMIT_WINDOW_MS = getattr(config, "WRITE_GROUP_WINDOW_MS", 3)
+GROUP_COMMIT_MAX_BATCH = getattr(config, "WRITE_GROUP_MAX_BATCH", 64)
+# Tenancy: with a directory set, a request naming a tenant gets its own database file there.
+TENANT_DATABASE_DIR = getattr(config, "TENANT_DATABASE_DIR", None)
+TENANT_HEADER = getattr(config, "TENANT_HEADER", "X-Tenant")
+TENANT_CACHE_SIZE = getattr(config, "TENANT_CACHE_SIZE", 16)
+# Local-first: the default database works on this local file and is checkpointed to DATABASE_URL's file.
+LOCAL_DATABASE_PATH = getattr(config, "LOCAL_DATABASE_PATH", None)
+
+_TENANT_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def _configure_writer(dbapi_connection, connection_record):
+    # Disable pysqlite's implicit BEGIN so the "begin" hook below controls it.
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def _begin_immediate(conn):
+    # Take the write lock up front instead of failing on upgrade mid-transaction.
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def _configure_reader(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+class DatabaseClosed(RuntimeError):
+    """The database was disposed; it cannot be written to or reopened."""
+
+
+class WriterSession(Session):
+    """
+    Session used by the write queue. While a grouped job is running, the
+    job's own commit() only flushes and its rollback() only undoes the job's
+    savepoint, so one real commit can cover the whole group.
+    """
+    job_savepoint = None
+
+    def commit(self):
+        if self.job_savepoint is not None:
+            self.flush()
+            return
+        super().commit()
+
+    def rollback(self):
+        if self.job_savepoint is not None:
+            if self.job_savepoint.is_active:
+                self.job_savepoint.rollback()
+            discard_changes_after(self, self.info["job_change_mark"])
+            self.job_savepoint = self.begin_nested()
+            return
+        super().rollback()
+
+
+def _start_background_work(database: "Database"):
+    """Starts the background threads every database runs once its schema is ready."""
+    # Imported here: both build on this module.
+    from data.activation_scheduler import start_activation_scheduler
+    from data.checkpoint import start_checkpointer
+
+    start_activation_scheduler(database)
+    start_checkpointer(database)
+
+
+class Database:
+    """
+    Everything bound to one SQLite file: the writer engine and its write
+    queue, the read-only pool, their sessionmakers, and in-memory state
+    kept per database (see `local`). `tenant` is None for the default
+    database at DATABASE_URL.
+
+    With a `checkpoint_path`, the file at `url` is a local working copy of
+    that one: it is restored from it when missing, and data/checkpoint.py
+    copies it back there periodically.
+
+    Requests hold the database with `acquire`/`release`. A retired one
+    (an evicted tenant) is disposed when the last holder releases it, and a
+    disposed one stays closed: using it raises DatabaseClosed.
+    """
+
+    def __init__(self, url: str, tenant: Optional[str] = None, checkpoint_path: Optional[str] = None):
+        self.tenant = tenant
+        self.path = make_url(url).database
+        self.checkpoint_path = checkpoint_path
+        # All writes go through this single connection, fed by the write queue.
+        self.engine = create_engine(url, echo=False, pool_size=1, max_overflow=0)
+        # Read-only connections; under WAL they never wait on the writer.
+        self.read_engine = create_engine(url, echo=False, pool_size=READ_POOL_SIZE, max_overflow=0)
+        event.listen(self.engine, "connect", _configure_writer)
+        event.listen(self.engine, "begin", _begin_immediate)
+        event.listen(self.read_engine, "connect", _configure_reader)
+
+        # The change feed tags events with the tenant of the session that committed them.
+        info = {"tenant": tenant}
+        self.SessionLocal = sessionmaker(bind=self.engine, class_=WriterSession, expire_on_commit=False, info=info)
+        self.ReadSessionLocal = sessionmaker(bind=self.read_engine, autoflush=False, expire_on_commit=False, info=info)
+        self.write_queue = WriteQueue(
+            self.SessionLocal,
+            window_ms=GROUP_COMMIT_WINDOW_MS if GROUP_COMMIT else 0,
+            max_batch=GROUP_COMMIT_MAX_BATCH if GROUP_COMMIT else 1,
+        )
+        self._lock = threading.Lock()
+        self._locals: Dict[str, Any] = {}
+        self.schema_ready = False
+        self.closed = False
+        self._holders = 0
+        self._retired = False
+
+    def ensure_schema(self):
+        """Creates or upgrades the schema the first time the database is used."""
+        if self.schema_ready:
+            return
+        with self._lock:
+            if self.closed:
+                raise DatabaseClosed(f"{self.path} has been closed.")
+            if self.schema_ready:
+                return
+            if self.checkpoint_path and not os.path.exists(self.path) and os.path.exists(self.checkpoint_path):
+                copy_database(self.checkpoint_path, self.path)
+            ensure_schema(self.engine)
+            self.schema_ready = True
+        _start_background_work(self)
+
+    def local(self, name: str, factory: Callable[["Database"], Any]) -> Any:
+        """This database's instance of `name`, created with `factory(database)` on first use."""
+        value = self._locals.get(name)
+        if value is None:
+            with self._lock:
+                if self.closed:
+                    raise DatabaseClosed(f"{self.path} has been closed.")
+                value = self._locals.get(name)
+                if value is None:
+                    value = self._locals[name] = factory(self)
+        return value
+
+    def existing_local(self, name: str) -> Any:
+        return self._locals.get(name)
+
+    def acquire(self) -> "Database":
+        with self._lock:
+            if self.closed:
+                raise DatabaseClosed(f"{self.path} has been closed.")
+            self._holders += 1
+        return self
+
+    def release(self):
+        with self._lock:
+            self._holders -= 1
+            idle = self._retired and self._holders == 0
+        if idle:
+            self._dispose_in_background()
+
+    def retire(self):
+        """Disposes the database as soon as no request holds it."""
+        with self._lock:
+            self._retired = True
+            idle = self._holders == 0
+        if idle:
+            self._dispose_in_background()
+
+    def _dispose_in_background(self):
+        # Closing waits for the writer to drain, so keep it off the caller's thread.
+        threading.Thread(target=self.dispose, name="db-dispose", daemon=True).start()
+
+    def dispose(self):
+        """
+        Stops the writer once its queue drains, closes locals that have a
+        `close`, and closes both pools. The database cannot be used again.
+        """
+        self.write_queue.close()
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.schema_ready = False
+            values, self._locals = list(self._locals.values()), {}
+        for value in values:
+            if hasattr(value, "close"):
+                value.close()
+        self.engine.dispose()
+        self.read_engine.dispose()
 
-engine = create_engine(DATABASE_URL, echo=False)
-SessionLocal = sessionmaker(bind=engine)
 
 def get_db_session():
-    return SessionLocal()
+    return current_database().SessionLocal()
+
+
+class _RequestScope:
+    __slots__ = ("database", "connection", "session")
+
+    def __init__(self, database: Database):
+        self.database = database
+        self.connection = None
+        self.session: Optional[Session] = None
+
+
+_request_scope: contextvars.ContextVar[Optional[_RequestScope]] = contextvars.ContextVar(
+    "request_db_scope", default=None
+)
+
+
+def current_database() -> Database:
+    """The database of the request being handled, or the default one."""
+    scope = _request_scope.get()
+    return scope.database if scope is not None else default_database
+
+
+@contextmanager
+def request_scope(database: Database) -> Iterator[None]:
+    """
+    Makes `database` the current one for the request being handled. Reads
+    made inside share one read session on one pooled connection, opened
+    on first use and closed when the scope ends.
+    """
+    scope = _RequestScope(database)
+    _request_scope.set(scope)
+    try:
+        yield
+    finally:
+        if scope.session is not None:
+            scope.session.close()
+            scope.connection.close()
+
+
+@contextmanager
+def read_session() -> Iterator[Session]:
+    """
+    The current request's read session, or a short-lived one outside a
+    request. Callers must not close it themselves.
+    """
+    scope = _request_scope.get()
+    if scope is None:
+        with ReadSessionLocal() as session:
+            yield session
+        return
+    if scope.session is None:
+        scope.connection = scope.database.read_engine.connect()
+        scope.session = scope.database.ReadSessionLocal(bind=scope.connection)
+    yield scope.session
+
+
+def _after_request_write():
+    """Lets the request's later reads see the write it just made."""
+    scope = _request_scope.get()
+    if scope is not None and scope.session is not None:
+        # Ends the read transaction (and its WAL snapshot) but keeps the connection.
+        scope.session.expire_all()
+        scope.session.commit()
+
+
+class WriteQueue:
+    """
+    Runs write jobs one at a time on a dedicated thread that owns the writer
+    connection. A job is a callable taking a session as its first argument;
+    it is committed when it returns and rolled back if it raises. Callers
+    block until it has run and get its result or exception back. Jobs run
+    in a copy of the submitting thread's context, so context variables set
+    for a request are visible to its writes.
+
+    With `max_batch` above 1, jobs arriving within `window_ms` of the first
+    one share a transaction. Each job runs in its own savepoint, so a failing
+    job is rolled back alone, and every caller is answered only after the
+    shared commit, so reads issued afterwards see the write.
+    """
+
+    def __init__(self, session_factory: Callable, window_ms: float = 0, max_batch: int = 1):
+        self._session_factory = session_factory
+        self._window = window_ms / 1000
+        self._max_batch = max(max_batch, 1)
+        self._queue: queue.Queue = queue.Queue()
+        self._local = threading.local()
+        self._thread = None
+        self._closed = False
+        # Guards starting the thread, and orders every accepted job before the close sentinel.
+        self._start_lock = threading.Lock()
+
+    def submit(self, job: Callable, *args, **kwargs) -> Future:
+        future: Future = Future()
+        session = getattr(self._local, "session", None)
+        if session is not None:
+            # Called from inside a write job: join its session instead of deadlocking.
+            try:
+                future.set_result(job(session, *args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+
+        with self._start_lock:
+            if self._closed:
+                raise DatabaseClosed("The write queue has been closed.")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+            self._queue.put((future, contextvars.copy_context(), job, args, kwargs))
+        return future
+
+    def run(self, job: Callable, *args, **kwargs) -> Any:
+        return self.submit(job, *args, **kwargs).result()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._max_batch == 1:
+                self._run_one(*item)
+                continue
+
+            batch = [item]
+            deadline = time.monotonic() + self._window
+            stopping = False
+            while len(batch) < self._max_batch:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._run_group(batch)
+            if stopping:
+                return
+
+    def _run_one(self, future: Future, context: contextvars.Context, job: Callable, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            with self._session_factory() as session:
+                self._local.session = session
+                try:
+                    result = context.run(job, session, *args, **kwargs)
+                    # Jobs built on flush-only CRUD functions rely on this commit.
+                    context.run(session.commit)
+                finally:
+                    self._local.session = None
+            future.set_result(result)
+        except BaseException as e:
+            future.set_exception(e)
+
+    def _run_group(self, batch):
+        outcomes = []
+        try:
+            with self._session_factory() as session:
+                self._local.session = session
+                try:
+                    for future, context, job, args, kwargs in batch:
+                        if future.set_running_or_notify_cancel():
+                            outcomes.append((future, *context.run(self._run_in_savepoint, session, job, args, kwargs)))
+                finally:
+                    self._local.session = None
+                session.commit()
+        except BaseException as e:
+            # The shared commit failed, so none of the group's writes landed.
+            for future, _, _ in outcomes:
+                future.set_exception(e)
+            return
+
+        for future, succeeded, value in outcomes:
+            if succeeded:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    @staticmethod
+    def _run_in_savepoint(session: WriterSession, job: Callable, args, kwargs):
+        session.info["job_change_mark"] = pending_change_count(session)
+        session.job_savepoint = session.begin_nested()
+        try:
+            result = job(session, *args, **kwargs)
+            session.flush()
+            session.job_savepoint.commit()
+            return True, result
+        except BaseException as e:
+            if session.job_savepoint.is_active:
+                session.job_savepoint.rollback()
+            discard_changes_after(session, session.info["job_change_mark"])
+            return False, e
+        finally:
+            session.job_savepoint = None
+
+    def close(self):
+        """Runs the jobs already submitted, then stops the writer. Later submits raise DatabaseClosed."""
+        with self._start_lock:
+            self._closed = True
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+
+if LOCAL_DATABASE_PATH:
+    _local_url = "sqlite:///" + LOCAL_DATABASE_PATH.replace("\\", "/")
+    default_database = Database(_local_url, checkpoint_path=make_url(DATABASE_URL).database)
+else:
+    default_database = Database(DATABASE_URL)
+# The default database's handles, for code that predates tenancy.
+engine = default_database.engine
+read_engine = default_database.read_engine
+SessionLocal = default_database.SessionLocal
+ReadSessionLocal = default_database.ReadSessionLocal
+write_queue = default_database.write_queue
+
+_tenants_lock = threading.Lock()
+_tenants: "OrderedDict[str, Database]" = OrderedDict()
+
+
+def database_for(tenant: Optional[str]) -> Database:
+    """
+    The database for `tenant`, or the default one for None, acquired for
+    the caller, who must `release()` it. Tenant databases are kept in an
+    LRU of TENANT_CACHE_SIZE; an evicted one is retired, so it is closed
+    once its last request is done, and the next request opens a new one.
+    """
+    if tenant is None:
+        return default_database.acquire()
+    if TENANT_DATABASE_DIR is None:
+        raise ValueError("Tenant databases are not enabled.")
+    if not _TENANT_ID.fullmatch(tenant):
+        raise ValueError("Tenant ids are 1-64 letters, digits, '-' or '_'.")
+
+    evicted = []
+    with _tenants_lock:
+        database = _tenants.get(tenant)
+        if database is not None:
+            _tenants.move_to_end(tenant)
+            return database.acquire()
+        os.makedirs(TENANT_DATABASE_DIR, exist_ok=True)
+        path = os.path.join(TENANT_DATABASE_DIR, f"{tenant}.db").replace("\\", "/")
+        database = _tenants[tenant] = Database(f"sqlite:///{path}", tenant).acquire()
+        while len(_tenants) > max(TENANT_CACHE_SIZE, 1):
+            evicted.append(_tenants.popitem(last=False)[1])
+    for old in evicted:
+        old.retire()
+    return database
+
+
+def cached_database(tenant: Optional[str]) -> Optional[Database]:
+    """The database for `tenant` if it is open, without opening it."""
+    if tenant is None:
+        return default_database
+    with _tenants_lock:
+        return _tenants.get(tenant)
+
+
+def local_listener(name: str) -> Callable:
+    """
+    A change-feed listener that hands each database's events to its `name`
+    local via `on_changes`, for databases where that local exists.
+    """
+    def listener(events):
+        by_tenant: Dict[Optional[str], list] = {}
+        for change in events:
+            by_tenant.setdefault(change.get("tenant"), []).append(change)
+        for tenant, group in by_tenant.items():
+            database = cached_database(tenant)
+            target = database.existing_local(name) if database is not None else None
+            if target is not None:
+                target.on_changes(group)
+    return listener
+
+
+def reads(fn: Callable) -> Callable:
+    """Declares a CRUD function read-only; run_db gives it a pooled read session."""
+    fn.db_access = "read"
+    return fn
+
+
+def writes(fn: Callable) -> Callable:
+    """Declares a CRUD function as writing; run_db sends it to the write queue."""
+    fn.db_access = "write"
+    return fn
+
+
+def run_db(fn: Callable, *args, **kwargs) -> Any:
+    """
+    Calls a CRUD function with a session chosen by its declaration.
+    Undeclared functions are treated as writes.
+    """
+    if getattr(fn, "db_access", "write") == "read":
+        with read_session() as session:
+            return fn(session, *args, **kwargs)
+    return run_write(fn, *args, **kwargs)
+
+
+def run_write(job: Callable, *args, **kwargs) -> Any:
+    """Runs a multi-step write job, `job(session, ...)`, on the writer."""
+    try:
+        return current_database().write_queue.run(job, *args, **kwargs)
+    finally:
+        _after_request_write()
@@ -0,0 +1,153 @@
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from data.change_feed import add_listener
+from data.crud.dependency_crud import get_all_dependencies
+from data.db_session import Database, current_database, local_listener
+
+
+class DependencyIndex:
+    """
+    In-memory copy of the task dependency graph with, per dependent task,
+    the number of blockers that are still unfinished (neither completed nor
+    deleted), so "is this task blocked" is a dict lookup.
+
+    Loaded from the database on first use and kept current from the change
+    feed. Every change sets state rather than toggling it, so events that
+    race the initial load can simply be replayed on top of it. Only tasks
+    that block another are tracked, so memory follows the dependency graph
+    rather than every task ever completed. There is one per database; use
+    `get_dependency_index()`.
+    """
+
+    def __init__(self, database: Database):
+        self._database = database
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        self._loading: Optional[List[Dict[str, Any]]] = None
+        self._blockers: Dict[int, Set[int]] = {}
+        self._dependents: Dict[int, Set[int]] = {}
+        self._finished: Set[int] = set()
+        self._open_blockers: Dict[int, int] = {}
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            with self._lock:
+                self._loading = []
+            with self._database.ReadSessionLocal() as session:
+                links = get_all_dependencies(session)
+            with self._lock:
+                self._reset()
+                for dependent_id, blocking_id, finished in links:
+                    self._link(dependent_id, blocking_id)
+                    self._set_finished(blocking_id, finished)
+                pending, self._loading = self._loading, None
+                self._loaded = True
+                for change in pending:
+                    self._apply(change)
+
+    def _reset(self):
+        self._blockers.clear()
+        self._dependents.clear()
+        self._finished.clear()
+        self._open_blockers.clear()
+
+    def _link(self, dependent_id: int, blocking_id: int):
+        blockers = self._blockers.setdefault(dependent_id, set())
+        if blocking_id in blockers:
+            return
+        blockers.add(blocking_id)
+        self._dependents.setdefault(blocking_id, set()).add(dependent_id)
+        if blocking_id not in self._finished:
+            self._open_blockers[dependent_id] = self._open_blockers.get(dependent_id, 0) + 1
+
+    def _unlink(self, dependent_id: int, blocking_id: int):
+        blockers = self._blockers.get(dependent_id)
+        if not blockers or blocking_id not in blockers:
+            return
+        blockers.discard(blocking_id)
+        if blocking_id not in self._finished:
+            self._open_blockers[dependent_id] -= 1
+        if not blockers:
+            del self._blockers[dependent_id]
+            self._open_blockers.pop(dependent_id, None)
+        dependents = self._dependents[blocking_id]
+        dependents.discard(dependent_id)
+        if not dependents:
+            # Nothing waits on it any more; the next dependency_added says whether it is finished.
+            del self._dependents[blocking_id]
+            self._finished.discard(blocking_id)
+
+    def _set_finished(self, task_id: int, finished: bool):
+        if finished == (task_id in self._finished):
+            return
+        if finished and task_id not in self._dependents:
+            # Only blockers are tracked, so completing other tasks does not grow the set.
+            return
+        step = -1 if finished else 1
+        if finished:
+            self._finished.add(task_id)
+        else:
+            self._finished.discard(task_id)
+        for dependent_id in self._dependents.get(task_id, ()):
+            self._open_blockers[dependent_id] += step
+
+    def _apply(self, change: Dict[str, Any]):
+        kind = change["type"]
+        task_id = change.get("taskid")
+        if kind == "dependency_added":
+            # Linked first: finished state is only kept for tasks with dependents.
+            self._link(task_id, change["blockingtaskid"])
+            self._set_finished(change["blockingtaskid"], change["blocking_finished"])
+        elif kind == "dependency_removed":
+            self._unlink(task_id, change["blockingtaskid"])
+        elif kind in ("completed", "deleted"):
+            self._set_finished(task_id, True)
+        elif kind == "updated":
+            fields = change.get("fields", {})
+            if ("status" in fields or "deleted" in fields) and task_id in self._dependents:
+                # A reopened blocker may still be deleted, an undeleted one still completed; only the database knows.
+                self._loaded = False
+        elif kind in ("archived", "restored"):
+            # Archiving and restoring move links in bulk; start over rather than replay them.
+            self._loaded = False
+
+    def on_changes(self, events: List[Dict[str, Any]]):
+        with self._lock:
+            if self._loading is not None:
+                self._loading.extend(events)
+            elif self._loaded:
+                for change in events:
+                    self._apply(change)
+
+    def invalidate(self):
+        """Drops the index; the next lookup reloads it from the database."""
+        with self._lock:
+            self._loaded = False
+
+    def is_blocked(self, task_id: int) -> bool:
+        self._ensure_loaded()
+        return self._open_blockers.get(task_id, 0) > 0
+
+    def unblocked(self, task_ids: Iterable[int]) -> List[int]:
+        """`task_ids` in their original order, minus tasks waiting on an unfinished blocker."""
+        self._ensure_loaded()
+        open_blockers = self._open_blockers
+        return [task_id for task_id in task_ids if not open_blockers.get(task_id, 0)]
+
+    def blocked_ids(self) -> Set[int]:
+        self._ensure_loaded()
+        return {task_id for task_id, count in self._open_blockers.items() if count > 0}
+
+
+def get_dependency_index() -> DependencyIndex:
+    """The dependency index of the current request's database."""
+    return current_database().local("dependency_index", DependencyIndex)
+
+
+add_listener(local_listener("dependency_index"))
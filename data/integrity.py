@@ -0,0 +1,61 @@
+from typing import Dict, Iterable, List, Tuple
+
+from data.crud.integrity_crud import (get_dangling_parent_ids,
+                                      get_duplicate_tag_link_ids,
+                                      get_note_count_mismatches,
+                                      get_orphaned_links, get_parent_links,
+                                      get_task_count)
+from sqlalchemy.orm import Session
+
+
+def find_cycles(links: Iterable[Tuple[int, int]]) -> List[List[int]]:
+    """
+    The cycles among (taskid, parenttaskid) links, each as its task ids
+    from the smallest one up through its parents. One pass of union-find:
+    since a task has one parent, a link whose task and parent are already
+    connected closes a cycle, and each cycle is closed by exactly one link.
+    """
+    parent_of: Dict[int, int] = dict(links)
+    leader: Dict[int, int] = {}
+
+    def find(task_id: int) -> int:
+        top = task_id
+        while leader.get(top, top) != top:
+            top = leader[top]
+        while task_id != top:
+            leader[task_id], task_id = top, leader[task_id]
+        return top
+
+    cycles = []
+    for task_id, parent_id in parent_of.items():
+        task_top, parent_top = find(task_id), find(parent_id)
+        if task_top != parent_top:
+            leader[task_top] = parent_top
+            continue
+        cycle = [task_id]
+        while parent_id != task_id:
+            cycle.append(parent_id)
+            parent_id = parent_of[parent_id]
+        start = cycle.index(min(cycle))
+        cycles.append(cycle[start:] + cycle[:start])
+    return cycles
+
+
+def find_integrity_issues(session: Session) -> Dict[str, list]:
+    """
+    Everything wrong with the hierarchy and the link tables, from one scan
+    per check: "cycles" (lists of task ids), "dangling_parents" (task ids),
+    "orphaned_<kind>" for each LINK_KEYS kind (row keys),
+    "duplicate_tag_links" (tasktagids) and "note_count_mismatches"
+    ((taskid, actual count) pairs). Also "task_count", for the report.
+    """
+    issues = {
+        "task_count": get_task_count(session),
+        "cycles": find_cycles(get_parent_links(session)),
+        "dangling_parents": get_dangling_parent_ids(session),
+    }
+    for kind, keys in get_orphaned_links(session).items():
+        issues[f"orphaned_{kind}"] = keys
+    issues["duplicate_tag_links"] = get_duplicate_tag_link_ids(session)
+    issues["note_count_mismatches"] = get_note_count_mismatches(session)
+    return issues
@@ -0,0 +1,18 @@
+from datetime import date
+
+from sqlalchemy import Date, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from data.models.alchemy_base import Base
+
+
+class CompletionRollup(Base):
+    """
+    Completed-task counts per day. `scope` is "all" (key 0), "tag" (key is
+    the tag id) or "root" (key is the root task id at completion time).
+    """
+    __tablename__ = "completion_rollups"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    scope: Mapped[str] = mapped_column(String, primary_key=True)
+    key: Mapped[int] = mapped_column(Integer, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
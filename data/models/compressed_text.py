@@ -0,0 +1,65 @@
+"""
+Column type for free text that can grow large, such as descriptions and
+notes. Values over COMPRESS_TEXT_OVER_BYTES are stored as a BLOB holding a
+short marker naming the codec followed by the compressed bytes. Shorter
+values stay plain TEXT. Reads decompress transparently, so callers only
+ever see str.
+
+zstd is used when the optional `zstandard` package is installed, and zlib
+otherwise. Both markers are understood on read whichever codec writes.
+"""
+import zlib
+from typing import Optional, Union
+
+import config
+from sqlalchemy import String
+from sqlalchemy.types import TypeDecorator
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESS_OVER_BYTES = getattr(config, "COMPRESS_TEXT_OVER_BYTES", 4096)
+CODEC = getattr(config, "TEXT_COMPRESSION", "zstd" if zstandard is not None else "zlib")
+
+# Plain text is always stored as TEXT, so a BLOB starting with one of these is unambiguous.
+ZLIB_MARKER = b"\x00TLz"
+ZSTD_MARKER = b"\x00TLs"
+
+
+def compress_text(text: str) -> Union[str, bytes]:
+    """`text` as it should be stored: unchanged when short or incompressible, else marker + compressed bytes."""
+    data = text.encode("utf-8")
+    if len(data) <= COMPRESS_OVER_BYTES:
+        return text
+    if CODEC == "zstd" and zstandard is not None:
+        packed = ZSTD_MARKER + zstandard.ZstdCompressor(level=3).compress(data)
+    else:
+        packed = ZLIB_MARKER + zlib.compress(data, 6)
+    return packed if len(packed) < len(data) else text
+
+
+def decompress_text(value: Union[str, bytes, None]) -> Optional[str]:
+    if not isinstance(value, (bytes, memoryview)):
+        return value
+    value = bytes(value)
+    if value.startswith(ZLIB_MARKER):
+        return zlib.decompress(value[len(ZLIB_MARKER):]).decode("utf-8")
+    if value.startswith(ZSTD_MARKER):
+        if zstandard is None:
+            raise RuntimeError("Text was stored with zstd; install the zstandard package to read it.")
+        return zstandard.ZstdDecompressor().decompress(value[len(ZSTD_MARKER):]).decode("utf-8")
+    return value.decode("utf-8")
+
+
+class CompressedText(TypeDecorator):
+    """A String column whose large values are stored compressed."""
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value) if isinstance(value, str) else value
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
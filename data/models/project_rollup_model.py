@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+from data.models.alchemy_base import Base
+
+
+class ProjectRollup(Base):
+    """
+    Progress of one root task's project: its undeleted descendants split by
+    status, and the earliest due date among the open tasks, root included.
+    Kept current just before each transaction commits: created, completed
+    and deleted tasks move the counters, other changes recount the project.
+    """
+    __tablename__ = "project_rollups"
+
+    rootid: Mapped[int] = mapped_column(Integer, primary_key=True)
+    total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    open: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    completed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_due: Mapped[datetime] = mapped_column(DateTime, nullable=True)
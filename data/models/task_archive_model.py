@@ -0,0 +1,69 @@
+from datetime import datetime
+
+from sqlalchemy import Boolean, DateTime, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+from data.models.alchemy_base import Base
+from data.models.compressed_text import CompressedText
+
+
+class ArchivedTask(Base):
+    """Completed or deleted task moved out of `tasks`. Keeps its original taskid."""
+    __tablename__ = "tasks_archive"
+
+    taskid: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    taskname: Mapped[str] = mapped_column(String, nullable=False)
+    description: Mapped[str] = mapped_column(CompressedText, nullable=True)
+    target: Mapped[str] = mapped_column(String, nullable=True)
+    milestone: Mapped[str] = mapped_column(String, nullable=True)
+    status: Mapped[str] = mapped_column(String, nullable=False)
+    duedate: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    earlieststarttime: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    repeatinterval: Mapped[int] = mapped_column(Integer, nullable=True)
+    repeattimeofday: Mapped[int] = mapped_column(Integer, nullable=True)
+    repeatskipweekend: Mapped[bool] = mapped_column(Boolean, nullable=True)
+    parenttaskid: Mapped[int] = mapped_column(Integer, nullable=True, index=True)
+    createdat: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    lastedittime: Mapped[datetime] = mapped_column(DateTime, nullable=True, index=True)
+    urgent: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    important: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    deleted: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    deleted_date: Mapped[datetime] = mapped_column(DateTime, nullable=True, index=True)
+    sort_order: Mapped[int] = mapped_column(Integer, nullable=True)
+    completed_at: Mapped[datetime] = mapped_column(DateTime, nullable=True, index=True)
+    completed_rootid: Mapped[int] = mapped_column(Integer, nullable=True, index=True)
+    note_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    defer_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+
+
+class ArchivedTaskNote(Base):
+    __tablename__ = "tasknotes_archive"
+
+    noteid: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    taskid: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    note: Mapped[str] = mapped_column(CompressedText, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+
+class ArchivedTaskTagLink(Base):
+    __tablename__ = "tasktaglinks_archive"
+
+    tasktagid: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    taskid: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    tagid: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class ArchivedTaskArtifact(Base):
+    __tablename__ = "task_artifact_archive"
+
+    taskid: Mapped[int] = mapped_column(Integer, primary_key=True)
+    artifact_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+
+class ArchivedTaskDependency(Base):
+    """A dependency with at least one archived end; restored once both ends are live again."""
+    __tablename__ = "taskdependencies_archive"
+
+    dependenttaskid: Mapped[int] = mapped_column(Integer, primary_key=True)
+    blockingtaskid: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
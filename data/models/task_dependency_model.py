@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy import Integer, ForeignKey
-from data.models.base import Base
+from data.models.alchemy_base import Base
 
 class TaskDependencies(Base):
     __tablename__ = "taskdependencies"
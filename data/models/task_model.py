@@ -1,24 +1,36 @@
 from typing import List, TYPE_CHECKING
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Integer, String, Boolean, DateTime, ForeignKey, Index
 from datetime import datetime
 from data.models.alchemy_base import Base
+from data.models.compressed_text import CompressedText
+
+if TYPE_CHECKING:
+    from data.models.tag_model import TaskTag
+    from data.models.task_note_model import TaskNote
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_completed_rootid", "completed_rootid", "completed_at"),
+        # Covers child lookups, including project rollups, without touching the table.
+        Index("ix_tasks_parenttaskid", "parenttaskid", "status", "deleted", "duedate"),
+    )
 
     taskid: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     taskname: Mapped[str] = mapped_column(String, nullable=False)
-    description: Mapped[str] = mapped_column(String, default="", nullable=True)
+    # Deferred: loaded on first access (or with undefer), never by list queries.
+    description: Mapped[str] = mapped_column(CompressedText, default="", nullable=True, deferred=True)
     target: Mapped[str] = mapped_column(String, default="", nullable=True)
     milestone: Mapped[str] = mapped_column(String, nullable=True)
     status: Mapped[str] = mapped_column(String, nullable=False)
     duedate: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     earlieststarttime: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     repeatinterval: Mapped[int] = mapped_column(Integer, nullable=True)
-    repeattimeofday: Mapped[int] = mapped_column(DateTime, nullable=True)
+    repeattimeofday: Mapped[int] = mapped_column(Integer, nullable=True)
     repeatskipweekend: Mapped[bool] = mapped_column(Boolean, nullable=True)
     parenttaskid: Mapped[int] = mapped_column(ForeignKey("tasks.taskid"), nullable=True)
+    # createdat and lastedittime are UTC; the start, due, completion and deletion times are local time.
     createdat: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     lastedittime: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     urgent: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
@@ -28,6 +40,17 @@ class Task(Base):
     deleted: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     deleted_date: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     sort_order: Mapped[int] = mapped_column(Integer, nullable=True)
+    # Local time, so the completion rollups count it on the user's day.
+    completed_at: Mapped[datetime] = mapped_column(DateTime, nullable=True, index=True)
+    # The project the completion counts under; moved along when the task or an ancestor is reparented.
+    completed_rootid: Mapped[int] = mapped_column(Integer, nullable=True)
+    # Kept by the note CRUD functions so stubs and lists never load notes to count them.
+    note_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    # Times earlieststarttime was pushed further into the future; see count_deferral.
+    defer_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+
+    tasknotes: Mapped[List["TaskNote"]] = relationship("TaskNote", back_populates="task")
+    tasktags: Mapped[List["TaskTag"]] = relationship("TaskTag", secondary="tasktaglinks")
 
 
 
@@ -49,7 +72,9 @@ class Task(Base):
             f"  important={self.important},\n"
             f"  deleted={self.deleted},\n"
             f"  deleted_date={self.deleted_date},\n"
-            f"  sort_order={self.sort_order}\n"
+            f"  sort_order={self.sort_order},\n"
+            f"  completed_at={self.completed_at},\n"
+            f"  note_count={self.note_count}\n"
         )
 
     def print_as_stub(self) -> str:
@@ -79,8 +104,8 @@ class Task(Base):
             lines.append(f"**Status:** {self.status}")
             lines.append('\n')
 
-        if hasattr(self, "tasknotes") and self.tasknotes:
-            lines.append(f"**Note count: {len(self.tasknotes)}**")
+        if getattr(self, "note_count", None):
+            lines.append(f"**Note count: {self.note_count}**")
         #     for note in self.tasknotes:
         #         if getattr(note, "note", None):
         #             created = note.created_at.strftime('%Y-%m-%d %H:%M') if note.created_at else ""
@@ -1,16 +1,21 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, DateTime, ForeignKey
+from sqlalchemy import Integer, DateTime, ForeignKey, Index
 from datetime import datetime
 
 from data.models.task_model import Task
 from data.models.alchemy_base import Base
+from data.models.compressed_text import CompressedText
 
 class TaskNote(Base):
     __tablename__ = "tasknotes"
+    __table_args__ = (
+        # Serves the newest-first, keyset-paginated notes of one task.
+        Index("ix_tasknotes_taskid_noteid", "taskid", "noteid"),
+    )
 
     noteid: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     taskid: Mapped[int] = mapped_column(Integer, ForeignKey("tasks.taskid"), nullable=False)
-    note: Mapped[str] = mapped_column(String, nullable=False)
+    note: Mapped[str] = mapped_column(CompressedText, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     task: Mapped["Task"] = relationship("Task", back_populates="tasknotes")
@@ -1,9 +1,12 @@
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import Integer, ForeignKey
+from sqlalchemy import Integer, ForeignKey, Index
 from data.models.alchemy_base import Base
 
 class TaskTagLink(Base):
     __tablename__ = "tasktaglinks"
+    __table_args__ = (
+        Index("ix_tasktaglinks_tagid_taskid", "tagid", "taskid"),
+    )
 
     tasktagid: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     taskid: Mapped[int] = mapped_column(ForeignKey("tasks.taskid"), nullable=False)
@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Iterable, List, NamedTuple, Optional
+
+from data.models.task_model import Task
+from sqlalchemy import Select, select
+
+
+class TaskRow(NamedTuple):
+    """
+    Read-only task for list views, built from a column-only select. Much
+    smaller than a mapped Task and never tracked by the session; anything
+    needing notes, tags or writes loads the Task itself.
+    """
+    taskid: int
+    taskname: str
+    status: str
+    parenttaskid: Optional[int]
+    urgent: bool
+    important: bool
+    sort_order: Optional[int]
+    earlieststarttime: Optional[datetime]
+    completed_at: Optional[datetime]
+
+
+def select_task_rows(model=Task) -> Select:
+    """SELECT of the TaskRow columns from `model` (Task or ArchivedTask)."""
+    return select(*[getattr(model, name) for name in TaskRow._fields])
+
+
+def to_task_rows(rows: Iterable[tuple]) -> List[TaskRow]:
+    return [TaskRow._make(row) for row in rows]
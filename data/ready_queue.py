@@ -0,0 +1,161 @@
+import heapq
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import config
+from data.change_feed import add_listener
+from data.crud.task_crud import get_ready_queue_rows
+from data.db_session import Database, current_database, local_listener
+from data.dependency_index import DependencyIndex
+
+RECONCILE_SECONDS = getattr(config, "READY_QUEUE_RECONCILE_SECONDS", 300)
+
+# Events whose task and parent(s) may have entered or left the queue.
+_TASK_EVENTS = {"created", "updated", "completed", "deleted", "reparented", "tagged", "untagged"}
+
+
+def _key(taskid: int, urgent: bool, important: bool, sort_order: Optional[int]) -> tuple:
+    # Urgent, then important, then sort order (unset first, as in SQL), then age.
+    return (not urgent, not important, sort_order is not None, sort_order or 0, taskid)
+
+
+class ReadyQueue:
+    """
+    Heap of the leaf tasks that could be worked on now: open, without open
+    subtasks, not tagged "waiting", past their earliest start time and not
+    blocked by a dependency.
+
+    The change feed marks the tasks an event touches (and their parents) as
+    dirty; the next lookup re-reads just those rows. Superseded heap entries
+    are skipped when they surface. Tasks whose start time is still ahead sit
+    in a second heap ordered by start time until it passes. The whole queue
+    is rebuilt from the database every RECONCILE_SECONDS. There is one per
+    database; use `get_ready_queue()`.
+    """
+
+    def __init__(self, database: Database, reconcile_seconds: float = RECONCILE_SECONDS):
+        self._database = database
+        self._lock = threading.Lock()
+        self._reconcile_seconds = reconcile_seconds
+        self._loaded_at: Optional[float] = None
+        self._heap: List[tuple] = []
+        self._future: List[Tuple[datetime, int]] = []
+        # taskid -> (heap key, earliest start) for every ready task, due or not.
+        self._entries: Dict[int, Tuple[tuple, Optional[datetime]]] = {}
+        self._parents: Dict[int, Optional[int]] = {}
+        self._dirty: Set[int] = set()
+
+    def on_changes(self, events: List[Dict[str, Any]]):
+        with self._lock:
+            for change in events:
+                kind = change["type"]
+                task_id = change.get("taskid")
+                if kind in _TASK_EVENTS and task_id is not None:
+                    self._dirty.add(task_id)
+                    # The old parent may have become a leaf; the current one is found on refresh.
+                    # _parents only knows ready leaves, so a reparent also names it.
+                    for parent_id in (self._parents.get(task_id), change.get("previous_parenttaskid")):
+                        if parent_id is not None:
+                            self._dirty.add(parent_id)
+                elif kind == "reordered":
+                    self._dirty.update(change["taskids"])
+                elif kind in ("archived", "restored"):
+                    self._loaded_at = None
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _reload(self):
+        with self._database.ReadSessionLocal() as session:
+            rows = get_ready_queue_rows(session)
+        self._heap, self._future, self._entries, self._parents = [], [], {}, {}
+        self._dirty.clear()
+        for row in rows:
+            self._store(row)
+        self._loaded_at = time.monotonic()
+
+    def _refresh_dirty(self):
+        dirty, self._dirty = set(self._dirty), set()
+        with self._database.ReadSessionLocal() as session:
+            rows = {row.taskid: row for row in get_ready_queue_rows(session, list(dirty))}
+            # A child changing state can turn its parent into a leaf or back.
+            parents = {row.parenttaskid for row in rows.values() if row.parenttaskid is not None} - dirty
+            if parents:
+                rows.update((row.taskid, row) for row in get_ready_queue_rows(session, list(parents)))
+                dirty |= parents
+        for task_id in dirty:
+            row = rows.get(task_id)
+            if row is None or not row.ready:
+                self._entries.pop(task_id, None)
+                if row is None:
+                    self._parents.pop(task_id, None)
+                else:
+                    self._parents[task_id] = row.parenttaskid
+            else:
+                self._store(row)
+
+    def _store(self, row):
+        key = _key(row.taskid, row.urgent, row.important, row.sort_order)
+        start = row.earlieststarttime
+        self._parents[row.taskid] = row.parenttaskid
+        if self._entries.get(row.taskid) == (key, start):
+            return
+        self._entries[row.taskid] = (key, start)
+        if start is not None and start > datetime.now():
+            heapq.heappush(self._future, (start, row.taskid))
+        else:
+            heapq.heappush(self._heap, key)
+
+    def _sync(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self._reconcile_seconds:
+            self._reload()
+        elif self._dirty:
+            self._refresh_dirty()
+
+        now = datetime.now()
+        while self._future and self._future[0][0] <= now:
+            start, task_id = heapq.heappop(self._future)
+            entry = self._entries.get(task_id)
+            if entry and entry[1] == start:
+                heapq.heappush(self._heap, entry[0])
+
+    def _is_current(self, key: tuple) -> bool:
+        entry = self._entries.get(key[-1])
+        if not entry or entry[0] != key:
+            return False
+        return entry[1] is None or entry[1] <= datetime.now()
+
+    def top(self, n: int = 1) -> List[int]:
+        """Ids of the `n` best ready tasks, best first."""
+        with self._lock:
+            self._sync()
+            found: List[tuple] = []
+            skipped: List[tuple] = []
+            seen: Set[int] = set()
+            dependency_index = self._database.local("dependency_index", DependencyIndex)
+            while self._heap and len(found) < n:
+                key = heapq.heappop(self._heap)
+                if key[-1] in seen or not self._is_current(key):
+                    continue
+                seen.add(key[-1])
+                (skipped if dependency_index.is_blocked(key[-1]) else found).append(key)
+            # Blocked tasks stay queued; they come back once their blockers finish.
+            for key in found + skipped:
+                heapq.heappush(self._heap, key)
+            return [key[-1] for key in found]
+
+    def next(self) -> Optional[int]:
+        """Id of the task to work on next, or None when nothing is ready."""
+        best = self.top(1)
+        return best[0] if best else None
+
+
+def get_ready_queue() -> ReadyQueue:
+    """The ready queue of the current request's database."""
+    return current_database().local("ready_queue", ReadyQueue)
+
+
+add_listener(local_listener("ready_queue"))
@@ -0,0 +1,245 @@
+import logging
+from collections import Counter
+from typing import Callable, Dict
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from data.models.alchemy_base import Base
+from data.models.compressed_text import COMPRESS_OVER_BYTES, compress_text
+# Every model must be imported so create_all sees the full metadata.
+from data.models import (artifact_model, completion_rollup_model,
+                         project_rollup_model, tag_model, task_archive_model,
+                         task_artifact_model, task_dependency_model,
+                         task_model, task_note_model, task_tag_link_model)
+
+# Bump SCHEMA_VERSION whenever a model gains a column or table. New tables
+# come from create_all; changes to existing tables need an upgrade step in
+# MIGRATIONS, which must tolerate a database create_all has just built.
+#   2: archive tables
+#   3: completed_at / completed_rootid and completion rollups
+#   4: note_count and the tasknotes (taskid, noteid) index
+#   5: large descriptions and notes stored compressed
+#   6: tasks (parenttaskid, status, deleted) index
+#   7: project rollups; duedate added to that index
+#   8: defer_count
+#   9: archived dependencies
+SCHEMA_VERSION = 9
+
+# (table, key, column) for every CompressedText column.
+COMPRESSED_COLUMNS = [
+    ("tasks", "taskid", "description"),
+    ("tasks_archive", "taskid", "description"),
+    ("tasknotes", "noteid", "note"),
+    ("tasknotes_archive", "noteid", "note"),
+]
+COMPRESS_BATCH_SIZE = 500
+
+
+class SchemaTooNew(RuntimeError):
+    """The database was written by a newer build; this one must not open or downgrade it."""
+
+
+def get_schema_version(conn: Connection) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar() or 0
+
+
+def _check_not_newer(version: int):
+    if version > SCHEMA_VERSION:
+        raise SchemaTooNew(
+            f"Database schema version {version} is newer than this build's {SCHEMA_VERSION}; "
+            "upgrade the app to open it."
+        )
+
+
+def add_column_if_missing(conn: Connection, table: str, column_ddl: str):
+    """Adds a column unless a freshly created table already has it."""
+    column_name = column_ddl.split()[0]
+    existing = {column["name"] for column in inspect(conn).get_columns(table)}
+    if column_name not in existing:
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column_ddl}")
+
+
+def _upgrade_to_3(conn: Connection):
+    for table in ("tasks", "tasks_archive"):
+        add_column_if_missing(conn, table, "completed_at DATETIME")
+        add_column_if_missing(conn, table, "completed_rootid INTEGER")
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_tasks_completed_at ON tasks (completed_at)")
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_tasks_completed_rootid ON tasks (completed_rootid, completed_at)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_tasks_archive_completed_at ON tasks_archive (completed_at)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_tasks_archive_completed_rootid ON tasks_archive (completed_rootid)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_tasktaglinks_tagid_taskid ON tasktaglinks (tagid, taskid)"
+    )
+
+    # Best available completion time for history recorded before this version.
+    rows = conn.execute(text(
+        "SELECT taskid, parenttaskid, status, lastedittime, 'tasks' FROM tasks "
+        "UNION ALL SELECT taskid, parenttaskid, status, lastedittime, 'tasks_archive' FROM tasks_archive"
+    )).all()
+    parents = {row[0]: row[1] for row in rows}
+    tags = {}
+    for taskid, tagid in conn.execute(text(
+        "SELECT taskid, tagid FROM tasktaglinks UNION ALL SELECT taskid, tagid FROM tasktaglinks_archive"
+    )):
+        tags.setdefault(taskid, []).append(tagid)
+
+    def root_of(task_id):
+        seen = set()
+        while parents.get(task_id) is not None and task_id not in seen:
+            seen.add(task_id)
+            task_id = parents[task_id]
+        return task_id
+
+    counts = Counter()
+    updates = {"tasks": [], "tasks_archive": []}
+    for taskid, _, status, lastedittime, table in rows:
+        if status != "Completed" or lastedittime is None:
+            continue
+        root_id = root_of(taskid)
+        updates[table].append({"root": root_id, "id": taskid})
+        day = str(lastedittime)[:10]
+        counts[(day, "all", 0)] += 1
+        counts[(day, "root", root_id)] += 1
+        for tagid in tags.get(taskid, []):
+            counts[(day, "tag", tagid)] += 1
+
+    for table, params in updates.items():
+        if params:
+            conn.execute(
+                text(f"UPDATE {table} SET completed_at = lastedittime, completed_rootid = :root "
+                     "WHERE taskid = :id AND completed_at IS NULL"),
+                params,
+            )
+
+    conn.execute(text("DELETE FROM completion_rollups"))
+    if counts:
+        conn.execute(
+            text("INSERT INTO completion_rollups (day, scope, key, count) VALUES (:day, :scope, :key, :count)"),
+            [{"day": day, "scope": scope, "key": key, "count": count} for (day, scope, key), count in counts.items()],
+        )
+
+
+def _upgrade_to_4(conn: Connection):
+    for table, notes in (("tasks", "tasknotes"), ("tasks_archive", "tasknotes_archive")):
+        add_column_if_missing(conn, table, "note_count INTEGER NOT NULL DEFAULT 0")
+        conn.exec_driver_sql(
+            f"UPDATE {table} SET note_count = "
+            f"(SELECT COUNT(*) FROM {notes} WHERE {notes}.taskid = {table}.taskid)"
+        )
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_tasknotes_taskid_noteid ON tasknotes (taskid, noteid)")
+
+
+def compress_stored_text(conn: Connection, batch_size: int = COMPRESS_BATCH_SIZE) -> int:
+    """
+    Rewrites plain-text values over the compression threshold in their
+    compressed form, `batch_size` rows at a time so only one batch of large
+    values is held in memory. Returns the number of values rewritten.
+    """
+    rewritten = 0
+    for table, key, column in COMPRESSED_COLUMNS:
+        last_key = -(2 ** 63)
+        while True:
+            rows = conn.execute(text(
+                f"SELECT {key}, {column} FROM {table} "
+                f"WHERE {key} > :last AND typeof({column}) = 'text' AND length(CAST({column} AS BLOB)) > :limit "
+                f"ORDER BY {key} LIMIT :batch"
+            ), {"last": last_key, "limit": COMPRESS_OVER_BYTES, "batch": batch_size}).all()
+            if not rows:
+                break
+            updates = []
+            for row_key, value in rows:
+                stored = compress_text(value)
+                if isinstance(stored, bytes):
+                    updates.append({"key": row_key, "value": stored})
+            if updates:
+                conn.execute(text(f"UPDATE {table} SET {column} = :value WHERE {key} = :key"), updates)
+            rewritten += len(updates)
+            last_key = rows[-1][0]
+    return rewritten
+
+
+def _upgrade_to_5(conn: Connection):
+    rewritten = compress_stored_text(conn)
+    if rewritten:
+        logging.info(f"Compressed {rewritten} stored descriptions and notes.")
+
+
+def _upgrade_to_6(conn: Connection):
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_tasks_parenttaskid ON tasks (parenttaskid, status, deleted)"
+    )
+
+
+def _upgrade_to_7(conn: Connection):
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_tasks_parenttaskid")
+    conn.exec_driver_sql(
+        "CREATE INDEX ix_tasks_parenttaskid ON tasks (parenttaskid, status, deleted, duedate)"
+    )
+    conn.exec_driver_sql("DELETE FROM project_rollups")
+    conn.exec_driver_sql(
+        "WITH RECURSIVE project (rootid, taskid, status, duedate) AS ("
+        " SELECT taskid, taskid, status, duedate FROM tasks WHERE parenttaskid IS NULL AND deleted = 0"
+        " UNION ALL"
+        " SELECT project.rootid, t.taskid, t.status, t.duedate FROM tasks t"
+        " JOIN project ON t.parenttaskid = project.taskid WHERE t.deleted = 0)"
+        " INSERT INTO project_rollups (rootid, total, open, completed, next_due)"
+        " SELECT rootid, total, total - completed, completed, next_due FROM ("
+        "  SELECT rootid,"
+        "   SUM(taskid != rootid) AS total,"
+        "   SUM(taskid != rootid AND status = 'Completed') AS completed,"
+        "   MIN(CASE WHEN status != 'Completed' THEN duedate END) AS next_due"
+        "  FROM project GROUP BY rootid)"
+    )
+
+
+def _upgrade_to_8(conn: Connection):
+    for table in ("tasks", "tasks_archive"):
+        add_column_if_missing(conn, table, "defer_count INTEGER NOT NULL DEFAULT 0")
+
+
+MIGRATIONS: Dict[int, Callable[[Connection], None]] = {
+    3: _upgrade_to_3,
+    4: _upgrade_to_4,
+    5: _upgrade_to_5,
+    6: _upgrade_to_6,
+    7: _upgrade_to_7,
+    8: _upgrade_to_8,
+}
+
+
+def ensure_schema(engine: Engine) -> bool:
+    """
+    Brings the database up to SCHEMA_VERSION.
+    A current database costs a single PRAGMA read; no tables are reflected.
+    Returns True if any DDL ran. Raises SchemaTooNew for a database stamped
+    by a newer build, e.g. a checkpointed file synced from another machine,
+    rather than running old DDL on it and lowering its version.
+    """
+    with engine.connect() as conn:
+        version = get_schema_version(conn)
+    _check_not_newer(version)
+    if version == SCHEMA_VERSION:
+        return False
+
+    with engine.begin() as conn:
+        # Another process may have upgraded it meanwhile.
+        version = get_schema_version(conn)
+        _check_not_newer(version)
+        if version == SCHEMA_VERSION:
+            return False
+        # Creates missing tables only; existing ones are left untouched.
+        Base.metadata.create_all(bind=conn)
+        for step in range(max(version, 1) + 1, SCHEMA_VERSION + 1):
+            if step in MIGRATIONS:
+                MIGRATIONS[step](conn)
+        conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    logging.info(f"Database schema upgraded from version {version} to {SCHEMA_VERSION}.")
+    return True
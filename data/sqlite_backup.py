@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import time
+from typing import Optional
+
+
+class BackupError(RuntimeError):
+    """A copy that failed verification or could not be made safely; the target is left as it was."""
+
+
+def _fsync(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_dir(path: str):
+    # Makes the rename durable; directories cannot be opened for this on Windows.
+    if os.name == "posix":
+        _fsync(os.path.dirname(os.path.abspath(path)))
+
+
+def copy_database(source_path: str, target_path: str, pages_per_step: int = 1024,
+                  step_pause_seconds: float = 0.005, busy_timeout_seconds: float = 5.0) -> float:
+    """
+    Copies a live SQLite database to `target_path` with the online backup
+    API, `pages_per_step` pages at a time with a pause between steps so the
+    source's writer is never held up for long. Returns the seconds taken.
+
+    The copy is made from one read snapshot of the source; without it, any
+    write landing between steps would restart the backup, and a steady
+    stream of writes would keep it from ever finishing. It is written next
+    to the target, checked with quick_check and against the snapshot's page
+    count and schema version, synced to disk and then renamed over the
+    target, so the target is always either the old copy or a complete new
+    one. The copy uses a rollback journal so it is a single file.
+
+    Raises BackupError, leaving the target untouched, when the check fails
+    or the target has a -wal file (something has it open in WAL mode).
+    """
+    if os.path.exists(f"{target_path}-wal"):
+        raise BackupError(f"{target_path} has a -wal file; close whatever has it open first.")
+    temp_path = f"{target_path}.tmp"
+    for leftover in (temp_path, f"{temp_path}-journal"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+
+    started = time.perf_counter()
+    source = sqlite3.connect(source_path, isolation_level=None, timeout=busy_timeout_seconds)
+    target: Optional[sqlite3.Connection] = None
+    try:
+        source.execute("BEGIN")
+        expected_pages = source.execute("PRAGMA page_count").fetchone()[0]
+        expected_version = source.execute("PRAGMA user_version").fetchone()[0]
+        target = sqlite3.connect(temp_path, isolation_level=None)
+        source.backup(target, pages=pages_per_step, sleep=step_pause_seconds)
+        source.execute("ROLLBACK")
+
+        target.execute("PRAGMA journal_mode=DELETE")
+        check = target.execute("PRAGMA quick_check").fetchone()[0]
+        pages = target.execute("PRAGMA page_count").fetchone()[0]
+        version = target.execute("PRAGMA user_version").fetchone()[0]
+        if check != "ok" or pages != expected_pages or version != expected_version:
+            raise BackupError(
+                f"Copy of {source_path} failed verification: quick_check {check!r}, "
+                f"{pages}/{expected_pages} pages, schema {version}/{expected_version}."
+            )
+        target.close()
+        target = None
+        _fsync(temp_path)
+        os.replace(temp_path, target_path)
+        _fsync_dir(target_path)
+    finally:
+        source.close()
+        if target is not None:
+            target.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return time.perf_counter() - started
@@ -1,12 +1,43 @@
-from fastapi import FastAPI
-from data.db_session import engine
-from data.models.alchemy_base import Base
-from routes import task_routes
+from contextlib import asynccontextmanager
 
-app = FastAPI()
-app.include_router(task_routes.router)
+from fastapi import Depends, FastAPI
+from data.db_session import default_database
+from routes import (analytics_routes, archive_routes, artifact_routes,
+                    bulk_routes, debug_routes, dependency_routes,
+                    event_routes, history_routes, integrity_routes,
+                    note_routes, project_routes, task_routes)
+from routes.dependencies import request_session_scope
+from utils.profiling import ProfilingMiddleware
+from utils.responses import ContentNegotiationMiddleware, NegotiatedResponse
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    default_database.ensure_schema()
+    yield
+    # Drains the writer, then takes the final checkpoint of a local-first database.
+    default_database.dispose()
 
-Base.metadata.create_all(bind=engine)
+
+app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=NegotiatedResponse,
+    dependencies=[Depends(request_session_scope)],
+)
+app.add_middleware(ContentNegotiationMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.include_router(task_routes.router)
+app.include_router(event_routes.router)
+app.include_router(archive_routes.router)
+app.include_router(history_routes.router)
+app.include_router(bulk_routes.router)
+app.include_router(dependency_routes.router)
+app.include_router(artifact_routes.router)
+app.include_router(note_routes.router)
+app.include_router(project_routes.router)
+app.include_router(integrity_routes.router)
+app.include_router(analytics_routes.router)
+app.include_router(debug_routes.router)
 
 
 @app.get("/")
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, HTTPException, Query
+from schemas.analytics_schema import AnalyticsReport
+from services.analytics import analytics_available, get_analytics_service
+from utils.profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.get("/analytics", response_model=AnalyticsReport)
+def get_analytics(weeks: int = Query(12, ge=1, le=520, description="Weeks of throughput, ending this week.")):
+    if not analytics_available():
+        raise HTTPException(status_code=501, detail="Analytics need the numpy package installed.")
+    return get_analytics_service(weeks)
@@ -0,0 +1,12 @@
+from typing import Optional
+
+from fastapi import APIRouter, Query
+from services.archive import archive_old_tasks_service
+from utils.profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.post("/tasks/archive")
+def archive(days: Optional[int] = Query(None, ge=0)):
+    return {"message": archive_old_tasks_service(days)}
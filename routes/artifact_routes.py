@@ -0,0 +1,13 @@
+from typing import List
+
+from fastapi import APIRouter
+from schemas.artifact_schema import ArtifactOut
+from services.task_artifacts import list_task_artifacts_service
+from utils.profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.get("/tasks/{task_id:int}/artifacts", response_model=List[ArtifactOut])
+def list_task_artifacts(task_id: int):
+    return list_task_artifacts_service(task_id)
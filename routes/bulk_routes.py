@@ -0,0 +1,52 @@
+from fastapi import APIRouter, HTTPException
+from schemas.task_schema import (BulkTaskReparent, BulkTasks, BulkTaskTag,
+                                 BulkTaskUpdate)
+from services.task_bulk import (bulk_add_tag_service, bulk_complete_service,
+                                bulk_delete_service, bulk_remove_tag_service,
+                                bulk_reparent_service, bulk_undelete_service,
+                                bulk_update_service)
+from utils.profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+def _run(service, *args):
+    try:
+        return service(*args)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/tasks/bulk/complete")
+def bulk_complete(request: BulkTasks):
+    return _run(bulk_complete_service, request.task_ids)
+
+
+@router.post("/tasks/bulk/delete")
+def bulk_delete(request: BulkTasks):
+    return _run(bulk_delete_service, request.task_ids)
+
+
+@router.post("/tasks/bulk/undelete")
+def bulk_undelete(request: BulkTasks):
+    return _run(bulk_undelete_service, request.task_ids)
+
+
+@router.post("/tasks/bulk/update")
+def bulk_update(request: BulkTaskUpdate):
+    return _run(bulk_update_service, request.task_ids, request.changes())
+
+
+@router.post("/tasks/bulk/tags/add")
+def bulk_add_tag(request: BulkTaskTag):
+    return _run(bulk_add_tag_service, request.task_ids, request.tag)
+
+
+@router.post("/tasks/bulk/tags/remove")
+def bulk_remove_tag(request: BulkTaskTag):
+    return _run(bulk_remove_tag_service, request.task_ids, request.tag)
+
+
+@router.post("/tasks/bulk/reparent")
+def bulk_reparent(request: BulkTaskReparent):
+    return _run(bulk_reparent_service, request.task_ids, request.parenttaskid)
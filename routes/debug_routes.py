@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from services.profiles import (get_profile_service, list_profiles_service,
+                               profiling_allowed_service)
+from utils.profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+def _check_allowed(request: Request):
+    # Same allow-list as capturing; anyone else sees no debug endpoints at all.
+    if not profiling_allowed_service(request.client.host if request.client else None):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@router.get("/debug/profiles")
+def list_profiles(request: Request, limit: int = Query(50, ge=1, le=500)):
+    _check_allowed(request)
+    return {"profiles": list_profiles_service(limit)}
+
+
+@router.get("/debug/profiles/{profile_id}")
+def get_profile(request: Request, profile_id: int):
+    _check_allowed(request)
+    profile = get_profile_service(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found.")
+    return profile
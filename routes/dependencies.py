@@ -0,0 +1,25 @@
+"""
+App-wide FastAPI dependencies, registered in main.py. Not a router.
+"""
+from data.db_session import (TENANT_DATABASE_DIR, TENANT_HEADER, database_for,
+                             request_scope)
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+
+async def request_session_scope(request: Request):
+    """
+    Picks the request's database from the tenant header, makes sure its
+    schema exists and holds it until the request ends; see request_scope.
+    """
+    try:
+        database = database_for(request.headers.get(TENANT_HEADER) if TENANT_DATABASE_DIR else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        if not database.schema_ready:
+            await run_in_threadpool(database.ensure_schema)
+        with request_scope(database):
+            yield
+    finally:
+        database.release()
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException
+from services.task_dependencies import (add_dependency_service,
+                                        get_dependencies_service,
+                                        remove_dependency_service)
+from utils.profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.get("/tasks/{task_id:int}/dependencies")
+def list_dependencies(task_id: int):
+    return get_dependencies_service(task_id)
+
+
+@router.post("/tasks/{task_id:int}/dependencies/{blocking_id:int}")
+def add_dependency(task_id: int, blocking_id: int):
+    try:
+        return {"message": add_dependency_service(task_id, blocking_id)}
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=f"Task {e.args[0]} not found.")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.delete("/tasks/{task_id:int}/dependencies/{blocking_id:int}")
+def remove_dependency(task_id: int, blocking_id: int):
+    return {"message": remove_dependency_service(task_id, blocking_id)}
@@ -0,0 +1,43 @@
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from services.events import close_event_stream, iter_events, open_event_stream
+from utils.profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+async def _event_stream(request: Request, subscriber):
+    try:
+        yield "retry: 5000\n\n"
+        async for change in iter_events(subscriber):
+            if await request.is_disconnected():
+                break
+            if change is None:
+                yield ": keepalive\n\n"
+                continue
+            data = json.dumps(jsonable_encoder(change), separators=(",", ":"))
+            yield f"id: {change['id']}\nevent: {change['type']}\ndata: {data}\n\n"
+    finally:
+        close_event_stream(subscriber)
+
+
+@router.get("/events")
+async def events(request: Request, last_event_id: Optional[str] = Header(None)):
+    try:
+        last_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_id = None
+
+    subscriber = open_event_stream(last_id)
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many event subscribers.")
+
+    return StreamingResponse(
+        _event_stream(request, subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,26 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from services.task_history import (get_completion_history_service,
+                                   get_completion_summary_service)
+from utils.profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.get("/tasks/history")
+def history(
+    tag: Optional[str] = Query(None),
+    root: Optional[int] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+):
+    try:
+        return get_completion_history_service(tag, root, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+@router.get("/tasks/history/summary")
+def history_summary(days: int = Query(7, ge=1, le=366)):
+    return get_completion_summary_service(days)
@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from schemas.integrity_schema import IntegrityReport
+from services.integrity import check_integrity_service, repair_integrity_service
+from utils.profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.get("/integrity", response_model=IntegrityReport)
+def check_integrity():
+    return check_integrity_service()
+
+
+@router.post("/integrity/repair", response_model=IntegrityReport)
+def repair_integrity():
+    return repair_integrity_service()
@@ -0,0 +1,20 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from schemas.note_schema import MAX_NOTES_PAGE, NotePage
+from services.task_notes import list_task_notes_service
+from utils.profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.get("/tasks/{task_id:int}/notes", response_model=NotePage)
+def list_task_notes(
+    task_id: int,
+    limit: int = Query(50, ge=1, le=MAX_NOTES_PAGE),
+    before: Optional[int] = Query(None, description="`next_before` from the previous page."),
+):
+    try:
+        return list_task_notes_service(task_id, limit, before)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
@@ -0,0 +1,16 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Query
+from schemas.project_schema import ProjectOut
+from services.projects import list_projects_service
+from utils.profiling import ProfiledRoute
+
+router = APIRouter(route_class=ProfiledRoute)
+
+
+@router.get("/projects", response_model=List[ProjectOut])
+def list_projects(
+    tag: Optional[str] = Query(None, description="Only top-level tasks with this tag, e.g. `project`."),
+    include_completed: bool = Query(False),
+):
+    return list_projects_service(tag, include_completed)
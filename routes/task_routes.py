@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
+from schemas.task_schema import TaskDetail, TaskPatch, TaskTreeNode
 from services.task_services import (
+    TaskEditConflict,
     create_new_task,
+    get_task_detail_service,
     get_task_roots_list,
-    get_task_roots_list_all
+    get_task_roots_list_all,
+    get_task_tree_service,
+    patch_task_service
 )
-from typing import Optional
+from typing import List, Optional
+from utils.profiling import ProfiledRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.post("/tasks/create")
 def create_task(task_name: str = Query(..., min_length=1)):
@@ -25,4 +31,43 @@ def tl(message: Optional[str] = Query(None)):
 
 @router.get("/tasks/tla")
 def tla(message: Optional[str] = Query(None)):
-    return {"tasks": get_task_roots_list_all(message)}
\ No newline at end of file
+    return {"tasks": get_task_roots_list_all(message)}
+
+
+# ":int" keeps these from shadowing fixed paths such as /tasks/history.
+@router.get("/tasks/{task_id:int}", response_model=TaskDetail)
+def get_task(task_id: int):
+    task = get_task_detail_service(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found.")
+    return task
+
+
+@router.get("/tasks/{task_id:int}/tree", response_model=TaskTreeNode)
+def get_task_tree(
+    task_id: int,
+    depth: Optional[int] = Query(None, ge=0, description="Levels of subtasks to include; all when omitted."),
+    expand: List[int] = Query([], description="Shown tasks whose subtasks are included beyond `depth`."),
+):
+    tree = get_task_tree_service(task_id, depth, expand)
+    if tree is None:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found.")
+    return tree
+
+
+@router.patch("/tasks/{task_id:int}")
+def patch_task(task_id: int, patch: TaskPatch):
+    changes = patch.changes()
+    if not changes:
+        raise HTTPException(status_code=400, detail="No fields to update.")
+    try:
+        return patch_task_service(task_id, changes, patch.lastedittime)
+    except LookupError:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found.")
+    except TaskEditConflict as e:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Task was edited since lastedittime.", "lastedittime": e.lastedittime.isoformat()},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,61 @@
+from datetime import date
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class Distribution(BaseModel):
+    """Days; all None when there is nothing to measure."""
+    count: int
+    mean: Optional[float] = None
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    max: Optional[float] = None
+
+
+class WeekThroughput(BaseModel):
+    week_start: date
+    completed: int
+
+
+class DeferralStats(BaseModel):
+    # Times a start time was pushed further into the future, over all tasks.
+    total: int
+    tasks_deferred: int
+    # Open tasks whose start time is still ahead.
+    currently_deferred: int
+    tasks_by_count: Dict[str, int]
+
+
+class AgingStats(BaseModel):
+    open: int
+    age_days: Distribution
+    buckets: Dict[str, int]
+
+
+class BreakdownRow(BaseModel):
+    """Totals for one tag or project (top-level task, not counted itself)."""
+    key: int
+    name: Optional[str] = None
+    total: int
+    open: int
+    completed: int
+    deferrals: int
+    mean_lead_time_days: Optional[float] = None
+    mean_open_age_days: Optional[float] = None
+
+
+class AnalyticsReport(BaseModel):
+    """
+    Statistics over every live and archived task that is not deleted.
+    Lead time runs from creation to completion. `data_version` is the id
+    of the last change feed event for this database when it was computed.
+    """
+    data_version: int
+    tasks: int
+    lead_time_days: Distribution
+    throughput: List[WeekThroughput]
+    deferrals: DeferralStats
+    aging: AgingStats
+    by_tag: List[BreakdownRow]
+    by_project: List[BreakdownRow]
@@ -0,0 +1,22 @@
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class IntegrityIssue(BaseModel):
+    count: int
+    # The first few offending task ids, cycles (as task id lists) or link keys.
+    sample: List[Any]
+
+
+class IntegrityReport(BaseModel):
+    """
+    Result of an integrity check. `issues` is keyed by cycles,
+    dangling_parents, orphaned_tag_links, orphaned_notes,
+    orphaned_artifact_links, orphaned_dependencies, duplicate_tag_links and
+    note_count_mismatches. A repair also reports the rows it changed.
+    """
+    checked_tasks: int
+    seconds: float
+    issues: Dict[str, IntegrityIssue]
+    repaired: Optional[Dict[str, int]] = None
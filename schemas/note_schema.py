@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+MAX_NOTES_PAGE = 200
+
+
+class NoteOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    noteid: int
+    taskid: int
+    note: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class NotePage(BaseModel):
+    """One page of a task's notes, newest first. Pass `next_before` as `before` for the next page."""
+    notes: List[NoteOut]
+    next_before: Optional[int] = None
@@ -0,0 +1,14 @@
+from datetime import datetime
+from typing import Optional
+
+from schemas.task_schema import TaskOut
+
+
+class ProjectOut(TaskOut):
+    """A top-level task with the progress of everything under it."""
+    duedate: Optional[datetime] = None
+    total: int = 0
+    open: int = 0
+    completed: int = 0
+    # Earliest due date among the open tasks of the project, the root included.
+    next_due: Optional[datetime] = None
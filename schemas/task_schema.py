@@ -0,0 +1,137 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+
+def local_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Start times are stored as naive local time; an aware value is converted to it."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Edit times are stored as naive UTC; an aware value is converted to it."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class TaskOut(BaseModel):
+    """A task as it appears in lists."""
+    model_config = ConfigDict(from_attributes=True)
+
+    taskid: int
+    taskname: str
+    status: str
+    parenttaskid: Optional[int] = None
+    urgent: bool = False
+    important: bool = False
+    sort_order: Optional[int] = None
+    earlieststarttime: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+
+class TaskDetail(TaskOut):
+    description: Optional[str] = None
+    target: Optional[str] = None
+    milestone: Optional[str] = None
+    duedate: Optional[datetime] = None
+    repeatinterval: Optional[int] = None
+    repeattimeofday: Optional[int] = None
+    repeatskipweekend: Optional[bool] = None
+    createdat: Optional[datetime] = None
+    lastedittime: Optional[datetime] = None
+    deleted: bool = False
+    deleted_date: Optional[datetime] = None
+    note_count: int = 0
+
+
+class TaskTreeNode(TaskOut):
+    """
+    A node of GET /tasks/{id}/tree. `children` holds only the subtasks that
+    were expanded; `child_count` and `open_descendant_count` cover them all.
+    """
+    child_count: int = 0
+    open_descendant_count: int = 0
+    children: List["TaskTreeNode"] = []
+
+
+class TaskPatch(BaseModel):
+    """
+    Partial update for a task. Only the fields present in the request are
+    changed; `parenttaskid: null` makes the task top level. When
+    `lastedittime` is given, the update is refused if the task was edited
+    after that time.
+    """
+    model_config = ConfigDict(extra="forbid")
+
+    taskname: Optional[str] = Field(None, min_length=1)
+    description: Optional[str] = None
+    target: Optional[str] = None
+    milestone: Optional[str] = None
+    urgent: Optional[bool] = None
+    important: Optional[bool] = None
+    duedate: Optional[datetime] = None
+    earlieststarttime: Optional[datetime] = None
+    repeatinterval: Optional[int] = Field(None, ge=1)
+    repeattimeofday: Optional[int] = Field(None, ge=0, le=2359)
+    repeatskipweekend: Optional[bool] = None
+    parenttaskid: Optional[int] = None
+    sort_order: Optional[int] = None
+
+    lastedittime: Optional[datetime] = None
+
+    @field_validator("taskname", "urgent", "important")
+    @classmethod
+    def _not_null(cls, value):
+        if value is None:
+            raise ValueError("may not be null")
+        return value
+
+    _local_start = field_validator("earlieststarttime")(local_naive)
+    # Compared for equality with the stored value, so "...Z" and "+00:00" must match it too.
+    _utc_edit_time = field_validator("lastedittime")(utc_naive)
+
+    def changes(self) -> dict:
+        """The fields the client actually sent, minus the precondition."""
+        return self.model_dump(exclude_unset=True, exclude={"lastedittime"})
+
+
+# Keeps a bulk request's IN lists well below SQLite's bound-parameter limit.
+MAX_BULK_TASKS = 500
+
+
+class BulkTasks(BaseModel):
+    """Target of a bulk operation; without `task_ids` the current multi-selection is used."""
+    model_config = ConfigDict(extra="forbid")
+
+    task_ids: Optional[List[int]] = Field(None, min_length=1, max_length=MAX_BULK_TASKS)
+
+
+class BulkTaskUpdate(BulkTasks):
+    urgent: Optional[bool] = None
+    important: Optional[bool] = None
+    earlieststarttime: Optional[datetime] = None
+
+    @field_validator("urgent", "important")
+    @classmethod
+    def _not_null(cls, value):
+        if value is None:
+            raise ValueError("may not be null")
+        return value
+
+    _local_start = field_validator("earlieststarttime")(local_naive)
+
+    def changes(self) -> dict:
+        return self.model_dump(exclude_unset=True, exclude={"task_ids"})
+
+
+class BulkTaskTag(BulkTasks):
+    tag: str = Field(..., min_length=1)
+
+
+class BulkTaskReparent(BulkTasks):
+    """`parenttaskid: null` moves the tasks to the top level."""
+    parenttaskid: Optional[int]
@@ -0,0 +1,33 @@
+from data import analytics
+from data.analytics import compute_analytics, get_analytics_cache
+from data.crud.analytics_crud import get_tag_link_pairs, get_task_facts
+from data.crud.completion_crud import get_rollup_key_names
+from data.db_session import read_session
+
+# Tags and projects listed in a report, those with the most tasks first.
+BREAKDOWN_SIZE = 50
+
+
+def analytics_available() -> bool:
+    """The analytics need numpy, which is optional."""
+    return analytics.np is not None
+
+
+def _compute() -> dict:
+    with read_session() as session:
+        report = compute_analytics(get_task_facts(session), get_tag_link_pairs(session), BREAKDOWN_SIZE)
+        for scope, breakdown in (("tag", report["by_tag"]), ("root", report["by_project"])):
+            names = get_rollup_key_names(session, scope, [row["key"] for row in breakdown])
+            for row in breakdown:
+                row["name"] = names.get(row["key"])
+    return report
+
+
+def get_analytics_service(weeks: int = 12) -> dict:
+    """
+    Lead time, throughput for the last `weeks` weeks, deferrals, aging of
+    open tasks and per-tag and per-project breakdowns over all live and
+    archived tasks. Computed once per data version; see AnalyticsCache.
+    """
+    report = get_analytics_cache().get(_compute)
+    return {**report, "throughput": report["throughput"][-weeks:]}
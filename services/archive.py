@@ -0,0 +1,17 @@
+import config
+from data.crud.archive_crud import archive_finished_subtrees
+from data.db_session import run_db
+
+ARCHIVE_AFTER_DAYS = getattr(config, "ARCHIVE_AFTER_DAYS", 30)
+
+
+def archive_old_tasks_service(older_than_days: int | None = None) -> str:
+    """
+    Moves completed and deleted subtrees older than `older_than_days`
+    (ARCHIVE_AFTER_DAYS by default) into the archive tables.
+    """
+    days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    count = run_db(archive_finished_subtrees, days)
+    if count == 0:
+        return f"No tasks finished more than {days} days ago to archive."
+    return f"Archived {count} tasks finished more than {days} days ago."
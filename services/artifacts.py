@@ -2,41 +2,31 @@ from data.crud.artifact_crud import (create_artifact, delete_artifact,
                                      get_artifact_by_id, get_artifact_types,
                                      get_artifacts, get_artifacts_by_wildcard,
                                      update_artifact)
-from data.db_session import SessionLocal
+from data.db_session import run_db
 from state.artifact_state import get_artifact_list, set_artifact_list
 
 
 def create_artifact_service(url: str):
-    with SessionLocal() as db:
-        artifact = create_artifact(db, url)
-        db.commit()
-        return {"id": artifact.id, "url": artifact.url}
+    artifact = run_db(create_artifact, url)
+    return {"id": artifact.id, "url": artifact.url}
 
 
 def get_artifact_service(artifact_id):
-    with SessionLocal() as db:
-        artifact = get_artifact_by_id(db, artifact_id)
+    artifact = run_db(get_artifact_by_id, artifact_id)
     return artifact
 
 def list_artifacts_service(skip=0, limit=100):
-    with SessionLocal() as db:
-        artifacts = get_artifacts(db, skip, limit)
+    artifacts = run_db(get_artifacts, skip, limit)
     set_artifact_list(artifacts)
     return artifacts
 
 
 def update_artifact_service(artifact_id, update_data):
-    with SessionLocal() as db:
-        artifact = update_artifact(db, artifact_id, update_data)
-        if artifact is not None:
-            db.commit()
+    artifact = run_db(update_artifact, artifact_id, update_data)
     return artifact
 
 def delete_artifact_service(artifact_id):
-    with SessionLocal() as db:
-        result = delete_artifact(db, artifact_id)
-        if result:
-            db.commit()
+    result = run_db(delete_artifact, artifact_id)
     return result
 
 def delete_artifact_by_index_service(index):
@@ -50,15 +40,13 @@ def delete_artifact_by_index_service(index):
 
 # /Users/behroozkarjoo/dev/ai/services/artifacts.py
 def get_artifact_types_service():
-    with SessionLocal() as db:
-        types = get_artifact_types(db)
+    types = run_db(get_artifact_types)
     return [t[0] for t in types if t[0] is not None]
 
 
 def list_artifacts_by_wildcard_service(wildcard=None):
     print(wildcard)
-    with SessionLocal() as db:
-        artifacts = get_artifacts_by_wildcard(db, wildcard)
+    artifacts = run_db(get_artifacts_by_wildcard, wildcard)
     set_artifact_list(artifacts)
     return artifacts
 
@@ -0,0 +1,29 @@
+from typing import Any, AsyncIterator, Dict, Optional
+
+import config
+from data.change_feed import Subscriber, subscribe, unsubscribe
+from data.db_session import current_database
+
+HEARTBEAT_SECONDS = getattr(config, "EVENTS_HEARTBEAT_SECONDS", 15)
+
+
+def open_event_stream(last_event_id: Optional[int] = None) -> Optional[Subscriber]:
+    """
+    Registers a change-feed subscriber to the current database's events
+    for the calling event loop. Returns None when the subscriber limit has
+    been reached.
+    """
+    return subscribe(last_event_id, current_database().tenant)
+
+
+def close_event_stream(subscriber: Subscriber):
+    unsubscribe(subscriber)
+
+
+async def iter_events(subscriber: Subscriber) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Yields change events as they arrive, and None after every idle
+    heartbeat interval so the caller can keep the connection alive.
+    """
+    while True:
+        yield await subscriber.get(HEARTBEAT_SECONDS)
@@ -0,0 +1,74 @@
+import time
+from typing import Callable, Dict
+
+from data.crud.archive_crud import ID_CHUNK_SIZE
+from data.crud.integrity_crud import (LINK_KEYS, delete_links,
+                                      detach_from_missing_parents,
+                                      detach_from_parents,
+                                      rebuild_project_rollups, recount_notes)
+from data.db_session import read_session, run_db
+from data.integrity import find_integrity_issues
+
+# Offending ids (or keys, or cycles) listed per issue in a report.
+SAMPLE_SIZE = 20
+
+
+def _report(issues: Dict[str, list], started: float) -> dict:
+    return {
+        "checked_tasks": issues["task_count"],
+        "seconds": round(time.perf_counter() - started, 3),
+        "issues": {
+            name: {"count": len(found), "sample": found[:SAMPLE_SIZE]}
+            for name, found in issues.items() if name != "task_count"
+        },
+    }
+
+
+def _in_batches(items: list, job: Callable[[list], int]) -> int:
+    # Each batch is its own write, so other requests get the writer in between.
+    return sum(job(items[start:start + ID_CHUNK_SIZE]) for start in range(0, len(items), ID_CHUNK_SIZE))
+
+
+def check_integrity_service() -> dict:
+    """Looks for cycles, missing parents, orphaned and duplicate links and wrong note counts, without changing anything."""
+    started = time.perf_counter()
+    with read_session() as session:
+        issues = find_integrity_issues(session)
+    return _report(issues, started)
+
+
+def repair_integrity_service() -> dict:
+    """
+    Checks, then fixes what was found in batches of ID_CHUNK_SIZE rows:
+    each cycle is broken by making its smallest task top level, tasks with a
+    missing parent become top level, orphaned and duplicate links are
+    deleted and note counts are corrected. A task is only moved while it
+    still has the parent the check saw, and notes are recounted as they are
+    at repair time, so edits made in between are kept. Project rollups are
+    rebuilt when the hierarchy changed. The report's `repaired` counts the
+    rows changed.
+    """
+    started = time.perf_counter()
+    with read_session() as session:
+        issues = find_integrity_issues(session)
+
+    repaired: Dict[str, int] = {
+        # A cycle lists its smallest task first, then that task's parent.
+        "cycles": _in_batches([(cycle[0], cycle[1 % len(cycle)]) for cycle in issues["cycles"]],
+                              lambda batch: run_db(detach_from_parents, batch)),
+        "dangling_parents": _in_batches(issues["dangling_parents"],
+                                        lambda batch: run_db(detach_from_missing_parents, batch)),
+    }
+    for kind in LINK_KEYS:
+        repaired[f"orphaned_{kind}"] = _in_batches(issues[f"orphaned_{kind}"],
+                                                   lambda batch, kind=kind: run_db(delete_links, kind, batch))
+    repaired["duplicate_tag_links"] = _in_batches(issues["duplicate_tag_links"],
+                                                  lambda batch: run_db(delete_links, "tag_links", batch))
+    repaired["note_count_mismatches"] = _in_batches([task_id for task_id, _ in issues["note_count_mismatches"]],
+                                                    lambda batch: run_db(recount_notes, batch))
+    if repaired["cycles"] or repaired["dangling_parents"]:
+        run_db(rebuild_project_rollups)
+
+    report = _report(issues, started)
+    report["repaired"] = repaired
+    return report
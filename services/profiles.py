@@ -0,0 +1,18 @@
+from typing import List, Optional
+
+from utils.profiling import get_profile, is_profiling_allowed, recent_profiles
+
+
+def profiling_allowed_service(host: Optional[str]) -> bool:
+    return is_profiling_allowed(host)
+
+
+def list_profiles_service(limit: int = 50) -> List[dict]:
+    """Summaries of the most recent request captures, newest first."""
+    return [capture.summary() for capture in recent_profiles()[:limit]]
+
+
+def get_profile_service(profile_id: int) -> Optional[dict]:
+    """A capture's SQL statements and profiler report, or None if it has been dropped."""
+    capture = get_profile(profile_id)
+    return capture.details() if capture else None
@@ -0,0 +1,9 @@
+from typing import List, Optional
+
+from data.crud.project_crud import get_projects
+from data.db_session import run_db
+
+
+def list_projects_service(tag: Optional[str] = None, include_completed: bool = False) -> List[dict]:
+    """Top-level tasks, optionally only those tagged `tag`, with their project rollups."""
+    return [row._asdict() for row in run_db(get_projects, tag, include_completed)]
@@ -0,0 +1,59 @@
+from typing import Callable, Dict, List, Optional
+
+from data.crud.bulk_crud import (UPDATED, bulk_add_tag, bulk_complete,
+                                 bulk_remove_tag, bulk_reparent,
+                                 bulk_set_fields, bulk_soft_delete,
+                                 bulk_undelete)
+from data.db_session import run_db
+from state.task_state import get_multi_select
+
+
+def _run_bulk(crud_fn: Callable, task_ids: Optional[List[int]], *args) -> dict:
+    """
+    Runs a bulk CRUD function over `task_ids`, or over the current
+    multi-selection when none are given. Raises ValueError when there is
+    nothing to act on.
+    """
+    if task_ids is None:
+        task_ids = get_multi_select()
+    if not task_ids:
+        raise ValueError("No tasks selected.")
+    task_ids = list(dict.fromkeys(task_ids))
+
+    results: Dict[int, str] = run_db(crud_fn, task_ids, *args)
+    return {
+        "updated": sum(1 for result in results.values() if result == UPDATED),
+        "results": [{"taskid": task_id, "result": result} for task_id, result in results.items()],
+    }
+
+
+def bulk_complete_service(task_ids: Optional[List[int]] = None) -> dict:
+    return _run_bulk(bulk_complete, task_ids)
+
+
+def bulk_delete_service(task_ids: Optional[List[int]] = None) -> dict:
+    return _run_bulk(bulk_soft_delete, task_ids)
+
+
+def bulk_undelete_service(task_ids: Optional[List[int]] = None) -> dict:
+    return _run_bulk(bulk_undelete, task_ids)
+
+
+def bulk_update_service(task_ids: Optional[List[int]], changes: dict) -> dict:
+    """Sets urgent, important and/or earlieststarttime on every task."""
+    if not changes:
+        raise ValueError("No fields to update.")
+    return _run_bulk(bulk_set_fields, task_ids, changes)
+
+
+def bulk_add_tag_service(task_ids: Optional[List[int]], tag_name: str) -> dict:
+    return _run_bulk(bulk_add_tag, task_ids, tag_name)
+
+
+def bulk_remove_tag_service(task_ids: Optional[List[int]], tag_name: str) -> dict:
+    return _run_bulk(bulk_remove_tag, task_ids, tag_name)
+
+
+def bulk_reparent_service(task_ids: Optional[List[int]], parent_id: Optional[int]) -> dict:
+    """Raises ValueError if the new parent does not exist."""
+    return _run_bulk(bulk_reparent, task_ids, parent_id)
@@ -0,0 +1,35 @@
+from data.crud.dependency_crud import (add_dependency, get_dependencies,
+                                       remove_dependency)
+from data.db_session import read_session, run_db
+from data.dependency_index import get_dependency_index
+
+
+def _stub(task) -> dict:
+    return {"taskid": task.taskid, "taskname": task.taskname, "status": task.status}
+
+
+def add_dependency_service(task_id: int, blocking_id: int) -> str:
+    """
+    Makes `task_id` wait until `blocking_id` is finished. Raises LookupError
+    for an unknown task and ValueError if the dependency would form a cycle.
+    """
+    if run_db(add_dependency, task_id, blocking_id):
+        return f"Task {task_id} now waits on task {blocking_id}."
+    return f"Task {task_id} already waits on task {blocking_id}."
+
+
+def remove_dependency_service(task_id: int, blocking_id: int) -> str:
+    if run_db(remove_dependency, task_id, blocking_id):
+        return f"Task {task_id} no longer waits on task {blocking_id}."
+    return f"Task {task_id} does not wait on task {blocking_id}."
+
+
+def get_dependencies_service(task_id: int) -> dict:
+    with read_session() as session:
+        blocking, dependents = get_dependencies(session, task_id)
+    return {
+        "taskid": task_id,
+        "blocked": get_dependency_index().is_blocked(task_id),
+        "blocking": [_stub(task) for task in blocking],
+        "dependents": [_stub(task) for task in dependents],
+    }
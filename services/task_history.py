@@ -0,0 +1,62 @@
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+
+from data.crud.completion_crud import (get_completion_history,
+                                       get_completion_rollups,
+                                       get_daily_completion_counts,
+                                       get_rollup_key_names)
+from data.db_session import read_session
+
+
+def _encode_cursor(completed_at: datetime, task_id: int) -> str:
+    return f"{completed_at.isoformat()}~{task_id}"
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Raises ValueError for a malformed cursor."""
+    completed_at, _, task_id = cursor.rpartition("~")
+    return datetime.fromisoformat(completed_at), int(task_id)
+
+
+def get_completion_history_service(
+    tag_name: Optional[str] = None,
+    root_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+) -> dict:
+    """
+    One page of completed tasks, newest first. Pass the returned
+    `next_cursor` back to get the following page.
+    """
+    before = _decode_cursor(cursor) if cursor else None
+    with read_session() as session:
+        rows = get_completion_history(session, tag_name, root_id, before, limit)
+
+    tasks = [
+        {"taskid": row.taskid, "taskname": row.taskname,
+         "completed_at": row.completed_at, "rootid": row.completed_rootid}
+        for row in rows
+    ]
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = _encode_cursor(rows[-1].completed_at, rows[-1].taskid)
+    return {"tasks": tasks, "next_cursor": next_cursor}
+
+
+def get_completion_summary_service(days: int = 7) -> dict:
+    """Completion counts for the last `days` days, read from the daily rollups only."""
+    since = date.today() - timedelta(days=days - 1)
+    with read_session() as session:
+        daily = get_daily_completion_counts(session, since)
+        by_tag = get_completion_rollups(session, since, "tag")
+        by_root = get_completion_rollups(session, since, "root")
+        tag_names = get_rollup_key_names(session, "tag", [row.key for row in by_tag])
+        root_names = get_rollup_key_names(session, "root", [row.key for row in by_root])
+
+    return {
+        "since": since,
+        "total": sum(row.count for row in daily),
+        "daily": [{"day": row.day, "count": row.count} for row in daily],
+        "by_tag": [{"tag": tag_names.get(row.key), "count": row.count} for row in by_tag],
+        "by_root": [{"taskid": row.key, "taskname": root_names.get(row.key), "count": row.count} for row in by_root],
+    }
@@ -0,0 +1,20 @@
+from typing import Optional
+
+from data.crud.task_crud import id_exists
+from data.crud.task_note_crud import get_notes_page
+from data.db_session import read_session
+
+
+def list_task_notes_service(task_id: int, limit: int, before: Optional[int] = None) -> dict:
+    """
+    A page of the task's notes, newest first, with the cursor for the next
+    page (None on the last one). Raises LookupError if the task does not exist.
+    """
+    with read_session() as session:
+        # One extra row tells whether another page follows without a COUNT.
+        notes = get_notes_page(session, task_id, limit + 1, before)
+        if not notes and not id_exists(session, task_id):
+            raise LookupError(f"Task {task_id} not found.")
+    has_more = len(notes) > limit
+    notes = notes[:limit]
+    return {"notes": notes, "next_before": notes[-1].noteid if has_more else None}
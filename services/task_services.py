@@ -1,28 +1,49 @@
 from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
 
 from data.crud.task_crud import (create_new_subtask, create_task,
-                                 crud_update_task_milestone, db_mark_task_done,
+                                 crud_update_task_description,
+                                 crud_update_task_milestone,
+                                 crud_update_task_name,
+                                 crud_update_task_target, db_mark_task_done,
                                  find_root_task_id,
                                  get_all_available_incomplete_tasks,
                                  get_all_available_incomplete_tasks_by_tag,
+                                 get_available_incomplete_important_tasks,
                                  get_available_incomplete_tasks,
+                                 get_available_incomplete_urgent_tasks,
+                                 get_done_tasks, get_future_tasks,
                                  get_incomplete_available_important_tasks_ids,
                                  get_incomplete_available_urgent_tasks_ids,
-                                 get_next_task_to_work_on, get_parent,
-                                 get_root_tasks, get_root_tasks_all,
-                                 get_task_by_id, get_task_milestone,
+                                 get_open_subtree_links, get_task_rows,
+                                 get_parent,
+                                 get_recently_deleted_tasks, get_root_tasks,
+                                 get_root_tasks_all, get_task_by_id,
+                                 get_task_milestone, get_task_target,
                                  get_tasks_by_ids, id_exists,
                                  is_task_important, is_task_urgent,
                                  make_task_top_level, mark_pending,
-                                 root_task_search, set_task_important,
+                                 patch_task, root_task_search, set_task_important,
                                  set_task_urgent, soft_delete_task,
-                                 task_read_subtasks,
-                                 update_earliest_start_time)
+                                 task_read_subtasks, undelete_task,
+                                 update_earliest_start_time,
+                                 update_task_parent,
+                                 update_task_repeat_interval,
+                                 update_task_repeatskipweekend,
+                                 update_task_repeattimeofday,
+                                 update_task_sort_order,
+                                 update_task_sort_orders)
+from data.crud.project_crud import get_project_rollups
 from data.crud.task_tags_crud import get_tasks_by_tag_name
-from data.models.tag_model import TaskTag
-from state.task_state import (get_new_task_id,  set_new_task_id,
-                              set_selected_task_id)
+from data.db_session import read_session, run_db
+from data.dependency_index import get_dependency_index
+from data.ready_queue import get_ready_queue
+from data.models.task_model import Task
+from state.task_state import (get_new_task_id, get_selected_task_id,
+                              get_task_ids, set_new_task_id,
+                              set_selected_task_id, set_task_ids)
 from utils.formatting import (format_future_tasks_as_list,
+                              format_tasks_as_list,
                               format_tasks_as_list_with_id)
 
 from services.task_artifacts import get_and_select_first_artifact_of_selected_task
@@ -30,11 +51,10 @@ from services.task_tags import count_tasks_by_tag_service
 
 
 def svc_get_task_by_id(task_id: int):
-    with SessionLocal() as db:
+    with read_session() as db:
         return get_task_by_id(db, task_id)
 
 
-
 def set_task_ids_from_tasks(tasks):
     task_ids = [task.taskid for task in tasks]
     set_task_ids(task_ids)
@@ -53,7 +73,7 @@ def set_selected_task_id_confirm(task_id):
     try:
         id = int(task_id)
 
-        with SessionLocal() as session:
+        with read_session() as session:
             exists = id_exists(session, id)
         if exists:
             set_selected_task_id(id)
@@ -87,8 +107,7 @@ def create_new_task(task_name: str) -> str:
     else:
         message = ''
 
-    with SessionLocal() as session:
-        task_id = create_task(session, task_name)
+    task_id = run_db(create_task, task_name)
 
     set_new_task_id(task_id)
 
@@ -100,9 +119,9 @@ def create_new_task(task_name: str) -> str:
 
 
 def create_subtask_for_selected_task(task_name: str) -> str:
-    with SessionLocal() as session:
-        selected_task_id = get_selected_task_id()
-        if selected_task_id:
+    selected_task_id = get_selected_task_id()
+    if selected_task_id:
+        with read_session() as session:
             task = get_task_by_id(session, selected_task_id)
             if task.status == 'Completed':
                 parent = get_parent(session, selected_task_id)
@@ -111,15 +130,13 @@ def create_subtask_for_selected_task(task_name: str) -> str:
                 else:
                     return "Cannot create subtask for completed task."
 
+        subtask_id = run_db(create_new_subtask, selected_task_id, task_name)
 
+        if subtask_id:
+            set_new_task_id(subtask_id) # remember task id if user wants to select it
 
-            subtask_id = create_new_subtask(session, selected_task_id, task_name)
-
-            if subtask_id:
-                set_new_task_id(subtask_id) # remember task id if user wants to select it
-
-                return f"Subtask created successfully with ID: {subtask_id}"
-        return "Failed to create subtask"
+            return f"Subtask created successfully with ID: {subtask_id}"
+    return "Failed to create subtask"
 
 
 def get_root_task(task_id: int):
@@ -127,7 +144,7 @@ def get_root_task(task_id: int):
     Retrieves the root task object for the given task_id by opening a new session,
     finding the root task's ID, and then fetching the full Task object.
     """
-    with SessionLocal() as session:
+    with read_session() as session:
         root_task_id = find_root_task_id(session, task_id)
 
         return session.get(Task, root_task_id)
@@ -154,7 +171,7 @@ def get_task_roots_list(message):
         else:
             tag = message
 
-    with SessionLocal() as session:
+    with read_session() as session:
         if tag:
             tasks = get_tasks_by_tag_name(session, tag)
         elif search_parameter:
@@ -170,9 +187,7 @@ def get_task_roots_list(message):
 
 
 def svc_get_future_tasks():
-    from data.crud.task_crud import get_future_tasks
-
-    with SessionLocal() as session:
+    with read_session() as session:
         tasks = get_future_tasks(session)
         formatted_list = format_future_tasks_as_list(tasks)
 
@@ -182,9 +197,7 @@ def svc_get_future_tasks():
 
 
 def svc_get_done_tasks():
-    from data.crud.task_crud import get_done_tasks
-
-    with SessionLocal() as session:
+    with read_session() as session:
         tasks = get_done_tasks(session)
         formatted_list = format_tasks_as_list(tasks)
 
@@ -193,11 +206,10 @@ def svc_get_done_tasks():
         return formatted_list
 
 
-
 def get_task_roots_list_all(message):
     tag = message
     # TODO tag filtering not implemented
-    with SessionLocal() as session:
+    with read_session() as session:
         tasks = get_root_tasks_all(session)
         formatted_list = format_future_tasks_as_list(tasks)
 
@@ -208,8 +220,10 @@ def get_task_roots_list_all(message):
 
 def fetch_available_tasks():
     """Fetches available incomplete tasks from the database."""
-    with SessionLocal() as session:
-        return get_available_incomplete_tasks(session)
+    with read_session() as session:
+        tasks = get_available_incomplete_tasks(session)
+    dependency_index = get_dependency_index()
+    return [task for task in tasks if not dependency_index.is_blocked(task.taskid)]
 
 
 def fetch_store_and_return_tasks():
@@ -235,7 +249,7 @@ def get_tree_view() -> str:
     if selected_task_id is None:
         return "No selected task to display tree view for."
 
-    with SessionLocal() as session:
+    with read_session() as session:
         root_id = find_root_task_id(session, selected_task_id)
         tree_view, _ = task_read_subtasks(session, selected_task_id, root_id)
     return tree_view
@@ -245,15 +259,15 @@ def mark_task_done():
     msg = ''
     task_id = get_selected_task_id()
     if task_id:
-        with SessionLocal() as session:
+        with read_session() as session:
             task = get_task_by_id(session, task_id)
-            if task.status == "Completed":
-                return "Task already marked complete."
-            rowcount = db_mark_task_done(session, task_id)
-            if rowcount == 0:
-                msg += "Task not found or already completed."
-            else:
-                msg += "Task marked complete."
+        if task.status == "Completed":
+            return "Task already marked complete."
+        rowcount = run_db(db_mark_task_done, task_id)
+        if rowcount == 0:
+            msg += "Task not found or already completed."
+        else:
+            msg += "Task marked complete."
     else:
         msg += "No task selected."
     return msg
@@ -263,27 +277,27 @@ def mark_task_done_yesterday():
     msg = ''
     task_id = get_selected_task_id()
     if task_id:
-        with SessionLocal() as session:
+        with read_session() as session:
             task = get_task_by_id(session, task_id)
-            if task.status == "Completed":
-                return "Task already marked complete."
-            rowcount = db_mark_task_done(session, task_id, yesterday=True)
-            if rowcount == 0:
-                msg += "Task not found or already completed."
-            else:
-                msg += "Task marked complete."
+        if task.status == "Completed":
+            return "Task already marked complete."
+        rowcount = run_db(db_mark_task_done, task_id, yesterday=True)
+        if rowcount == 0:
+            msg += "Task not found or already completed."
+        else:
+            msg += "Task marked complete."
     else:
         msg += "No task selected."
     return msg
 
 
-
 def what_to_do(tag=None):
     if tag == "":
         tag = None
 
-    with SessionLocal() as session:
-        task = get_next_task_to_work_on(session)
+    task_id = get_ready_queue().next()
+    with read_session() as session:
+        task = get_task_by_id(session, task_id) if task_id else None
         if task:
             task_id = task.taskid
             set_selected_task_id(task_id)
@@ -313,11 +327,12 @@ def optimal_task(message):
     msg = ''
     tag_name = message
 
-    with SessionLocal() as session:
+    with read_session() as session:
         if tag_name:
             task_ids = get_all_available_incomplete_tasks_by_tag(session, tag_name)
         else:
             task_ids = get_all_available_incomplete_tasks(session)
+        task_ids = get_dependency_index().unblocked(task_ids)
 
         urgent_ids = get_incomplete_available_urgent_tasks_ids(session, task_ids)
         important_ids = get_incomplete_available_important_tasks_ids(session, task_ids)
@@ -336,9 +351,9 @@ def optimal_task(message):
             return msg
 
         selected_task_id = min(working_list)
-        selected_task = next(task for task in tasks if task['taskid'] == selected_task_id)
-        set_selected_task_id(selected_task['taskid'])
-        task_id = selected_task['taskid']
+        selected_task = next(task for task in tasks if task.taskid == selected_task_id)
+        set_selected_task_id(selected_task.taskid)
+        task_id = selected_task.taskid
         root_id = find_root_task_id(session, task_id)
 
         tree_view, subtasks = task_read_subtasks(session, selected_task_id, root_id)
@@ -355,7 +370,7 @@ def optimal_task(message):
 
 
 def print_task_details():
-    with SessionLocal() as session:
+    with read_session() as session:
         task_id = get_selected_task_id()
         task = get_task_by_id(session, task_id)
 
@@ -365,35 +380,33 @@ def print_task_details():
             return "No task selected."
 
 
-
 def set_earliest_start_time(time_input: str):
     task_id = get_selected_task_id()
     if task_id is None:
         return "No task selected."
 
-    with SessionLocal() as session:
-        tokens = time_input.split()
-        date_offset = 0
-        time_of_day = datetime.min.time()
-
-        for token in tokens:
-            value = int(token)
-            if value < 100:
-                date_offset = value
-            else:
-                hours = value // 100
-                minutes = value % 100
-                time_of_day = datetime.min.replace(hour=hours, minute=minutes).time()
-
-        new_start_time = (datetime.now() + timedelta(days=date_offset)).replace(
-            hour=time_of_day.hour, minute=time_of_day.minute, second=0, microsecond=0
-        )
-
-        success = update_earliest_start_time(session, task_id, new_start_time)
-        if success:
-            return f"Earliest start time updated to {new_start_time}"
+    tokens = time_input.split()
+    date_offset = 0
+    time_of_day = datetime.min.time()
+
+    for token in tokens:
+        value = int(token)
+        if value < 100:
+            date_offset = value
         else:
-            return "Failed to update earliest start time."
+            hours = value // 100
+            minutes = value % 100
+            time_of_day = datetime.min.replace(hour=hours, minute=minutes).time()
+
+    new_start_time = (datetime.now() + timedelta(days=date_offset)).replace(
+        hour=time_of_day.hour, minute=time_of_day.minute, second=0, microsecond=0
+    )
+
+    success = run_db(update_earliest_start_time, task_id, new_start_time)
+    if success:
+        return f"Earliest start time updated to {new_start_time}"
+    else:
+        return "Failed to update earliest start time."
 
 
 def soft_delete(task_id):
@@ -401,12 +414,11 @@ def soft_delete(task_id):
         id = int(task_id)
     except:
         return "Invalid task id."
-    with SessionLocal() as session:
-        results = soft_delete_task(session, id)
-        if results:
-            return "Task deleted succssfully."
-        else:
-            return "Task deletion failed."
+    results = run_db(soft_delete_task, id)
+    if results:
+        return "Task deleted succssfully."
+    else:
+        return "Task deletion failed."
 
 
 def select_parent():
@@ -415,7 +427,7 @@ def select_parent():
     if task_id is None:
         return "No task selected."
 
-    with SessionLocal() as session:
+    with read_session() as session:
         parent = get_parent(session, task_id)
 
     if parent:
@@ -426,10 +438,10 @@ def select_parent():
 
 
 def get_task_list_urgent():
-    from data.crud.task_crud import get_available_incomplete_urgent_tasks
-
-    with SessionLocal() as session:
+    with read_session() as session:
         tasks = get_available_incomplete_urgent_tasks(session)
+        dependency_index = get_dependency_index()
+        tasks = [task for task in tasks if not dependency_index.is_blocked(task.taskid)]
         if not tasks:
             return "No urgent tasks found."
         set_task_ids_from_tasks(tasks)
@@ -437,42 +449,37 @@ def get_task_list_urgent():
 
 
 def get_task_list_important():
-    from data.crud.task_crud import get_available_incomplete_important_tasks
-
-    with SessionLocal() as session:
+    with read_session() as session:
         tasks = get_available_incomplete_important_tasks(session)
+        dependency_index = get_dependency_index()
+        tasks = [task for task in tasks if not dependency_index.is_blocked(task.taskid)]
         if not tasks:
             return "No important tasks found."
         set_task_ids_from_tasks(tasks)
         return format_tasks_as_list(tasks)
 
 
-
-
-
 def svc_set_task_important(value: bool) -> str:
     task_id = get_selected_task_id()
     if task_id is None:
         return "No task selected."
-    with SessionLocal() as session:
-        success = set_task_important(session, task_id, value)
-        return "Important flag updated." if success else "Failed to update important flag."
+    success = run_db(set_task_important, task_id, value)
+    return "Important flag updated." if success else "Failed to update important flag."
 
 
 def svc_set_task_urgent(value: bool) -> str:
     task_id = get_selected_task_id()
     if task_id is None:
         return "No task selected."
-    with SessionLocal() as session:
-        success = set_task_urgent(session, task_id, value)
-        return "Urgent flag updated." if success else "Failed to update urgent flag."
+    success = run_db(set_task_urgent, task_id, value)
+    return "Urgent flag updated." if success else "Failed to update urgent flag."
 
 
 def svc_is_task_important() -> bool:
     task_id = get_selected_task_id()
     if task_id is None:
         return False
-    with SessionLocal() as session:
+    with read_session() as session:
         return is_task_important(session, task_id)
 
 
@@ -480,20 +487,15 @@ def svc_is_task_urgent() -> bool:
     task_id = get_selected_task_id()
     if task_id is None:
         return False
-    with SessionLocal() as session:
+    with read_session() as session:
         return is_task_urgent(session, task_id)
 
 def elevate_task_to_top_level(task_id: int) -> str:
-    with SessionLocal() as session:
-        success = make_task_top_level(session, task_id)
-        if success:
-            return f"Task {task_id} is now a top-level task."
-        else:
-            return f"Failed to elevate task {task_id}."
-
-
-from data.crud.task_crud import crud_update_task_name
-from data.db_session import SessionLocal
+    success = run_db(make_task_top_level, task_id)
+    if success:
+        return f"Task {task_id} is now a top-level task."
+    else:
+        return f"Failed to elevate task {task_id}."
 
 
 def update_task_name_service(task_id: int, new_name: str) -> str:
@@ -507,29 +509,18 @@ def update_task_name_service(task_id: int, new_name: str) -> str:
     Returns:
         str: A message indicating success or failure.
     """
-    with SessionLocal() as session:
-        success = crud_update_task_name(session, task_id, new_name)
-        if success:
-            return f"Task {task_id} name updated to '{new_name}'."
-        else:
-            return f"Failed to update task {task_id}."
-
-
-from data.crud.task_crud import update_task_sort_order
-from data.db_session import SessionLocal
+    success = run_db(crud_update_task_name, task_id, new_name)
+    if success:
+        return f"Task {task_id} name updated to '{new_name}'."
+    else:
+        return f"Failed to update task {task_id}."
 
 
 def update_task_sort_order_service(task_id: int, new_sort_order: int) -> str:
-    with SessionLocal() as session:
-        if update_task_sort_order(session, task_id, new_sort_order):
-            return f"Task {task_id} sort order updated to {new_sort_order}."
-        else:
-            return f"Failed to update task {task_id} sort order."
-
-
-from data.db_session import SessionLocal
-from data.models.task_model import Task
-from state.task_state import get_task_ids, set_task_ids
+    if run_db(update_task_sort_order, task_id, new_sort_order):
+        return f"Task {task_id} sort order updated to {new_sort_order}."
+    else:
+        return f"Failed to update task {task_id} sort order."
 
 
 def move_task_by_index(src_index: int, dest_index: int) -> str:
@@ -554,68 +545,44 @@ def move_task_by_index(src_index: int, dest_index: int) -> str:
     task_id = task_ids.pop(src)
     task_ids.insert(dest, task_id)
 
-    # Update the sort_order for each task in the new order in one session
-    with SessionLocal() as session:
-        for order, tid in enumerate(task_ids, start=1):
-            task = session.get(Task, tid)
-            if task:
-                task.sort_order = order
-        session.commit()
+    # Update the sort_order for each task in the new order in one transaction
+    run_db(update_task_sort_orders, task_ids)
 
     # Save the new order to the global state
     set_task_ids(task_ids)
     return f"Task moved from index {src_index} to {dest_index}."
 
 
-from data.crud.task_crud import (crud_update_task_description,
-                                 crud_update_task_target)
-from data.db_session import SessionLocal
-
-
 def update_task_description_service(task_id: int, new_description: str) -> str:
-    with SessionLocal() as session:
-        success = crud_update_task_description(session, task_id, new_description)
-        if success:
-            return f"Task {task_id} description updated."
-        else:
-            return f"Failed to update task {task_id} description."
+    success = run_db(crud_update_task_description, task_id, new_description)
+    if success:
+        return f"Task {task_id} description updated."
+    else:
+        return f"Failed to update task {task_id} description."
 
 def update_task_target_service(task_id: int, new_target: str) -> str:
-    with SessionLocal() as session:
-        success = crud_update_task_target(session, task_id, new_target)
-        if success:
-            return f"Task {task_id} target updated."
-        else:
-            return f"Failed to update task {task_id} target."
+    success = run_db(crud_update_task_target, task_id, new_target)
+    if success:
+        return f"Task {task_id} target updated."
+    else:
+        return f"Failed to update task {task_id} target."
 
 
 def update_task_milestone_service(task_id: int, new_milestone: str) -> str:
-    with SessionLocal() as session:
-        success = crud_update_task_milestone(session, task_id, new_milestone)
-        if success:
-            return f"Task {task_id} milestone updated."
-        else:
-            return f"Failed to update task {task_id} milestone."
-
-from data.crud.task_crud import update_task_parent
-from data.db_session import SessionLocal
+    success = run_db(crud_update_task_milestone, task_id, new_milestone)
+    if success:
+        return f"Task {task_id} milestone updated."
+    else:
+        return f"Failed to update task {task_id} milestone."
 
 
 def update_task_parent_service(task_id: int, new_parent_id: int) -> str:
     """Service wrapper to update the parent of a task."""
-    with SessionLocal() as session:
-        success = update_task_parent(session, task_id, new_parent_id)
-        if success:
-            return f"Parent updated: task {task_id} now has parent {new_parent_id}."
-        else:
-            return f"Failed to update parent for task {task_id}."
-
-
-
-from data.crud.task_crud import get_recently_deleted_tasks
-from data.db_session import SessionLocal
-from state.task_state import set_task_ids
-from utils.formatting import format_tasks_as_list
+    success = run_db(update_task_parent, task_id, new_parent_id)
+    if success:
+        return f"Parent updated: task {task_id} now has parent {new_parent_id}."
+    else:
+        return f"Failed to update parent for task {task_id}."
 
 
 def fetch_recently_deleted_tasks(days: int = 7) -> str:
@@ -624,7 +591,7 @@ def fetch_recently_deleted_tasks(days: int = 7) -> str:
     saves their IDs to the state, formats the list using format_tasks_as_list,
     and returns the formatted string.
     """
-    with SessionLocal() as session:
+    with read_session() as session:
         tasks = get_recently_deleted_tasks(session, days)
         if not tasks:
             return f"No tasks have been deleted in the last {days} days."
@@ -632,63 +599,44 @@ def fetch_recently_deleted_tasks(days: int = 7) -> str:
         set_task_ids([task.taskid for task in tasks])
         return format_tasks_as_list(tasks)
 
-from data.crud.task_crud import undelete_task
-from data.db_session import SessionLocal
-
 
 def undelete_task_service(task_id: int) -> str:
     """
     Service function that attempts to undelete a task.
     Returns a status message.
     """
-    with SessionLocal() as session:
-        if undelete_task(session, task_id):
-            return f"Task {task_id} has been undeleted."
-        else:
-            return f"Failed to undelete task {task_id}."
-
-
-from data.crud.task_crud import (update_task_repeat_interval,
-                                 update_task_repeatskipweekend,
-                                 update_task_repeattimeofday)
-from data.db_session import SessionLocal
-from state.task_state import get_selected_task_id
+    if run_db(undelete_task, task_id):
+        return f"Task {task_id} has been undeleted."
+    else:
+        return f"Failed to undelete task {task_id}."
 
 
 def update_repeat_interval_service(new_interval: int) -> str:
     task_id = get_selected_task_id()
     if not task_id:
         return "No task selected."
-    with SessionLocal() as session:
-        if update_task_repeat_interval(session, task_id, new_interval):
-            return f"Repeat interval updated to {new_interval} days."
-        else:
-            return "Failed to update repeat interval."
+    if run_db(update_task_repeat_interval, task_id, new_interval):
+        return f"Repeat interval updated to {new_interval} days."
+    else:
+        return "Failed to update repeat interval."
 
 def update_repeattimeofday_service(new_time: int) -> str:
     task_id = get_selected_task_id()
     if not task_id:
         return "No task selected."
-    with SessionLocal() as session:
-        if update_task_repeattimeofday(session, task_id, new_time):
-            return f"Repeat time of day updated to {str(new_time).zfill(4)}."
-        else:
-            return "Failed to update repeat time of day."
+    if run_db(update_task_repeattimeofday, task_id, new_time):
+        return f"Repeat time of day updated to {str(new_time).zfill(4)}."
+    else:
+        return "Failed to update repeat time of day."
 
 def update_repeatskipweekend_service(new_skip: bool) -> str:
     task_id = get_selected_task_id()
     if not task_id:
         return "No task selected."
-    with SessionLocal() as session:
-        if update_task_repeatskipweekend(session, task_id, new_skip):
-            return f"Repeat skip weekend updated to {new_skip}."
-        else:
-            return "Failed to update repeat skip weekend."
-
-
-from data.crud.task_crud import get_task_target
-from data.db_session import SessionLocal
-from state.task_state import get_selected_task_id
+    if run_db(update_task_repeatskipweekend, task_id, new_skip):
+        return f"Repeat skip weekend updated to {new_skip}."
+    else:
+        return "Failed to update repeat skip weekend."
 
 
 def get_task_target_service() -> str:
@@ -702,7 +650,7 @@ def get_task_target_service() -> str:
         return "No task selected."
 
     try:
-        with SessionLocal() as session:
+        with read_session() as session:
             target = get_task_target(session, task_id)
             if target is None:
                 return "Task not found or an error occurred."
@@ -725,7 +673,7 @@ def get_task_milestone_service() -> str:
         return "No task selected."
 
     try:
-        with SessionLocal() as session:
+        with read_session() as session:
             milestone = get_task_milestone(session, task_id)
             if milestone is None:
                 return "Task not found or an error occurred."
@@ -737,25 +685,14 @@ def get_task_milestone_service() -> str:
         return f"An error occurred when retrieving the task milestone: {str(e)}"
 
 
-
-
-
-
 def svc_project_stubs() -> str:
     """
     Fetches tasks that are tagged with "projects" and returns a stub
     representation of each task without including its notes.
     """
-    with SessionLocal() as session:
-        # Join tasktags and filter tasks having a tag with name "projects"
-        project_tasks = (
-            session.query(Task)
-            .join(Task.tasktags)
-            .filter(TaskTag.name == "projects")
-            .all()
-        )
-        from data.crud.task_tags_crud import get_tasks_by_tag_name
+    with read_session() as session:
         project_tasks = get_tasks_by_tag_name(session, 'project')
+        rollups = get_project_rollups(session, [task.taskid for task in project_tasks])
 
         def stub_text(task: Task) -> str:
             lines = []
@@ -771,6 +708,13 @@ def svc_project_stubs() -> str:
             if task.createdat:
                 lines.append(f"**Created:** {task.createdat.strftime('%Y-%m-%d %H:%M')}")
                 lines.append("")
+            rollup = rollups.get(task.taskid)
+            if rollup and rollup.total:
+                lines.append(f"**Progress:** {rollup.completed}/{rollup.total} done")
+                lines.append("")
+            if rollup and rollup.next_due:
+                lines.append(f"**Next due:** {rollup.next_due.strftime('%Y-%m-%d %H:%M')}")
+                lines.append("")
             # if task.status:
             #     lines.append(f"**Status:** {task.status}")
             #     lines.append("")
@@ -787,7 +731,94 @@ def svc_project_stubs() -> str:
 def set_task_pending():
     task_id = get_selected_task_id()
     if task_id:
-        with SessionLocal() as session:
-            mark_pending(session, task_id)
-            return "Task status set to Pending."
+        run_db(mark_pending, task_id)
+        return "Task status set to Pending."
     return "No task selected."
+
+
+class TaskEditConflict(Exception):
+    """The task was edited after the lastedittime the client based its change on."""
+
+    def __init__(self, lastedittime: datetime):
+        super().__init__(f"Task was edited at {lastedittime}.")
+        self.lastedittime = lastedittime
+
+
+def patch_task_service(task_id: int, changes: dict, expected_lastedittime: Optional[datetime] = None) -> dict:
+    """
+    Applies a partial update to a task in a single write. Raises LookupError
+    for a missing or deleted task, TaskEditConflict when `expected_lastedittime`
+    is stale and ValueError for an invalid parent.
+    """
+    new_edit_time = run_db(patch_task, task_id, changes, expected_lastedittime)
+    if new_edit_time is None:
+        with read_session() as session:
+            task = get_task_by_id(session, task_id)
+        if task is None or task.deleted:
+            raise LookupError(task_id)
+        raise TaskEditConflict(task.lastedittime)
+    return {"taskid": task_id, **changes, "lastedittime": new_edit_time}
+
+
+def get_task_detail_service(task_id: int) -> Optional[Task]:
+    with read_session() as session:
+        return get_task_by_id(session, task_id)
+
+
+def get_task_tree_service(task_id: int, depth: Optional[int] = None, expand: Iterable[int] = ()) -> Optional[dict]:
+    """
+    The task with its open subtasks nested under `children`, `depth` levels
+    deep (all of them when None), plus the children of every shown node
+    listed in `expand`. Each node carries `child_count` and
+    `open_descendant_count` over its whole subtree, so a client can tell
+    which nodes have more to expand. None if the task does not exist.
+
+    Only ids are read for the whole subtree; full rows are fetched for the
+    shown nodes alone.
+    """
+    expand = set(expand)
+    with read_session() as session:
+        links = get_open_subtree_links(session, task_id)
+        if not links:
+            return None
+        parents = dict(links)
+        children: Dict[int, List[int]] = {}
+        for child_id, parent_id in links:
+            if child_id != task_id:
+                children.setdefault(parent_id, []).append(child_id)
+
+        # Breadth-first, so every node comes after its parent.
+        order = [task_id]
+        for node_id in order:
+            order.extend(children.get(node_id, ()))
+
+        levels = {task_id: 0}
+        for node_id in order:
+            level = levels.get(node_id)
+            if level is not None and (depth is None or level < depth or node_id in expand):
+                for child_id in children.get(node_id, ()):
+                    levels[child_id] = level + 1
+        rows = get_task_rows(session, list(levels))
+
+    descendants = dict.fromkeys(order, 0)
+    for node_id in reversed(order):
+        for child_id in children.get(node_id, ()):
+            descendants[node_id] += 1 + descendants[child_id]
+
+    nodes = {
+        row.taskid: {
+            **row._asdict(),
+            "child_count": len(children.get(row.taskid, ())),
+            "open_descendant_count": descendants[row.taskid],
+            "children": [],
+        }
+        for row in rows
+    }
+    for node_id in order:
+        if node_id != task_id and node_id in nodes:
+            nodes[parents[node_id]]["children"].append(nodes[node_id])
+    for node in nodes.values():
+        # Same order as the list views: sort order (unset first), then age.
+        node["children"].sort(key=lambda child: (child["sort_order"] is not None, child["sort_order"] or 0, child["taskid"]))
+    return nodes[task_id]
+
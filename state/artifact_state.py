@@ -1,17 +1,19 @@
-_artifact_list = []
-_selected_artifact = None
+from data.db_session import current_database
+
+
+def _state() -> dict:
+    return current_database().local("artifact_state", lambda database: {"artifact_list": []})
+
 
 def set_artifact_list(artifact_list):
-    global _artifact_list
-    _artifact_list = artifact_list
+    _state()["artifact_list"] = artifact_list
 
 
 def get_artifact_list():
-    return _artifact_list
+    return _state()["artifact_list"]
 
 def set_selected_artifact(artifact):
-    global _selected_artifact
-    _selected_artifact = artifact
+    _state()["selected_artifact"] = artifact
 
 def get_selected_artifact():
-    return _selected_artifact
+    return _state().get("selected_artifact")
@@ -1,35 +1,35 @@
-_task_ids = None
+from data.db_session import current_database
+
+# Selections belong to the database they were made in, so tenants never see each other's.
+
+
+def _state() -> dict:
+    return current_database().local("task_state", lambda database: {})
+
 
 def set_task_ids(task_ids):
-    global _task_ids
-    _task_ids = task_ids
+    _state()["task_ids"] = task_ids
 
 def get_task_ids():
-    return _task_ids
+    return _state().get("task_ids")
 
-_new_task_id = None
 
 def set_new_task_id(task_id: int):
-    global _new_task_id
-    _new_task_id = task_id
+    _state()["new_task_id"] = task_id
 
 def get_new_task_id() -> int | None:
-    return _new_task_id
+    return _state().get("new_task_id")
 
-_selected_task_id = None
 
 def get_selected_task_id() -> int | None:
-    return _selected_task_id
+    return _state().get("selected_task_id")
 
 def set_selected_task_id(task_id: int):
-    global _selected_task_id
-    _selected_task_id = task_id
+    _state()["selected_task_id"] = task_id
 
-_multi_select = None
 
 def set_multi_select(task_ids):
-    global _multi_select
-    _multi_select = task_ids
+    _state()["multi_select"] = task_ids
 
 def get_multi_select():
-    return _multi_select
+    return _state().get("multi_select")
@@ -0,0 +1,199 @@
+"""
+Opt-in request profiling. A request carrying `X-Profile: 1` from a client
+listed in PROFILE_ALLOWED_HOSTS is run under cProfile, and every SQL
+statement it issues is timed. The capture is kept in memory under the id
+returned in the `X-Profile-Id` response header.
+
+Nothing is installed unless PROFILE_ALLOWED_HOSTS is set, so ordinary
+requests pay no cost.
+"""
+import asyncio
+import cProfile
+import functools
+import io
+import itertools
+import pstats
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import config
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+ALLOWED_HOSTS = set(getattr(config, "PROFILE_ALLOWED_HOSTS", ()))
+MAX_PROFILES = getattr(config, "PROFILE_KEEP", 50)
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+# Functions shown per capture, by cumulative time.
+PROFILE_LINES = 40
+
+_current: ContextVar[Optional["Capture"]] = ContextVar("profile_capture", default=None)
+_ids = itertools.count(1)
+_lock = threading.Lock()
+_profiles: "OrderedDict[int, Capture]" = OrderedDict()
+
+
+class Capture:
+    def __init__(self, method: str, path: str):
+        self.id = next(_ids)
+        self.method = method
+        self.path = path
+        self.started_at = datetime.now()
+        self.duration_ms: Optional[float] = None
+        self.status: Optional[int] = None
+        self.statements: List[Dict[str, Any]] = []
+        self.stats: Optional[pstats.Stats] = None
+        self._lock = threading.Lock()
+
+    def add_statement(self, statement: str, duration_ms: float, thread: str):
+        with self._lock:
+            self.statements.append({"statement": statement, "duration_ms": round(duration_ms, 3), "thread": thread})
+
+    def add_profile(self, profiler: cProfile.Profile):
+        with self._lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(profiler)
+            else:
+                self.stats.add(profiler)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "status": self.status,
+            "duration_ms": self.duration_ms,
+            "sql_count": len(self.statements),
+            "sql_ms": round(sum(s["duration_ms"] for s in self.statements), 3),
+        }
+
+    def details(self) -> Dict[str, Any]:
+        profile = ""
+        if self.stats is not None:
+            out = io.StringIO()
+            self.stats.stream = out
+            self.stats.sort_stats("cumulative").print_stats(PROFILE_LINES)
+            profile = out.getvalue()
+        return {**self.summary(), "sql": list(self.statements), "profile": profile}
+
+
+def is_profiling_allowed(host: Optional[str]) -> bool:
+    return host is not None and host in ALLOWED_HOSTS
+
+
+def get_profile(profile_id: int) -> Optional[Capture]:
+    with _lock:
+        return _profiles.get(profile_id)
+
+
+def recent_profiles() -> List[Capture]:
+    """Stored captures, newest first."""
+    with _lock:
+        return list(reversed(_profiles.values()))
+
+
+def _store(capture: Capture):
+    with _lock:
+        _profiles[capture.id] = capture
+        while len(_profiles) > MAX_PROFILES:
+            _profiles.popitem(last=False)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    capture = _current.get()
+    started = conn.info.get("profile_started")
+    if capture is not None and started:
+        capture.add_statement(statement, (time.perf_counter() - started.pop()) * 1000,
+                              threading.current_thread().name)
+
+
+if ALLOWED_HOSTS:
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _profiled(endpoint):
+    """Runs the endpoint under cProfile, in whichever thread it executes, when a capture is active."""
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            capture = _current.get()
+            if capture is None:
+                return await endpoint(*args, **kwargs)
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                profiler.disable()
+                capture.add_profile(profiler)
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        capture = _current.get()
+        if capture is None:
+            return endpoint(*args, **kwargs)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profiler.disable()
+            capture.add_profile(profiler)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """Route class for every router: lets a capture profile the endpoint in its own thread."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if ALLOWED_HOSTS:
+            endpoint = _profiled(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+class ProfilingMiddleware:
+    """Starts a capture for allowed requests that ask for one and stores it when the response is sent."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ALLOWED_HOSTS:
+            await self.app(scope, receive, send)
+            return
+        client = scope.get("client")
+        wants_profile = dict(scope["headers"]).get(PROFILE_HEADER, b"").strip() in (b"1", b"true")
+        if not wants_profile or not is_profiling_allowed(client[0] if client else None):
+            await self.app(scope, receive, send)
+            return
+
+        capture = Capture(scope["method"], scope["path"])
+        started = time.perf_counter()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                capture.status = message["status"]
+                headers = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, str(capture.id).encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current.set(capture)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _current.reset(token)
+            capture.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            _store(capture)
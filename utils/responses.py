@@ -0,0 +1,60 @@
+"""
+Response encoding. JSON goes through orjson when it is installed, and a
+request sending `Accept: application/msgpack` gets MessagePack instead when
+the msgpack package is available. Both packages are optional; without them
+responses fall back to the standard JSON encoder.
+"""
+from contextvars import ContextVar
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+_wants_msgpack: ContextVar[bool] = ContextVar("wants_msgpack", default=False)
+
+
+class NegotiatedResponse(JSONResponse):
+    """Default response class: orjson-encoded JSON, or MessagePack when the client asked for it."""
+
+    def render(self, content: Any) -> bytes:
+        if msgpack is not None and _wants_msgpack.get():
+            self.media_type = MSGPACK_MEDIA_TYPE
+            return msgpack.packb(content, use_bin_type=True)
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return super().render(content)
+
+    def init_headers(self, headers=None):
+        super().init_headers(headers)
+        if msgpack is not None:
+            # The encoding depends on Accept, so a cache must not serve one client's body to another.
+            self.headers.add_vary_header("Accept")
+
+
+class ContentNegotiationMiddleware:
+    """Records per request whether the client accepts MessagePack, for NegotiatedResponse."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = b",".join(value for name, value in scope["headers"] if name == b"accept")
+        token = _wants_msgpack.set(MSGPACK_MEDIA_TYPE.encode() in accept)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _wants_msgpack.reset(token)